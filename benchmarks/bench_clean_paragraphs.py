@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+bench_clean_paragraphs.py - docx paragraph cleaning one paragraph at a time against batched cleaning on a process pool
+
+    python benchmarks/bench_clean_paragraphs.py --paragraphs 1000 5000 --workers 2 4
+"""
+
+import argparse
+import io
+import random
+import sys
+import time
+from pathlib import Path
+
+# appended, not prepended: the repo root has an email.py page that would shadow the stdlib
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from docx import Document
+
+from synthetic import make_ocr_text
+from utils_doc2pdf import TextProcessor, process_text, shutdown_clean_pools
+
+
+def make_docx(n_paragraphs: int, heading_every: int = 20, seed: int = 0) -> io.BytesIO:
+    """a Word document of OCR-like paragraphs with a heading every `heading_every` paragraphs"""
+    rng = random.Random(seed)
+    words = make_ocr_text(n_paragraphs * 400, hyphen_rate=0.03, seed=seed).split(" ")
+    document = Document()
+    pos = 0
+    for i in range(n_paragraphs):
+        if i % heading_every == 0:
+            document.add_heading(f"Section {i // heading_every + 1}", level=1)
+        n = rng.randint(20, 110)
+        document.add_paragraph(" ".join(words[pos : pos + n]))
+        pos = (pos + n) % max(1, len(words) - 120)
+    buffer = io.BytesIO()
+    document.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+def legacy_process_text(file) -> str:
+    """the previous process_text, cleaning one paragraph at a time"""
+    text_processor = TextProcessor()
+    document = Document(file)
+    result = []
+    for paragraph in document.paragraphs:
+        if paragraph.style.name.startswith('Heading'):
+            result.append('\n' + paragraph.text + '\n')
+        else:
+            processed_paragraph = text_processor.corr(paragraph.text)
+            processed_paragraph = text_processor.cleantxt_ocr(processed_paragraph)
+            processed_paragraph = text_processor.fix_punct_spaces(processed_paragraph)
+            processed_paragraph = text_processor.eval_and_replace(processed_paragraph)
+            result.append(processed_paragraph)
+    return "\n".join(result)
+
+
+def timed(fn, *args, **kwargs):
+    st = time.perf_counter()
+    out = fn(*args, **kwargs)
+    return out, time.perf_counter() - st
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--paragraphs", type=int, nargs="+", default=[1000, 5000])
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4])
+    args = parser.parse_args()
+
+    print(f"{'paragraphs':>10} {'mode':<22} {'seconds':>9} {'para/s':>9} {'speedup':>8}")
+    for n in args.paragraphs:
+        docx_bytes = make_docx(n).getvalue()
+        expected, t_legacy = timed(legacy_process_text, io.BytesIO(docx_bytes))
+        print(f"{n:>10} {'serial (legacy)':<22} {t_legacy:>9.2f} {n / t_legacy:>9.0f} {'1.0x':>8}")
+        for workers in args.workers:
+            # the first run includes starting the pool, later documents reuse it
+            for run in ("cold", "warm"):
+                out, t = timed(process_text, io.BytesIO(docx_bytes), num_workers=workers)
+                assert out == expected, f"output differs with {workers} workers"
+                print(
+                    f"{n:>10} {f'{workers} workers, {run}':<22} {t:>9.2f} {n / t:>9.0f} {t_legacy / t:>7.1f}x"
+                )
+            shutdown_clean_pools()
+
+
+if __name__ == "__main__":
+    main()
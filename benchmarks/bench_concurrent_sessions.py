@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+bench_concurrent_sessions.py - concurrent PDF converter sessions in per-session workspaces against the old shared temp.pdf, checking for cross-talk
+
+    python benchmarks/bench_concurrent_sessions.py --sessions 8 --pages 3
+
+Each session uploads a PDF whose text carries its own marker, all sessions start converting at the
+same moment (as threads, like Streamlit sessions), and each result is checked for its own marker only.
+The PDFs have a text layer, so no OCR model is needed. Exits with an error if an isolated session
+saw another session's text or left its workspace behind.
+"""
+
+import argparse
+import re
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# appended, not prepended: the repo root has an email.py page that would shadow the stdlib
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from fpdf import FPDF
+
+from easyocr_functions import convert_PDF
+from synthetic import make_ocr_text
+from workspaces import Workspace
+
+_marker_re = re.compile(r"session(\d+)marker")
+
+
+def make_text_pdf(path, marker: str, num_pages: int, seed: int = 0) -> Path:
+    """a PDF with a text layer, every page starting and ending with `marker`"""
+    pdf = FPDF()
+    pdf.set_font("Arial", size=11)
+    for i in range(num_pages):
+        pdf.add_page()
+        text = make_ocr_text(2500, hyphen_rate=0.0, noise_rate=0.0, seed=seed + i)
+        pdf.multi_cell(0, 5, f"{marker} {text} {marker}")
+    pdf.output(str(path))
+    return Path(path)
+
+
+def check(i: int, text: str, output_file) -> dict:
+    """the markers found in a session's result, and whether its text file matches it"""
+    seen = {int(m) for m in _marker_re.findall(text)}
+    with open(output_file, encoding="utf-8") as f:
+        on_disk = f.read()
+    return {
+        "session": i,
+        "own": i in seen,
+        "others": sorted(seen - {i}),
+        "file_matches": on_disk == text,
+    }
+
+
+def isolated_session(i: int, num_pages: int, start: threading.Barrier) -> dict:
+    """the converter page now: the upload and its text file live in the session's workspace"""
+    with Workspace(prefix="bench_") as workspace:
+        # every session uploads a file with the same name
+        pdf_path = make_text_pdf(workspace.file("upload.pdf"), f"session{i}marker", num_pages, seed=i)
+        start.wait()
+        text, output_file = convert_PDF(pdf_path, max_pages=num_pages, text_layer=True)
+        result = check(i, text, output_file)
+    result["workspace_removed"] = not workspace.path.exists()
+    return result
+
+
+def shared_session(i: int, num_pages: int, start: threading.Barrier, shared_dir: Path) -> dict:
+    """the converter page before: every upload goes to the same temp.pdf and text file"""
+    pdf_path = make_text_pdf(shared_dir / "temp.pdf", f"session{i}marker", num_pages, seed=i)
+    start.wait()
+    text, output_file = convert_PDF(pdf_path, max_pages=num_pages, text_layer=True)
+    result = check(i, text, output_file)
+    result["workspace_removed"] = None
+    return result
+
+
+def run(mode: str, num_sessions: int, num_pages: int) -> tuple:
+    start = threading.Barrier(num_sessions)
+    with tempfile.TemporaryDirectory() as shared_dir, ThreadPoolExecutor(num_sessions) as executor:
+        st = time.perf_counter()
+        if mode == "isolated":
+            futures = [executor.submit(isolated_session, i, num_pages, start) for i in range(num_sessions)]
+        else:
+            futures = [
+                executor.submit(shared_session, i, num_pages, start, Path(shared_dir))
+                for i in range(num_sessions)
+            ]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:  # a session can fail outright when another one rewrites its file
+                results.append({"session": None, "error": repr(e)})
+        return results, time.perf_counter() - st
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--modes", nargs="+", choices=["shared", "isolated"], default=["shared", "isolated"])
+    args = parser.parse_args()
+
+    print(f"{'mode':<9} {'sessions':>8} {'seconds':>8} {'own text':>9} {'cross-talk':>11} {'bad file':>9} {'errors':>7} {'leftover':>9}")
+    failed = False
+    for mode in args.modes:
+        results, seconds = run(mode, args.sessions, args.pages)
+        ok = [r for r in results if "error" not in r]
+        own = sum(r["own"] for r in ok)
+        cross_talk = sum(bool(r["others"]) for r in ok)
+        bad_files = sum(not r["file_matches"] for r in ok)
+        errors = len(results) - len(ok)
+        leftover = sum(r["workspace_removed"] is False for r in ok)
+        print(
+            f"{mode:<9} {args.sessions:>8} {seconds:>8.2f} {own:>9} {cross_talk:>11} "
+            f"{bad_files:>9} {errors:>7} {leftover:>9}"
+        )
+        if mode == "isolated":
+            failed = own < args.sessions or cross_talk or bad_files or errors or leftover
+    if failed:
+        sys.exit("isolated sessions interfered with each other")
+
+
+if __name__ == "__main__":
+    main()
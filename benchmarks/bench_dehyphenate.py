@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+bench_dehyphenate.py - scaling of the single-scan dehyphenator against the previous split-and-rebuild loop
+
+    python benchmarks/bench_dehyphenate.py --sizes 1000 10000 100000 1000000
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# appended, not prepended: the repo root has an email.py page that would shadow the stdlib
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from spellchecker import SpellChecker
+
+from dehyphenator import dehyphenate
+from synthetic import make_ocr_text
+
+spell = SpellChecker()
+
+
+def check_word_spelling(word: str) -> bool:
+    return len(spell.unknown([word])) == 0
+
+
+def legacy_eval_and_replace(text: str, match_token: str = "- ") -> str:
+    """the previous eval_and_replace loop, it re-splits the whole text for every token"""
+    if match_token not in text:
+        return text
+    while True:
+        full_before_text = text.split(match_token, maxsplit=1)[0]
+        split_before_text = full_before_text.split()
+        before_text = "".join(
+            c for c in (split_before_text[-1] if split_before_text else "") if c.isalpha()
+        )
+        full_after_text = text.split(match_token, maxsplit=1)[-1]
+        split_after_text = full_after_text.split()
+        after_text = "".join(
+            c for c in (split_after_text[0] if split_after_text else "") if c.isalpha()
+        )
+        if check_word_spelling(before_text + after_text):
+            text = full_before_text + full_after_text
+        else:
+            text = full_before_text + " " + full_after_text
+        if match_token not in text:
+            break
+    return text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--hyphen-rate", type=float, default=0.05)
+    parser.add_argument(
+        "--legacy-max-chars",
+        type=int,
+        default=300_000,
+        help="skip the quadratic legacy loop above this size",
+    )
+    args = parser.parse_args()
+
+    print(f"{'chars':>10} {'tokens':>8} {'legacy s':>10} {'single-scan s':>14} {'speedup':>8}")
+    for n_chars in args.sizes:
+        text = make_ocr_text(n_chars, hyphen_rate=args.hyphen_rate, noise_rate=0.0)
+        n_tokens = text.count("- ")
+
+        st = time.perf_counter()
+        out = dehyphenate(text, check_word_spelling)
+        t_new = time.perf_counter() - st
+
+        if len(text) <= args.legacy_max_chars:
+            st = time.perf_counter()
+            out_legacy = legacy_eval_and_replace(text)
+            t_legacy = time.perf_counter() - st
+            assert out == out_legacy, f"outputs differ at {n_chars} chars"
+            print(
+                f"{len(text):>10} {n_tokens:>8} {t_legacy:>10.4f} {t_new:>14.4f} {t_legacy / t_new:>7.1f}x"
+            )
+        else:
+            print(f"{len(text):>10} {n_tokens:>8} {'-':>10} {t_new:>14.4f} {'-':>8}")
+
+
+if __name__ == "__main__":
+    main()
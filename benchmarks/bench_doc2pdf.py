@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+bench_doc2pdf.py - docx to PDF throughput in documents per second: the old round trip through files on disk against the in-memory pipeline
+
+    python benchmarks/bench_doc2pdf.py --paragraphs 20 200 --docs 20
+
+The disk version does what the converter page did before: write the upload to a file, read it with
+Document, write the PDF to a file, read it back for the download and delete both files. Both
+versions clean the paragraphs in this process (--workers 1 by default), so only the I/O differs.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from io import BytesIO
+from pathlib import Path
+
+# appended, not prepended: the repo root has an email.py page that would shadow the stdlib
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from fpdf import FPDF
+
+from bench_clean_paragraphs import make_docx
+from utils_doc2pdf import docx_to_pdf, process_text
+
+
+def disk_docx_to_pdf(upload: bytes, work_dir: str, num_workers: int) -> bytes:
+    """the previous page: upload and PDF go through files named after the upload"""
+    file_name = os.path.join(work_dir, "report.docx")
+    pdf_file_name = os.path.join(work_dir, "report.pdf")
+    with open(file_name, "wb") as f:
+        f.write(upload)
+    text = process_text(file_name, num_workers=num_workers)
+    pdf = FPDF(format="letter")
+    pdf.add_page()
+    pdf.set_font("Arial", size=12)
+    pdf.set_auto_page_break(auto=True, margin=15)
+    for line in text.split("\n"):
+        pdf.multi_cell(0, 10, txt=line, align="L")
+    pdf.output(pdf_file_name)
+    with open(pdf_file_name, "rb") as f:
+        data = f.read()
+    os.remove(file_name)
+    os.remove(pdf_file_name)
+    return data
+
+
+def memory_docx_to_pdf(upload: bytes, work_dir: str, num_workers: int) -> bytes:
+    """the page now: the upload buffer goes in, the PDF bytes come out"""
+    return docx_to_pdf(BytesIO(upload), num_workers=num_workers)
+
+
+def throughput(convert, uploads: list, work_dir: str, num_workers: int, repeat: int) -> tuple:
+    """documents per second, best of `repeat` passes over the uploads, and the total PDF size"""
+    best, size = None, 0
+    for _ in range(repeat):
+        st = time.perf_counter()
+        size = sum(len(convert(upload, work_dir, num_workers)) for upload in uploads)
+        elapsed = time.perf_counter() - st
+        best = elapsed if best is None else min(best, elapsed)
+    return len(uploads) / best, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--paragraphs", type=int, nargs="+", default=[20, 200])
+    parser.add_argument("--docs", type=int, default=20, help="documents per pass")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3, help="timed passes, the fastest is kept")
+    args = parser.parse_args()
+
+    print(f"{'paragraphs':>10} {'disk docs/s':>12} {'memory docs/s':>14} {'speedup':>8} {'same size':>10}")
+    with tempfile.TemporaryDirectory() as work_dir:
+        for n in args.paragraphs:
+            uploads = [make_docx(n, seed=i).getvalue() for i in range(args.docs)]
+            disk, disk_size = throughput(disk_docx_to_pdf, uploads, work_dir, args.workers, args.repeat)
+            memory, memory_size = throughput(memory_docx_to_pdf, uploads, work_dir, args.workers, args.repeat)
+            print(
+                f"{n:>10} {disk:>12.1f} {memory:>14.1f} {memory / disk:>7.2f}x "
+                f"{str(disk_size == memory_size):>10}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+bench_doc2pdf_batch.py - bulk docx to PDF throughput by number of workers, and the memory of the submitting process as the batch grows
+
+    python benchmarks/bench_doc2pdf_batch.py --docs 20 100 --workers 1 2 4
+
+The documents are generated one at a time as the batch consumes them and the archive is written to
+a file, so the growth of the submitting process' memory between batch sizes is what the batch keeps.
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# appended, not prepended: the repo root has an email.py page that would shadow the stdlib
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from bench_clean_paragraphs import make_docx
+from doc2pdf_batch import convert_docx_batch, get_batch_pool
+from ocr_metrics import current_rss_mb
+
+
+def documents(num_docs: int, num_paragraphs: int):
+    """(name, content) of synthetic documents, built only when they are requested"""
+    for i in range(num_docs):
+        yield f"report_{i}.docx", make_docx(num_paragraphs, seed=i % 10).getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--docs", type=int, nargs="+", default=[20, 100])
+    parser.add_argument("--paragraphs", type=int, default=50)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    print(f"{'workers':>7} {'docs':>5} {'seconds':>8} {'docs/s':>7} {'zip MB':>7} {'rss MB':>7} {'failed':>7}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for num_workers in args.workers:
+            if num_workers > 1:
+                # start the pool outside the timing, as on a running server
+                get_batch_pool(num_workers).submit(int).result()
+            for num_docs in args.docs:
+                zip_path = Path(tmp_dir) / f"w{num_workers}_d{num_docs}.zip"
+                st = time.perf_counter()
+                summary = convert_docx_batch(
+                    documents(num_docs, args.paragraphs), zip_path, num_workers=num_workers
+                )
+                seconds = time.perf_counter() - st
+                print(
+                    f"{num_workers:>7} {num_docs:>5} {seconds:>8.2f} {num_docs / seconds:>7.2f} "
+                    f"{zip_path.stat().st_size / 2**20:>7.2f} {current_rss_mb():>7.0f} {summary['failed']:>7}"
+                )
+
+
+if __name__ == "__main__":
+    main()
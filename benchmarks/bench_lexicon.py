@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+bench_lexicon.py - spelling checks with the shared lexicon against a SpellChecker per call (the previous
+doc2pdf check) and a module-level SpellChecker (the previous easyocr_functions check)
+
+    python benchmarks/bench_lexicon.py --words 20000 --per-call-words 50
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+# appended, not prepended: the repo root has an email.py page that would shadow the stdlib
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from spellchecker import SpellChecker
+
+from lexicon import Lexicon
+from synthetic import make_ocr_text
+
+
+def make_words(n_words: int, seed: int = 0) -> list:
+    """OCR-like tokens: words with noise, punctuation, capitals, numbers and hyphen-join candidates"""
+    rng = random.Random(seed)
+    words = make_ocr_text(n_words * 7, hyphen_rate=0.0, noise_rate=0.1, seed=seed).split()
+    extras = ["1999", "3.14", ",", "-", "NaN", "Inf", "Hello", "e.g.", "exam-ple", "x" * 40, ""]
+    words += [rng.choice(extras) for _ in range(n_words // 20)]
+    rng.shuffle(words)
+    return words[:n_words]
+
+
+def timed(fn):
+    st = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - st
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--words", type=int, default=20_000)
+    parser.add_argument(
+        "--per-call-words",
+        type=int,
+        default=50,
+        help="words checked with a new SpellChecker per call, it is too slow for all of them",
+    )
+    parser.add_argument(
+        "--corrections", type=int, default=100, help="words corrected, drawn from 10 distinct misspellings"
+    )
+    args = parser.parse_args()
+
+    words = make_words(args.words)
+    lexicon, t_load = timed(Lexicon)
+    spell = lexicon.spell
+    print(f"{len(words)} words, lexicon loaded in {t_load:.2f}s")
+    print(f"{'check':<34} {'words':>7} {'seconds':>9} {'us/word':>9} {'speedup':>8}")
+
+    def row(name, n, t, base=None):
+        speedup = f"{base / t:.0f}x" if base else "-"
+        print(f"{name:<34} {n:>7} {t:>9.4f} {t / n * 1e6:>9.2f} {speedup:>8}")
+
+    sample = words[: args.per_call_words]
+    per_call, t_per_call = timed(
+        lambda: [len(SpellChecker().unknown([w])) == 0 for w in sample]
+    )
+    base_per_word = t_per_call / len(sample)
+    row("SpellChecker() per call (doc2pdf)", len(sample), t_per_call)
+
+    shared, t_shared = timed(lambda: [len(spell.unknown([w])) == 0 for w in words])
+    row("module-level SpellChecker", len(words), t_shared, base_per_word * len(words))
+
+    known, t_known = timed(lambda: [lexicon.is_known(w) for w in words])
+    row("Lexicon.is_known", len(words), t_known, base_per_word * len(words))
+
+    mask, t_mask = timed(lambda: lexicon.known_mask(words))
+    row("Lexicon.known_mask (batch)", len(words), t_mask, base_per_word * len(words))
+
+    assert per_call == known[: len(sample)], "per-call checks differ"
+    assert shared == known == mask, "lexicon checks differ from SpellChecker"
+    assert lexicon.unknown(words) == spell.unknown(words), "unknown sets differ"
+
+    # corrections of a page worth of misspelled words, many of them repeated: short words with a
+    # dropped letter, a distance-2 correction of a long token takes seconds
+    rng = random.Random(1)
+    short_words = sorted({w.lower() for w in words if w.isalpha() and 5 <= len(w) <= 7})
+    typos = {w[:2] + w[3:] for w in rng.sample(short_words, 40)}
+    misspelled = sorted(lexicon.unknown(typos))[:10]
+    to_correct = [rng.choice(misspelled) for _ in range(args.corrections)]
+    fixed, t_fix = timed(lambda: [spell.correction(w) for w in to_correct])
+    row("SpellChecker.correction", len(to_correct), t_fix)
+    fixed_lru, t_fix_lru = timed(lambda: [lexicon.correction(w) for w in to_correct])
+    row("Lexicon.correction (LRU)", len(to_correct), t_fix_lru, t_fix)
+    assert fixed == fixed_lru, "corrections differ"
+    print(f"correction cache: {lexicon.cache_info()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+"""
+bench_ocr.py - OCR throughput suite on synthetic PDFs: pages/sec, per-stage time and peak RSS per case,
+saved to a JSON results file, and a comparison of two results files that flags regressions
+
+    python benchmarks/bench_ocr.py run --pages 1 4 --fonts default --noise 0 0.2 -o base.json
+    python benchmarks/bench_ocr.py run ... -o new.json
+    python benchmarks/bench_ocr.py compare base.json new.json --threshold 0.1
+
+The PDFs are generated locally and each case runs in a fresh process, so its peak RSS is its own.
+--random-weights builds the models without pretrained weights, for machines that cannot download them:
+the compute is the same, the recognized text is not.
+"""
+
+import argparse
+import json
+import multiprocessing
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+# appended, not prepended: the repo root has an email.py page that would shadow the stdlib
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from synthetic import make_ocr_text
+
+# metrics where a higher value is better, every other compared metric is better lower
+_higher_is_better = {"pages_per_sec"}
+
+
+def load_font(font: str, size: int):
+    """"default" is Pillow's built-in font, anything else a TrueType file name or path"""
+    if font == "default":
+        return ImageFont.load_default(size=size)
+    return ImageFont.truetype(font, size=size)
+
+
+def make_page(
+    text: str, font, dpi: int = 144, noise: float = 0.0, rng=None
+) -> tuple:
+    """
+    make_page - a letter-size page of text, wrapped to the margins
+    Args:
+        text (str): the text, drawn until the page is full
+        font: a PIL font
+        dpi (int, optional): resolution. Defaults to 144.
+        noise (float, optional): 0 for a clean page, up to 1 for a heavily degraded scan: gaussian
+            noise, specks and a slight skew. Defaults to 0.0.
+        rng (np.random.Generator, optional): random source for the noise. Defaults to None.
+    Returns:
+        tuple: the grayscale page, and the text drawn on it, one line per line of text
+    """
+    width, height = int(8.5 * dpi), int(11 * dpi)
+    margin = dpi
+    page = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(page)
+    line_height = int(font.size * 1.5)
+    lines = []
+    line = ""
+    for word in text.split():
+        candidate = f"{line} {word}".strip()
+        if draw.textlength(candidate, font=font) <= width - 2 * margin:
+            line = candidate
+            continue
+        lines.append(line)
+        line = word
+        if margin + (len(lines) + 1) * line_height > height - margin:
+            line = ""
+            break
+    if line:
+        lines.append(line)
+    for i, line in enumerate(lines):
+        draw.text((margin, margin + i * line_height), line, font=font, fill=0)
+
+    if noise > 0:
+        rng = rng or np.random.default_rng(0)
+        page = page.rotate(
+            rng.uniform(-2, 2) * noise, resample=Image.BILINEAR, fillcolor=255
+        )
+        pixels = np.asarray(page, dtype=np.float32)
+        pixels += rng.normal(0, 60 * noise, pixels.shape)
+        specks = rng.random(pixels.shape) < 0.01 * noise
+        pixels[specks] = 0
+        page = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+    return page, "\n".join(lines)
+
+
+def make_pdf(
+    path, num_pages: int, font: str = "default", noise: float = 0.0, dpi: int = 144, seed: int = 0
+) -> tuple:
+    """write a synthetic scanned PDF of `num_pages` text pages, return its path and the text of each page"""
+    rng = np.random.default_rng(seed)
+    pil_font = load_font(font, size=int(dpi / 6))
+    pages = [
+        make_page(
+            make_ocr_text(6000, hyphen_rate=0.0, noise_rate=0.0, seed=seed + i),
+            pil_font,
+            dpi=dpi,
+            noise=noise,
+            rng=rng,
+        )
+        for i in range(num_pages)
+    ]
+    images = [image for image, _ in pages]
+    images[0].save(
+        str(path), "PDF", save_all=True, append_images=images[1:], resolution=dpi
+    )
+    return Path(path), [text for _, text in pages]
+
+
+def run_case(
+    pdf_path: str, num_pages: int, num_workers: int, dpi: int, repeat: int, random_weights: bool
+) -> dict:
+    """convert the PDF `repeat` times after a warm-up, in a fresh process, and keep the fastest run"""
+    from easyocr_functions import convert_PDF_to_Text
+    from ocr_metrics import peak_rss_mb
+    from ocr_models import get_ocr_model_pool
+
+    kwargs = {"pretrained": False, "pretrained_backbone": False} if random_weights else {}
+    st = time.perf_counter()
+    pool = get_ocr_model_pool(**kwargs)
+    pool.warmup()
+    model_load_time = time.perf_counter() - st
+    # each run resets the process peak when it starts, so take the one of the model load now
+    load_peak_rss_mb = peak_rss_mb()
+
+    with pool.acquire() as ocr_model:
+
+        def convert():
+            return convert_PDF_to_Text(
+                pdf_path,
+                ocr_model=ocr_model if num_workers == 1 else None,
+                max_pages=num_pages,
+                num_workers=num_workers,
+                dpi=dpi,
+                cache=False,
+            )
+
+        if num_workers > 1:
+            convert()  # starts and warms up the worker processes
+        runs = [convert() for _ in range(repeat)]
+    best = min(runs, key=lambda r: r["runtime"])
+
+    return {
+        "runtime": best["runtime"],
+        "pages_per_sec": round(num_pages / best["runtime"], 3) if best["runtime"] else None,
+        "stage_times": best["stage_times"],
+        "model_calls": best["model_calls"],
+        "runtimes": [r["runtime"] for r in runs],
+        "model_load_time": round(model_load_time, 2),
+        "chars": best["length"],
+        # the case has the process to itself, so its peak is the highest of the model load and the runs
+        "peak_rss_mb": max(load_peak_rss_mb, *(r["peak_rss_mb"] or 0 for r in runs)),
+        "peak_rss_workers_mb": best["worker_peak_rss_mb"],
+    }
+
+
+def _meta(args) -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": multiprocessing.cpu_count(),
+        "dpi": args.dpi,
+        "repeat": args.repeat,
+        "random_weights": args.random_weights,
+    }
+
+
+def run_suite(args):
+    results = {"meta": _meta(args), "cases": {}}
+    ctx = multiprocessing.get_context("spawn")
+    print(f"{'case':<32} {'pages/s':>8} {'runtime':>8} {'render':>7} {'ocr':>7} {'post':>7} {'RSS MB':>7}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for num_pages in args.pages:
+            for font in args.fonts:
+                for noise in args.noise:
+                    font_name = Path(font).stem if font != "default" else font
+                    pdf_path, _ = make_pdf(
+                        Path(tmp_dir) / f"p{num_pages}-{font_name}-n{noise}.pdf",
+                        num_pages,
+                        font=font,
+                        noise=noise,
+                        dpi=args.dpi,
+                    )
+                    for num_workers in args.workers:
+                        case = f"p{num_pages}-{font_name}-n{noise}-w{num_workers}"
+                        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as executor:
+                            metrics = executor.submit(
+                                run_case,
+                                str(pdf_path),
+                                num_pages,
+                                num_workers,
+                                args.dpi,
+                                args.repeat,
+                                args.random_weights,
+                            ).result()
+                        metrics.update(
+                            pages=num_pages, font=font, noise=noise, num_workers=num_workers
+                        )
+                        results["cases"][case] = metrics
+                        stages = metrics["stage_times"]
+                        print(
+                            f"{case:<32} {metrics['pages_per_sec']:>8.2f} {metrics['runtime']:>8.2f} "
+                            f"{stages.get('render', 0):>7.2f} {stages.get('ocr', 0):>7.2f} "
+                            f"{stages.get('postprocess', 0):>7.2f} {metrics['peak_rss_mb']:>7.0f}"
+                        )
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {args.output}")
+
+
+def _compared_metrics(case: dict) -> dict:
+    metrics = {"pages_per_sec": case["pages_per_sec"], "peak_rss_mb": case["peak_rss_mb"]}
+    metrics.update({f"stage:{k}": v for k, v in case["stage_times"].items()})
+    return metrics
+
+
+def compare_results(base: dict, new: dict, threshold: float = 0.1, min_seconds: float = 0.02) -> list:
+    """
+    compare_results - flag the metrics of each case that got worse by more than `threshold`
+    Args:
+        base (dict): the reference results
+        new (dict): the results to check
+        threshold (float, optional): relative change counted as a regression. Defaults to 0.1.
+        min_seconds (float, optional): stage time changes smaller than this are noise. Defaults to 0.02.
+    Returns:
+        list: (case, metric, base value, new value, relative change, status) rows
+    """
+    rows = []
+    for case in sorted(set(base["cases"]) | set(new["cases"])):
+        if case not in base["cases"] or case not in new["cases"]:
+            rows.append((case, "-", None, None, None, "only in " + ("new" if case in new["cases"] else "base")))
+            continue
+        old_metrics = _compared_metrics(base["cases"][case])
+        new_metrics = _compared_metrics(new["cases"][case])
+        for metric in sorted(set(old_metrics) & set(new_metrics)):
+            old, cur = old_metrics[metric], new_metrics[metric]
+            if not old or cur is None:
+                continue
+            change = (cur - old) / old
+            worse = -change if metric in _higher_is_better else change
+            status = "ok"
+            if metric.startswith("stage:") and abs(cur - old) < min_seconds:
+                pass
+            elif worse > threshold:
+                status = "REGRESSION"
+            elif worse < -threshold:
+                status = "improved"
+            rows.append((case, metric, old, cur, change, status))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="generate the PDFs and run every case")
+    run.add_argument("--pages", type=int, nargs="+", default=[1, 4])
+    run.add_argument(
+        "--fonts", nargs="+", default=["default"], help='"default" or TrueType font files'
+    )
+    run.add_argument("--noise", type=float, nargs="+", default=[0.0, 0.3])
+    run.add_argument("--workers", type=int, nargs="+", default=[1])
+    run.add_argument("--dpi", type=int, default=144)
+    run.add_argument("--repeat", type=int, default=3, help="timed runs per case, the fastest is kept")
+    run.add_argument("--random-weights", action="store_true", help="do not load pretrained weights")
+    run.add_argument("-o", "--output", default="ocr_bench_results.json")
+
+    compare = commands.add_parser("compare", help="flag regressions between two results files")
+    compare.add_argument("base")
+    compare.add_argument("new")
+    compare.add_argument("--threshold", type=float, default=0.1, help="relative change flagged (default: 0.1)")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        if args.random_weights and max(args.workers) > 1:
+            parser.error("--random-weights only works with --workers 1, worker processes load pretrained weights")
+        run_suite(args)
+        return
+
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+    rows = compare_results(base, new, threshold=args.threshold)
+    print(f"base: {base['meta'].get('commit')} {base['meta']['date']}, new: {new['meta'].get('commit')} {new['meta']['date']}")
+    print(f"{'case':<32} {'metric':<20} {'base':>9} {'new':>9} {'change':>8}  status")
+    for case, metric, old, cur, change, status in rows:
+        if old is None:
+            print(f"{case:<32} {metric:<20} {'-':>9} {'-':>9} {'-':>8}  {status}")
+        else:
+            print(f"{case:<32} {metric:<20} {old:>9.3f} {cur:>9.3f} {change:>+8.1%}  {status}")
+    regressions = sum(row[-1] == "REGRESSION" for row in rows)
+    print(f"{regressions} regressions")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+bench_ocr_backends.py - OCR inference backends (torch, int8, onnx) on synthetic PDFs: speedup and character accuracy against torch
+
+    python benchmarks/bench_ocr_backends.py --pages 4 --backends torch int8 onnx
+
+Runs offline once the model weights are downloaded. Backends that cannot be built (e.g. onnx without
+the onnxtr package) are skipped. --random-weights builds the torch and int8 models from the same
+untrained weights, for machines without the pretrained ones: the speedup holds, the accuracy only
+shows how much quantization changes the output. int8 only quantizes the recognition model, so its
+speedup shows in the recognition time more than in whole pages, where detection dominates.
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# appended, not prepended: the repo root has an email.py page that would shadow the stdlib
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import torch
+
+from bench_ocr import make_pdf
+from easyocr_functions import convert_PDF_to_Text
+from ocr_models import OCR_BACKENDS, get_ocr_model_pool
+
+try:
+    from rapidfuzz.distance import Levenshtein
+
+    edit_distance = Levenshtein.distance
+except ImportError:
+
+    def edit_distance(a: str, b: str) -> int:
+        """Levenshtein distance, one row at a time"""
+        row = list(range(len(b) + 1))
+        for i, ca in enumerate(a, 1):
+            prev, row[0] = row[0], i
+            for j, cb in enumerate(b, 1):
+                prev, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, prev + (ca != cb))
+        return row[-1]
+
+
+def char_accuracy(reference: list, texts: list) -> float:
+    """1 - character error rate of `texts` against `reference`, over all pages"""
+    errors = sum(edit_distance(r, t) for r, t in zip(reference, texts))
+    total = sum(len(r) for r in reference)
+    return 1 - errors / total if total else float(errors == 0)
+
+
+def run_backend(backend: str, pdf_path: Path, num_pages: int, repeat: int, predictor_kwargs: dict, seed: int):
+    """build and warm up the backend's predictor, then keep the fastest of `repeat` conversions"""
+    # the same seed gives torch and int8 the same weights when they are not pretrained
+    torch.manual_seed(seed)
+    st = time.perf_counter()
+    pool = get_ocr_model_pool(backend=backend, **predictor_kwargs)
+    pool.warmup()
+    load_time = time.perf_counter() - st
+    with pool.acquire() as ocr_model:
+        runs = [
+            convert_PDF_to_Text(pdf_path, ocr_model=ocr_model, max_pages=num_pages, cache=False)
+            for _ in range(repeat)
+        ]
+    best = min(runs, key=lambda r: r["runtime"])
+    pages = best["converted_text"].split("\n\n")
+    return load_time, best, pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--pages", type=int, default=4)
+    parser.add_argument("--noise", type=float, default=0.1)
+    parser.add_argument("--dpi", type=int, default=144)
+    parser.add_argument("--backends", nargs="+", choices=OCR_BACKENDS, default=list(OCR_BACKENDS))
+    parser.add_argument("--repeat", type=int, default=2, help="timed runs per backend, the fastest is kept")
+    parser.add_argument("--random-weights", action="store_true", help="do not load pretrained weights")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    predictor_kwargs = (
+        {"pretrained": False, "pretrained_backbone": False} if args.random_weights else {}
+    )
+    backends = ["torch"] + [b for b in args.backends if b != "torch"]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pdf_path, _ = make_pdf(Path(tmp_dir) / "backends.pdf", args.pages, noise=args.noise, dpi=args.dpi)
+        print(
+            f"{'backend':<8} {'load s':>7} {'s/page':>7} {'ocr s':>7} {'pages/s':>8} {'speedup':>8} {'char acc':>9}"
+        )
+        reference, base_time = None, None
+        for backend in backends:
+            try:
+                load_time, result, pages = run_backend(
+                    backend, pdf_path, args.pages, args.repeat, predictor_kwargs, args.seed
+                )
+            except ImportError as e:
+                print(f"{backend:<8} skipped: {e}")
+                continue
+            runtime = result["runtime"]
+            if reference is None:
+                reference, base_time = pages, runtime
+            print(
+                f"{backend:<8} {load_time:>7.2f} {runtime / args.pages:>7.2f} "
+                f"{result['stage_times'].get('ocr', 0.0):>7.2f} {args.pages / runtime:>8.2f} "
+                f"{base_time / runtime:>7.2f}x {char_accuracy(reference, pages):>9.2%}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+bench_ocr_profiles.py - latency and character accuracy of the fast, balanced and accurate OCR profiles on synthetic PDFs
+
+    python benchmarks/bench_ocr_profiles.py --pages 4 --noise 0 0.2
+
+Accuracy is measured against the text drawn on the pages, whitespace-normalized. --random-weights
+builds the models without pretrained weights, for machines that cannot download them: the latency
+holds, the accuracy is meaningless.
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# appended, not prepended: the repo root has an email.py page that would shadow the stdlib
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from bench_ocr import make_pdf
+from bench_ocr_backends import char_accuracy
+from easyocr_functions import convert_PDF_to_Text
+from ocr_models import OCR_BACKENDS, OCR_PROFILES, get_ocr_model_pool, get_ocr_profile
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.split())
+
+
+def run_profile(profile: str, pdf_path: Path, num_pages: int, repeat: int, backend: str, random_weights: bool):
+    """build and warm up the profile's predictor, then keep the fastest of `repeat` conversions"""
+    predictor_kwargs = get_ocr_profile(profile)["predictor"]
+    if random_weights:
+        predictor_kwargs.update(pretrained=False, pretrained_backbone=False)
+    st = time.perf_counter()
+    pool = get_ocr_model_pool(backend=backend, **predictor_kwargs)
+    pool.warmup()
+    load_time = time.perf_counter() - st
+    with pool.acquire() as ocr_model:
+        runs = [
+            convert_PDF_to_Text(
+                pdf_path, ocr_model=ocr_model, max_pages=num_pages, profile=profile, cache=False
+            )
+            for _ in range(repeat)
+        ]
+    return load_time, min(runs, key=lambda r: r["runtime"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--pages", type=int, default=4)
+    parser.add_argument("--noise", type=float, nargs="+", default=[0.0, 0.2])
+    parser.add_argument("--profiles", nargs="+", choices=tuple(OCR_PROFILES), default=list(OCR_PROFILES))
+    parser.add_argument("--backend", choices=OCR_BACKENDS, default="torch")
+    parser.add_argument("--repeat", type=int, default=2, help="timed runs per profile, the fastest is kept")
+    parser.add_argument("--random-weights", action="store_true", help="do not load pretrained weights")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        documents = {
+            noise: make_pdf(Path(tmp_dir) / f"n{noise}.pdf", args.pages, noise=noise, dpi=200)
+            for noise in args.noise
+        }
+        print(
+            f"{'profile':<9} {'noise':>5} {'dpi':>4} {'load s':>7} {'s/page':>7} {'pages/s':>8} "
+            f"{'detection':>9} {'recognition':>11} {'char acc':>9}"
+        )
+        for profile in args.profiles:
+            settings = get_ocr_profile(profile)
+            for noise, (pdf_path, truth) in documents.items():
+                load_time, result = run_profile(
+                    profile, pdf_path, args.pages, args.repeat, args.backend, args.random_weights
+                )
+                pages = result["converted_text"].split("\n\n")
+                accuracy = char_accuracy([normalize(t) for t in truth], [normalize(p) for p in pages])
+                stages = result["stage_times"]
+                print(
+                    f"{profile:<9} {noise:>5} {settings['dpi']:>4} {load_time:>7.2f} "
+                    f"{result['runtime'] / args.pages:>7.2f} {result['pages_per_sec']:>8.2f} "
+                    f"{stages.get('detection', 0.0):>9.2f} {stages.get('recognition', 0.0):>11.2f} "
+                    f"{accuracy:>9.2%}"
+                )
+
+
+if __name__ == "__main__":
+    main()
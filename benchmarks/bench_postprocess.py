@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+bench_postprocess.py - compare the OCR text normalization in easyocr_functions with the previous
+chain of uncompiled re.sub / str.replace passes on large OCR outputs, and check that both give identical text
+
+    python benchmarks/bench_postprocess.py --sizes 10000 100000 1000000
+"""
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+# appended, not prepended: the repo root has an email.py page that would shadow the stdlib
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from easyocr_functions import (
+    cleantxt_ocr,
+    corr,
+    custom_replace_list,
+    eval_and_replace,
+    normalize_ocr_text,
+    replace_corr_exceptions,
+)
+from synthetic import make_ocr_text
+
+
+def legacy_corr(
+    s: str,
+    add_space_when_numerics=False,
+    exceptions=["e.g.", "i.e.", "etc.", "cf.", "vs.", "p."],
+) -> str:
+    """corr as it was before its patterns were precompiled"""
+    if add_space_when_numerics:
+        s = re.sub(r"(\d)\.(\d)", r"\1. \2", s)
+    s = re.sub(r"\s+", " ", s)
+    s = re.sub(r'\s([?.!"](?:\s|$))', r"\1", s)
+    s = re.sub(r"\s\'", r"'", s)
+    s = re.sub(r"'\s", r"'", s)
+    s = re.sub(r"\s,", r",", s)
+    for e in exceptions:
+        expected_sub = re.sub(r"\s", "", e)
+        s = s.replace(expected_sub, e)
+    return s
+
+
+def _spacing(text: str, corr_func) -> str:
+    """the regex and replace passes of postprocess, without clean-text and dehyphenation"""
+    proc = corr_func(text)
+    for k, v in custom_replace_list.items():
+        proc = proc.replace(str(k), str(v))
+    proc = corr_func(proc)
+    for k, v in replace_corr_exceptions.items():
+        proc = proc.replace(str(k), str(v))
+    return proc
+
+
+def legacy_spacing(text: str) -> str:
+    return _spacing(text, legacy_corr)
+
+
+def current_spacing(text: str) -> str:
+    return _spacing(text, corr)
+
+
+def legacy_normalize(text: str) -> str:
+    """postprocess(format_ocr_out(text)) with the previous corr"""
+    proc = legacy_corr(cleantxt_ocr(text))
+    return eval_and_replace(_spacing(cleantxt_ocr(proc), legacy_corr))
+
+
+def best_of(func, text: str, repeat: int) -> tuple:
+    """run func `repeat` times, return the best runtime and the output"""
+    best = float("inf")
+    for _ in range(repeat):
+        st = time.perf_counter()
+        out = func(text)
+        best = min(best, time.perf_counter() - st)
+    return best, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--hyphen-rate",
+        type=float,
+        default=0.0,
+        help="share of words broken by a hyphen, dehyphenation is not affected by this change",
+    )
+    args = parser.parse_args()
+
+    print(f"{'chars':>10} {'stage':>8} {'legacy s':>10} {'current s':>10} {'speedup':>8}")
+    for n_chars in args.sizes:
+        text = make_ocr_text(n_chars, hyphen_rate=args.hyphen_rate)
+        for stage, legacy, current in (
+            ("spacing", legacy_spacing, current_spacing),
+            ("full", legacy_normalize, normalize_ocr_text),
+        ):
+            t_legacy, out_legacy = best_of(legacy, text, args.repeat)
+            t_current, out_current = best_of(current, text, args.repeat)
+            assert out_legacy == out_current, f"outputs differ at {n_chars} chars ({stage})"
+            print(
+                f"{len(text):>10} {stage:>8} {t_legacy:>10.4f} {t_current:>10.4f} {t_legacy / t_current:>7.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+bench_text_viewer.py - what the PDF converter page sends to the browser for a large text: the old inline base64 link and full editor against the paged viewer
+
+    python benchmarks/bench_text_viewer.py --chars 1000000 10000000
+
+The inline link put the whole text, base64-encoded, in the page and the editor got the whole
+formatted text. The download button is served as a file, so the page only holds its URL, and the
+viewer formats and sends one page.
+"""
+
+import argparse
+import sys
+import time
+from base64 import b64encode
+from pathlib import Path
+
+# appended, not prepended: the repo root has an email.py page that would shadow the stdlib
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from synthetic import make_ocr_text
+from text_pages import PAGE_CHARS, format_text_width, paginate_text
+
+
+def old_page(text: str) -> tuple:
+    """bytes of the base64 download link and of the editor content, and the time to build them"""
+    st = time.perf_counter()
+    link = f'<a href="data:text/plain;base64,{b64encode(text.encode()).decode()}" download="x.txt">'
+    editor = format_text_width(text.replace("\n", "\n\n"))
+    return len(link) + len(editor.encode()), time.perf_counter() - st
+
+
+def paged_page(text: str, page_chars: int) -> tuple:
+    """bytes of the first viewer page, and the time to paginate and format it"""
+    st = time.perf_counter()
+    start, end = paginate_text(text, page_chars)[0]
+    editor = format_text_width(text[start:end].replace("\n", "\n\n"))
+    return len(editor.encode()), time.perf_counter() - st
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--chars", type=int, nargs="+", default=[100_000, 1_000_000, 10_000_000])
+    parser.add_argument("--page-chars", type=int, default=PAGE_CHARS)
+    args = parser.parse_args()
+
+    paragraph = make_ocr_text(20_000, hyphen_rate=0.0, noise_rate=0.0, seed=0)
+    print(f"{'chars':>10} {'old KB':>9} {'old s':>7} {'paged KB':>9} {'paged s':>8} {'pages':>6}")
+    for chars in args.chars:
+        text = "\n".join([paragraph] * (chars // len(paragraph) + 1))[:chars]
+        old_bytes, old_time = old_page(text)
+        new_bytes, new_time = paged_page(text, args.page_chars)
+        print(
+            f"{chars:>10} {old_bytes / 1024:>9.0f} {old_time:>7.3f} {new_bytes / 1024:>9.0f} "
+            f"{new_time:>8.3f} {len(paginate_text(text, args.page_chars)):>6}"
+        )
+
+
+if __name__ == "__main__":
+    main()
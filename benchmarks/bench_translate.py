@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+bench_translate.py - document translation against a local mock LibreTranslate server: one request per
+line with libretranslatepy, as translate_doc used to do, against batched concurrent requests
+
+    python benchmarks/bench_translate.py --lines 300 --latency 0.05 --workers 1 4 8
+
+Also translates a paged document with repeated headers and footers twice through a fresh translation memory.
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# appended, not prepended: the repo root has an email.py page that would shadow the stdlib
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from libretranslatepy import LibreTranslateAPI
+
+from mock_libretranslate import start_mock_server
+from synthetic import make_ocr_text
+from translation import LibreTranslateClient
+from translation_memory import TranslationMemory
+
+
+def make_document(n_lines: int, blank_rate: float = 0.15, seed: int = 0) -> list:
+    """lines of OCR-like text of varying length, some of them blank"""
+    rng = random.Random(seed)
+    text = make_ocr_text(n_lines * 120, hyphen_rate=0.0, seed=seed)
+    words = text.split()
+    lines = []
+    for _ in range(n_lines):
+        if rng.random() < blank_rate:
+            lines.append("")
+            continue
+        n = rng.randint(3, 30)
+        start = rng.randrange(max(1, len(words) - n))
+        lines.append(" ".join(words[start : start + n]))
+    return lines
+
+
+def add_boilerplate(lines: list, page_lines: int = 30) -> list:
+    """split lines into pages, each with the same header and footer lines"""
+    header = ["ACME Corp. - Quarterly report", "CONFIDENTIAL"]
+    footer = ["Printed on 01/02/2023", "(c) ACME Corp. All rights reserved."]
+    pages = []
+    for start in range(0, len(lines), page_lines):
+        pages += header + lines[start : start + page_lines] + footer
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--lines", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated seconds per request")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--max-chars", type=int, default=2000)
+    parser.add_argument("--fail-rate", type=float, default=0.05, help="share of 503 answers in the retry run")
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    lines = make_document(args.lines)
+    expected = [f"de:{line}" if line.strip() else line for line in lines]
+    server = start_mock_server(latency=args.latency)
+    url = f"http://127.0.0.1:{server.server_port}/"
+    print(f"{len(lines)} lines, {sum(not l.strip() for l in lines)} blank, {args.latency * 1000:.0f} ms per request")
+    print(f"{'mode':<24} {'requests':>9} {'seconds':>9} {'lines/s':>9} {'speedup':>8}")
+
+    t_legacy = None
+    if not args.skip_legacy:
+        lt = LibreTranslateAPI(url)
+        server.num_requests = 0
+        st = time.perf_counter()
+        out = [str(lt.translate(line, "en", "de")) for line in lines]
+        t_legacy = time.perf_counter() - st
+        assert [o for o in out if o != "de:"] == [e for e in expected if e], "legacy output mismatch"
+        print(f"{'per line (legacy)':<24} {server.num_requests:>9} {t_legacy:>9.2f} {len(lines) / t_legacy:>9.1f} {'1.0x':>8}")
+
+    for workers in args.workers:
+        client = LibreTranslateClient(url, max_connections=workers)
+        server.num_requests = 0
+        st = time.perf_counter()
+        out = client.translate_lines(lines, "en", "de", max_chars=args.max_chars)
+        t = time.perf_counter() - st
+        assert out == expected, f"batched output mismatch with {workers} workers"
+        speedup = f"{t_legacy / t:.1f}x" if t_legacy else "-"
+        print(f"{f'batched, {workers} workers':<24} {server.num_requests:>9} {t:>9.2f} {len(lines) / t:>9.1f} {speedup:>8}")
+
+    # transient failures are retried, order is kept
+    server.fail_rate = args.fail_rate
+    client = LibreTranslateClient(url, max_connections=max(args.workers), backoff_factor=0.01)
+    server.num_requests = 0
+    st = time.perf_counter()
+    out = client.translate_lines(lines, "en", "de", max_chars=args.max_chars // 4)
+    t = time.perf_counter() - st
+    assert out == expected, "output mismatch with retries"
+    print(
+        f"{f'{args.fail_rate:.0%} failures, retried':<24} {server.num_requests:>9} {t:>9.2f} {len(lines) / t:>9.1f} {'-':>8}"
+    )
+
+    # repeated segments: deduplicated within the document, then reused across documents
+    server.fail_rate = 0.0
+    doc = add_boilerplate(lines)
+    expected = [f"de:{line}" if line.strip() else line for line in doc]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        memory = TranslationMemory(Path(tmp_dir) / "tm.sqlite3")
+        client = LibreTranslateClient(url, max_connections=max(args.workers), memory=memory)
+        for run in ("first", "second"):
+            server.num_requests = 0
+            before = client.stats()
+            st = time.perf_counter()
+            out = client.translate_lines(doc, "en", "de", max_chars=args.max_chars)
+            t = time.perf_counter() - st
+            assert out == expected, "output mismatch with the translation memory"
+            after = client.stats()
+            segments = after["segments"] - before["segments"]
+            unique = after["unique_segments"] - before["unique_segments"]
+            hits = after["memory_hits"] - before["memory_hits"]
+            print(
+                f"{f'memory, {run} run':<24} {server.num_requests:>9} {t:>9.2f} {len(doc) / t:>9.1f} {'-':>8}"
+                f"   {segments} segments, {unique} unique, {hits} memory hits"
+            )
+        print(f"translation memory: {memory.stats()}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+check_blank_pages.py - the blank page filter on synthetic letter pages at 144 dpi: pages with any content must be kept
+
+    python benchmarks/check_blank_pages.py
+
+Each fixture is a 1224 x 1584 page with the answer is_blank_page must give at the default
+threshold. Prints the verdict and check time of every page, exits with an error on a wrong verdict.
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# appended, not prepended: the repo root has an email.py page that would shadow the stdlib
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageOps
+
+from bench_ocr import load_font, make_page
+from easyocr_functions import is_blank_page
+from synthetic import make_ocr_text
+
+DPI = 144
+WIDTH, HEIGHT = int(8.5 * DPI), int(11 * DPI)
+_font = load_font("default", size=int(DPI / 6))
+
+
+def _text_page(fill: int = 0, paper: int = 255, words: int = 1200, seed: int = 0) -> Image.Image:
+    """a page of body text in gray level `fill` on paper of gray level `paper`"""
+    page, _ = make_page(make_ocr_text(words * 6, hyphen_rate=0.0, noise_rate=0.0, seed=seed), _font)
+    pixels = np.asarray(page, dtype=np.float32) / 255
+    return Image.fromarray((fill + (paper - fill) * pixels).astype(np.uint8))
+
+
+def _add_noise(page: Image.Image, sigma: float, speck_rate: float, seed: int = 0) -> Image.Image:
+    """gaussian scanner noise and isolated black specks"""
+    rng = np.random.default_rng(seed)
+    pixels = np.asarray(page, dtype=np.float32) + rng.normal(0, sigma, (HEIGHT, WIDTH))
+    pixels[rng.random(pixels.shape) < speck_rate] = 0
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+
+
+def _blank(paper: int = 255) -> Image.Image:
+    return Image.new("L", (WIDTH, HEIGHT), paper)
+
+
+def _with_text(page: Image.Image, text: str, xy: tuple, size: int = 24, fill: int = 0) -> Image.Image:
+    page = page.copy()
+    ImageDraw.Draw(page).text(xy, text, font=load_font("default", size), fill=fill)
+    return page
+
+
+def _figure_page(width: int = 1000, height: int = 900, noise: float = 25) -> Image.Image:
+    """a dark photo-like figure with a one-line caption under it"""
+    page = _blank()
+    rng = np.random.default_rng(1)
+    figure = rng.normal(60, noise, (height, width)).clip(0, 255).astype(np.uint8)
+    page.paste(Image.fromarray(figure), (112, 100))
+    return _with_text(page, "Figure 3. Cross-section of the sample.", (112, height + 130))
+
+
+def fixtures() -> list:
+    """(name, page, expected blank) for every case"""
+    return [
+        ("white page", _blank(), True),
+        ("gray paper", _blank(205), True),
+        ("black page", _blank(0), True),
+        ("scanner noise", _add_noise(_blank(), 6, 0.0), True),
+        ("noise and specks", _add_noise(_blank(235), 8, 0.0005), True),
+        ("lone page number", _with_text(_blank(), "12", (600, 1500)), True),
+        ("body text", _text_page(), False),
+        ("short heading", _with_text(_blank(), "Chapter Four", (150, 150), size=32), False),
+        ("white on dark text", ImageOps.invert(_text_page()), False),
+        ("light text on dark gray", _text_page(fill=230, paper=40), False),
+        ("dark figure and caption", _figure_page(), False),
+        ("page-size figure", _figure_page(width=1000, height=1300, noise=4), False),
+        ("faint pencil text", _text_page(fill=200), False),
+        ("very faint text", _text_page(fill=225), False),
+        ("faint text on noisy scan", _add_noise(_text_page(fill=190, paper=240), 6, 0.0002), False),
+        ("faint single paragraph", _with_text(_blank(), make_ocr_text(300, seed=3)[:110], (150, 300), fill=190), False),
+    ]
+
+
+def main():
+    wrong = []
+    print(f"{'page':<26} {'expected':>9} {'verdict':>8} {'ms':>6}")
+    for name, page, expected in fixtures():
+        image = np.asarray(page.convert("RGB"))
+        st = time.perf_counter()
+        blank = is_blank_page(image)
+        ms = (time.perf_counter() - st) * 1000
+        print(f"{name:<26} {'blank' if expected else 'content':>9} {'blank' if blank else 'content':>8} {ms:>6.1f}")
+        if blank != expected:
+            wrong.append(name)
+    if wrong:
+        sys.exit(f"wrong verdict on: {', '.join(wrong)}")
+
+
+if __name__ == "__main__":
+    main()
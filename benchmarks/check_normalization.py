@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+check_normalization.py - fuzz the fast OCR text normalization paths against the full chain and report any difference
+
+    python benchmarks/check_normalization.py --cases 20000
+
+fused: normalize_ocr_text, which skips the second clean-text and corr passes where they cannot change
+the text, must give the same text as the unfused postprocess(format_ocr_out(text)). The texts mix
+synthetic OCR prose with the words below, Unicode quotes, dashes, ligatures, mojibake, emoji and
+odd whitespace.
+
+gated: confidence-gated postprocessing of pages of trusted words, which skip the text cleanup, must
+give the same text as normalize_ocr_text on the same words. The words are drawn from plain words,
+punctuation, numbers, abbreviations, URLs and emails.
+"""
+
+import argparse
+import random
+import string
+import sys
+from pathlib import Path
+
+# appended, not prepended: the repo root has an email.py page that would shadow the stdlib
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+
+from easyocr_functions import format_ocr_out, gated_postprocess, normalize_ocr_text, postprocess
+from ocr_words import OCRWords
+from synthetic import make_ocr_text
+
+_words = ["the", "report", "Page", "sample", "inter", "national", "OCR", "x", "I", "a", "de", "Visit"]
+_punct = list(".,;:!?'\"()[]%&$#*+=/<>_-")
+_special = [
+    "e.g.", "i.e.", "etc.", "cf.", "vs.", "p.", "e.", "g.", "-", "--", "...", "'s", "(see", "p.12",
+    "http://example.com/page", "https://a.org", "ftp://files.net/x.pdf", "www.example.com", "WWW.A.COM",
+    "www2.site.org/path", "http://localhost:8080", "example.com", "a.b", "user@example.com",
+    "john.doe@mail.co.uk,", "foo[at]bar.com", "(info@site.org)", "3.14", "1,000", "$5", "10%", "12:30",
+    "http:", "//", "@", "a@b", "mailto:x@y.io", "<URL>", "<EMAIL>", ":v:", "a:b:c", "&amp;", "AT&T;", "&#65;",
+]
+
+_unicode = [
+    "\u2019", "\u201cquoted\u201d", "caf\u00e9", "\u2014", "\ufb01nal", "Ã©tÃ©", "\u00a0", "\t", "\n", "\n\t",
+    "\U0001f600", "\u2026", "\u00bd", "na\u00efve", "\u00df", "&lt;b&gt;", "&amp;amp;", ":thumbsup:", "\u00b4s",
+]
+
+
+def random_word(rng: random.Random) -> str:
+    """a word, a special token, or a random string of the characters the cleanup passes through"""
+    r = rng.random()
+    if r < 0.45:
+        word = rng.choice(_words)
+        return word + rng.choice(["", "", "", rng.choice(_punct)])
+    if r < 0.75:
+        return rng.choice(_special)
+    alphabet = string.ascii_letters + string.digits + "".join(_punct)
+    return "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 10)))
+
+
+def random_text(rng: random.Random, prose: list) -> str:
+    """a window of synthetic OCR prose mixed with random words and Unicode oddities"""
+    start = rng.randrange(len(prose))
+    parts = prose[start : start + rng.randint(3, 60)]
+    for _ in range(rng.randint(0, 12)):
+        extra = rng.choice(_unicode) if rng.random() < 0.5 else random_word(rng)
+        parts.insert(rng.randint(0, len(parts)), extra)
+    return rng.choice([" ", " ", "", "  "]).join(parts) if rng.random() < 0.2 else " ".join(parts)
+
+
+def check_fused(cases: int, seed: int) -> list:
+    """the cases where normalize_ocr_text differs from the unfused chain"""
+    rng = random.Random(seed)
+    prose = make_ocr_text(200_000, seed=seed).split(" ")
+    failures = []
+    for _ in range(cases):
+        text = random_text(rng, prose)
+        fused, unfused = normalize_ocr_text(text), postprocess(format_ocr_out(text))
+        if fused != unfused:
+            failures.append((text, fused, unfused))
+    return failures
+
+
+def make_words(values: list, confidence: list) -> OCRWords:
+    """one page of words, one line per word, no boxes"""
+    n = len(values)
+    return OCRWords(
+        "".join(values),
+        np.cumsum([0] + [len(v) for v in values]),
+        np.zeros((n, 4)),
+        confidence,
+        np.ones(n),
+        np.zeros(n),
+        np.arange(n),
+        [1],
+        [1],
+    )
+
+
+def check_gated(cases: int, seed: int) -> list:
+    """the cases where gated postprocessing of trusted words differs from the full chain"""
+    rng = random.Random(seed)
+    failures = []
+    for _ in range(cases):
+        values = [random_word(rng) for _ in range(rng.randint(1, 30))]
+        gated = gated_postprocess(make_words(values, np.ones(len(values))))[0][0]
+        full = normalize_ocr_text(" ".join(values))
+        if gated != full:
+            failures.append((values, gated, full))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--cases", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    failed = False
+    for name, check in (("fused", check_fused), ("gated", check_gated)):
+        failures = check(args.cases, args.seed)
+        print(f"{name}: {args.cases - len(failures)} of {args.cases} cases identical")
+        for case in failures[:5]:
+            print("  ", *(repr(part) for part in case))
+        failed = failed or bool(failures)
+    if failed:
+        sys.exit("the fast normalization differs from the full chain")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+mock_libretranslate.py - a local stand-in for a LibreTranslate server, with simulated latency and failures
+
+    python benchmarks/mock_libretranslate.py --port 5000 --latency 0.05 --fail-rate 0.05
+
+POST /translate takes form or JSON data, `q` may be a string or a list of strings.
+A text is "translated" to "<target>:<text>", so callers can check order and completeness.
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+
+class MockTranslateHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse can be measured
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with server.lock:
+            server.num_requests += 1
+        if self.path.rstrip("/") != "/translate":
+            return self._reply(404, {"error": "not found"})
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            data = json.loads(body)
+        else:
+            data = {k: v[0] for k, v in parse_qs(body.decode()).items()}
+        q = data.get("q", "")
+        if isinstance(q, list) and not server.supports_lists:
+            return self._reply(400, {"error": "Invalid request: q must be a string"})
+
+        texts = q if isinstance(q, list) else [q]
+        time.sleep(server.latency + server.seconds_per_char * sum(map(len, texts)))
+        if random.random() < server.fail_rate:
+            return self._reply(503, {"error": "Slow down"})
+        translated = [f"{data.get('target')}:{text}" for text in texts]
+        self._reply(200, {"translatedText": translated if isinstance(q, list) else translated[0]})
+
+    def _reply(self, status: int, payload: dict):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_mock_server(
+    port: int = 0,
+    latency: float = 0.05,
+    seconds_per_char: float = 2e-5,
+    fail_rate: float = 0.0,
+    supports_lists: bool = True,
+) -> ThreadingHTTPServer:
+    """
+    start_mock_server - serve the mock API from a background thread
+    Args:
+        port (int, optional): port to listen on, 0 for any free port. Defaults to 0.
+        latency (float, optional): seconds added to every request. Defaults to 0.05.
+        seconds_per_char (float, optional): simulated translation time per character. Defaults to 2e-5.
+        fail_rate (float, optional): share of requests answered with a 503. Defaults to 0.0.
+        supports_lists (bool, optional): accept a list for `q`, like LibreTranslate >= 1.3. Defaults to True.
+    Returns:
+        ThreadingHTTPServer: the running server, its URL is http://127.0.0.1:<server.server_port>/
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), MockTranslateHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.seconds_per_char = seconds_per_char
+    server.fail_rate = fail_rate
+    server.supports_lists = supports_lists
+    server.lock = threading.Lock()
+    server.num_requests = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--no-lists", action="store_true", help="reject batched requests")
+    args = parser.parse_args()
+    server = start_mock_server(
+        args.port,
+        latency=args.latency,
+        fail_rate=args.fail_rate,
+        supports_lists=not args.no_lists,
+    )
+    print(f"mock LibreTranslate listening on http://127.0.0.1:{server.server_port}/")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
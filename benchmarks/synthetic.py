@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+synthetic.py - synthetic OCR-like text for the benchmarks
+"""
+
+import random
+
+from spellchecker import SpellChecker
+
+_noise = [" ,", " .", " '", ",,", "t0", "_ ", " ?", "'$", "i. e.", "e. g"]
+
+
+def make_ocr_text(
+    n_chars: int, hyphen_rate: float = 0.03, noise_rate: float = 0.05, seed: int = 0
+) -> str:
+    """
+    make_ocr_text - generate text that looks like raw OCR output of scanned prose
+    Args:
+        n_chars (int): approximate length of the text
+        hyphen_rate (float, optional): share of words broken by a "- " line-break hyphen. Defaults to 0.03.
+        noise_rate (float, optional): share of words followed by spacing/punctuation noise. Defaults to 0.05.
+        seed (int, optional): random seed. Defaults to 0.
+    Returns:
+        str: the generated text
+    """
+    rng = random.Random(seed)
+    vocab = sorted(SpellChecker().word_frequency.keys())[:30000]
+    words = []
+    length = 0
+    while length < n_chars:
+        word = rng.choice(vocab)
+        r = rng.random()
+        if r < hyphen_rate and len(word) > 3:
+            cut = rng.randint(1, len(word) - 1)
+            word = f"{word[:cut]}- {word[cut:]}"
+        elif r < hyphen_rate + noise_rate:
+            word += rng.choice(_noise)
+        if rng.random() < 0.01:
+            word += "\n\t"
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+dehyphenator.py - join words broken by line-break hyphens in a single scan of the text
+"""
+
+import re
+
+_first_word_re = re.compile(r"\s*(\S*)")
+
+
+def _last_word(chunks: list) -> str:
+    """the last whitespace-separated word of the text made of `chunks`, same as "".join(chunks).split()[-1]"""
+    parts = []
+    for chunk in reversed(chunks):
+        end = len(chunk)
+        if not parts:
+            # skip trailing whitespace until the word starts
+            while end and chunk[end - 1].isspace():
+                end -= 1
+            if not end:
+                continue
+        start = end
+        while start and not chunk[start - 1].isspace():
+            start -= 1
+        parts.append(chunk[start:end])
+        if start:
+            break
+    return "".join(reversed(parts))
+
+
+def _tail(chunks: list, n: int) -> str:
+    """the last n characters of the text made of `chunks`"""
+    parts = []
+    for chunk in reversed(chunks):
+        if n <= 0:
+            break
+        parts.append(chunk[-n:])
+        n -= len(parts[-1])
+    return "".join(reversed(parts))
+
+
+def _truncate(chunks: list, n: int):
+    """drop the last n characters of the text made of `chunks`, in place"""
+    while n > 0 and chunks:
+        last = chunks.pop()
+        if len(last) > n:
+            chunks.append(last[:-n])
+        n -= len(last)
+
+
+def dehyphenate(
+    text: str, is_word, match_token: str = "- ", alpha_only: bool = True
+) -> str:
+    """
+    dehyphenate - remove each `match_token` where joining the words around it gives a valid word,
+    otherwise replace it with a space.
+
+    Gives the same result as repeatedly handling the first remaining `match_token` and re-scanning,
+    but scans the text once and checks each candidate word only once.
+
+    Args:
+        text (str): text to evaluate
+        is_word (callable): returns True if a string is a valid word
+        match_token (str, optional): token to replace. Defaults to "- ".
+        alpha_only (bool, optional): only keep the letters of the surrounding words when building
+            the candidate word. Defaults to True.
+    Returns:
+        str: text with replaced tokens
+    """
+    if match_token in ("", " "):
+        # replacing the token with a space would never make progress
+        raise ValueError(f"invalid match_token: {match_token!r}")
+    idx = text.find(match_token)
+    if idx == -1:
+        return text
+
+    m = len(match_token)
+    known = {}
+    # `out` holds the processed text before the current token, it never contains a whole token.
+    # The text after the current token is always text[pos:].
+    out = [text[:idx]]
+    pos = idx + m
+    while True:
+        before = _last_word(out)
+        after = _first_word_re.match(text, pos).group(1)
+        if alpha_only:
+            before = "".join(c for c in before if c.isalpha())
+            after = "".join(c for c in after if c.isalpha())
+        word = before + after
+        if word not in known:
+            known[word] = is_word(word)
+        sep = "" if known[word] else " "
+
+        # removing the token can form a new one across the end of `out` and the separator
+        tail = _tail(out, m - 1)
+        head = tail + sep
+        j = (head + text[pos : pos + m - 1]).find(match_token)
+        if j != -1 and j < len(head):
+            _truncate(out, len(tail) - j)
+            pos += j + m - len(head)
+            continue
+
+        if sep:
+            out.append(sep)
+        idx = text.find(match_token, pos)
+        if idx == -1:
+            out.append(text[pos:])
+            break
+        out.append(text[pos:idx])
+        pos = idx + m
+
+    return "".join(out)
@@ -1,11 +1,8 @@
 import streamlit as st
-from docx import Document
-import re
-from cleantext import clean
-from spellchecker import SpellChecker
-from fpdf import FPDF
+from utils_doc2pdf import docx_to_pdf
+from doc2pdf_batch import convert_docx_batch
+from workspaces import Workspace
 import os
-from base64 import b64encode
 
 st.set_page_config(page_title="Text to PDF Converter", layout="wide")
 hide_streamlit_footer = """<style>#MainMenu {visibility: hidden;}
@@ -14,137 +11,51 @@ st.markdown(hide_streamlit_footer, unsafe_allow_html=True)
 
 st.title('Doc to PDF converter')
 
-class TextProcessor:
-    def __init__(self):
-        pass
-
-    def corr(self, s: str, add_space_when_numerics=False, exceptions=["e.g.", "i.e.", "etc.", "cf.", "vs.", "p."]) -> str:
-        if add_space_when_numerics:
-            s = re.sub(r"(\d)\.(\d)", r"\1. \2", s)
-        s = re.sub(r"\s+", " ", s)
-        s = re.sub(r'\s([?.!"](?:\s|$))', r"\1", s)
-        s = re.sub(r"\s\'", r"'", s)
-        s = re.sub(r"'\s", r"'", s)
-        s = re.sub(r"\s,", r",", s)
-        for e in exceptions:
-            expected_sub = re.sub(r"\s", "", e)
-            s = s.replace(expected_sub, e)
-        return s
-
-    def fix_punct_spaces(self, string):
-        fix_spaces = re.compile(r"\s*([?!.,]+(?:\s+[?!.,]+)*)\s*")
-        string = fix_spaces.sub(lambda x: "{} ".format(x.group(1).replace(" ", "")), string)
-        string = string.replace(" ' ", "'")
-        string = string.replace(' " ', '"')
-        return string.strip()
-
-    def cleantxt_ocr(self, ugly_text, lower=False, lang: str = "en") -> str:
-        cleaned_text = clean(
-            ugly_text,
-            fix_unicode=True,
-            to_ascii=True,
-            lower=lower,
-            no_urls=True,
-            no_emails=True,
-            no_phone_numbers=False,
-            no_numbers=False,
-            no_digits=False,
-            no_currency_symbols=False,
-            replace_with_punct="",
-            replace_with_url="<URL>",
-            replace_with_email="<EMAIL>",
-            replace_with_phone_number="<PHONE>",
-            replace_with_number="<NUM>",
-            replace_with_digit="0",
-            replace_with_currency_symbol="<CUR>",
-            lang=lang,
-        )
-        return cleaned_text
-
-    def check_word_spelling(self, word) -> bool:
-        spell = SpellChecker()
-        misspelled = spell.unknown([word])
-        return len(misspelled) == 0
-
-    def eval_and_replace(self, text: str, match_token: str = "- ") -> str:
-        if match_token not in text:
-            return text
-        else:
-            while True:
-                full_before_text = text.split(match_token, maxsplit=1)[0]
-                split_before_text = full_before_text.split()
-                before_text = "".join([char for char in split_before_text[-1]] if split_before_text else "")
-
-                full_after_text = text.split(match_token, maxsplit=1)[-1]
-                split_after_text = full_after_text.split()
-                after_text = "".join([char for char in split_after_text[0]] if split_after_text else "")
-
-                full_text = before_text + after_text
-                if self.check_word_spelling(full_text):
-                    text = full_before_text + full_after_text
-                else:
-                    text = full_before_text + " " + full_after_text
-                if match_token not in text:
-                    break
-        return text
-
-
-def process_text(file):
-    text_processor = TextProcessor()
-    document = Document(file)
-    result = []
-    for paragraph in document.paragraphs:
-        if paragraph.style.name.startswith('Heading'):
-            result.append('\n' + paragraph.text + '\n')
-        else:
-            processed_paragraph = text_processor.corr(paragraph.text)
-            processed_paragraph = text_processor.cleantxt_ocr(processed_paragraph)
-            processed_paragraph = text_processor.fix_punct_spaces(processed_paragraph)
-            processed_paragraph = text_processor.eval_and_replace(processed_paragraph)
-            result.append(processed_paragraph)
-    return "\n".join(result)
-
-def create_pdf(text, filename):
-    pdf = FPDF(format='letter')
-    pdf.add_page()
-    pdf.set_font("Arial", size = 12)
-    pdf.set_auto_page_break(auto=True, margin=15)
-    lines = text.split('\n')
-    for line in lines:
-        pdf.multi_cell(0, 10, txt = line, align = 'L')
-    pdf.output(filename)
-
-def get_pdf_download_link(file_path, file_name):
-    with open(file_path, "rb") as f:
-        bytes = f.read()
-        b64 = b64encode(bytes).decode()
-        href = f'<a href="data:application/pdf;base64,{b64}" download="{file_name}">Click here to Download your PDF</a>'
-        return href
-
-uploaded_file = st.file_uploader("Choose a Word document", type="docx")
-if uploaded_file is not None:
+uploaded_files = st.file_uploader("Choose Word documents", type="docx", accept_multiple_files=True)
+if len(uploaded_files) == 1:
+    uploaded_file = uploaded_files[0]
     with st.spinner('Processing the document...'):
-        # Write the uploaded file to disk
         file_name = uploaded_file.name
         base_file_name = os.path.splitext(file_name)[0]
         pdf_file_name = f"{base_file_name}.pdf"
 
-        with open(file_name, 'wb') as f:
-            f.write(uploaded_file.getbuffer())
-
-        # Process the document
-        text = process_text(file_name)
-
-        # Create the PDF
-        create_pdf(text, pdf_file_name)
-
-        # Provide the download link for the PDF
-        st.markdown(get_pdf_download_link(pdf_file_name, pdf_file_name), unsafe_allow_html=True)
+        # Process the document and create the PDF, both in memory
+        pdf_data = docx_to_pdf(uploaded_file)
 
-        # Remove the temporary files
-        os.remove(file_name)
-        os.remove(pdf_file_name)
+        # Provide the download button for the PDF, served as a file by the Streamlit server
+        st.download_button("Download your PDF", pdf_data, file_name=pdf_file_name, mime="application/pdf")
 
         st.success('Done!')
+elif uploaded_files:
+    if st.button(f"Convert {len(uploaded_files)} documents", type="primary"):
+        # the archive of the previous batch of this session is replaced
+        previous = st.session_state.pop("doc2pdf_batch", None)
+        if previous is not None:
+            previous["workspace"].cleanup()
+        workspace = Workspace(prefix="doc2pdf_")
+        zip_path = workspace.file("converted_pdfs.zip")
+        progress = st.progress(0.0, text="Converting the documents...")
+        done = []
+
+        def on_file(result):
+            done.append(result)
+            progress.progress(len(done) / len(uploaded_files),
+                              text=f"Converted {len(done)} of {len(uploaded_files)} documents")
+
+        # each upload is read only when a worker is free for it
+        summary = convert_docx_batch(((f.name, f.getvalue()) for f in uploaded_files), zip_path,
+                                     on_file=on_file)
+        st.session_state["doc2pdf_batch"] = {"workspace": workspace, "zip_path": zip_path, "summary": summary}
+
+    batch = st.session_state.get("doc2pdf_batch")
+    if batch is not None:
+        summary = batch["summary"]
+        st.success(f"Converted {summary['files']} documents in {summary['runtime']}s ({summary['docs_per_sec']} docs/s)"
+                   + (f", {summary['failed']} failed" if summary["failed"] else ""))
+        st.dataframe([{"document": r["file"], "PDF": r["pdf"], "seconds": r["seconds"],
+                       "process text": r["timings"].get("process_text"), "create PDF": r["timings"].get("create_pdf"),
+                       "error": r["error"]} for r in summary["results"]], use_container_width=True)
+        with open(batch["zip_path"], "rb") as f:
+            st.download_button("Download all PDFs (zip)", f, file_name="converted_pdfs.zip", mime="application/zip")
 else:
-    st.info('Please upload a Word document.')
\ No newline at end of file
+    st.info('Please upload one or more Word documents.')
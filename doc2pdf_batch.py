@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+doc2pdf_batch.py - bulk docx to PDF conversion on a process pool, the PDFs written into one zip archive as they are done
+
+    python doc2pdf_batch.py path/to/reports -o reports.zip --workers 4
+    python doc2pdf_batch.py a.docx b.docx -o pdfs.zip --report timings.json
+
+Each worker converts whole documents, and only two documents per worker are in flight at a time, so
+memory stays bounded however many files are submitted. A document that fails is logged and left
+out of the archive, the others are still converted.
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from pathlib import Path
+
+from natsort import natsorted
+
+from process_pools import discard_process_pool, get_process_pool, shutdown_process_pools
+from utils_doc2pdf import create_pdf, process_text
+
+
+def get_batch_pool(num_workers: int) -> ProcessPoolExecutor:
+    """
+    get_batch_pool - a process pool converting whole documents, created once and reused across batches
+    Args:
+        num_workers (int): number of worker processes
+    Returns:
+        ProcessPoolExecutor: the pool, a new one if the last one broke
+    """
+    return get_process_pool(("batch", num_workers), num_workers)
+
+
+def shutdown_batch_pools():
+    """shut down all batch conversion process pools"""
+    shutdown_process_pools("batch")
+
+
+def find_docx(input_dir) -> list:
+    """the Word documents directly in a folder, without the ~$ lock files Word leaves next to open documents"""
+    return natsorted(
+        [
+            f
+            for f in Path(input_dir).iterdir()
+            if f.is_file() and f.suffix.lower() == ".docx" and not f.name.startswith("~$")
+        ],
+        key=lambda f: f.name,
+    )
+
+
+def convert_docx(name: str, source) -> tuple:
+    """
+    convert_docx - convert one Word document to PDF, timing each step, run on the worker processes
+    Args:
+        name (str): the document name, used in the result
+        source (str, Path or bytes): the .docx file, or its content
+    Returns:
+        tuple: the result (file, error, seconds and timings of process_text and create_pdf) and the
+            PDF bytes, None if the conversion failed
+    """
+    result = {"file": name, "error": None, "seconds": None, "timings": {}}
+    pdf_data = None
+    st = time.perf_counter()
+    try:
+        file = BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+        # the batch is already spread over the workers, each one cleans its document alone
+        text = process_text(file, num_workers=1)
+        result["timings"]["process_text"] = round(time.perf_counter() - st, 4)
+        pdf_st = time.perf_counter()
+        pdf_data = create_pdf(text)
+        result["timings"]["create_pdf"] = round(time.perf_counter() - pdf_st, 4)
+    except Exception as e:
+        result["error"] = repr(e)
+    result["seconds"] = round(time.perf_counter() - st, 4)
+    return result, pdf_data
+
+
+def iter_docx_to_pdf(files, num_workers: int = None):
+    """
+    iter_docx_to_pdf - convert Word documents across a process pool
+    Args:
+        files (iterable): (name, source) pairs, see convert_docx, or paths. Consumed lazily, so a
+            generator keeps only the documents in flight in memory.
+        num_workers (int, optional): worker processes, 1 converts in this process. Defaults to the
+            number of CPUs, at most 4.
+    Yields:
+        tuple: (result, PDF bytes) for each document, in the original order, see convert_docx
+    """
+    if num_workers is None:
+        num_workers = min(4, os.cpu_count() or 1)
+    files = (
+        (Path(f).name, f) if isinstance(f, (str, Path))
+        # memoryviews, e.g. of uploaded files, cannot be sent to the workers
+        else (f[0], bytes(f[1]) if isinstance(f[1], memoryview) else f[1])
+        for f in files
+    )
+    if num_workers <= 1:
+        for name, source in files:
+            yield convert_docx(name, source)
+        return
+
+    # at most two documents per worker are in flight, so memory stays bounded
+    pending = deque()
+    for name, source in files:
+        pending.append((name, _submit_batch(num_workers, name, source)))
+        if len(pending) >= 2 * num_workers:
+            yield _resolve_batch_future(*pending.popleft())
+    while pending:
+        yield _resolve_batch_future(*pending.popleft())
+
+
+def _submit_batch(num_workers: int, name: str, source):
+    """submit a document to the batch pool, to a new pool if a worker died and broke the last one"""
+    pool = get_batch_pool(num_workers)
+    try:
+        return pool.submit(convert_docx, name, source)
+    except BrokenProcessPool:
+        # the documents in flight on the broken pool fail, the ones after them go to a new pool
+        discard_process_pool(("batch", num_workers), pool)
+        try:
+            return get_batch_pool(num_workers).submit(convert_docx, name, source)
+        except Exception as e:
+            future = Future()
+            future.set_exception(e)
+            return future
+
+
+def _resolve_batch_future(name: str, future) -> tuple:
+    try:
+        return future.result()
+    except Exception as e:  # e.g. a worker process that died
+        return {"file": name, "error": repr(e), "seconds": None, "timings": {}}, None
+
+
+def _pdf_name(name: str, used: set) -> str:
+    """the archive name of a document's PDF, numbered when two documents share a name"""
+    stem = Path(str(name).replace("\\", "/")).stem or "document"
+    pdf_name, n = f"{stem}.pdf", 1
+    while pdf_name in used:
+        n += 1
+        pdf_name = f"{stem} ({n}).pdf"
+    used.add(pdf_name)
+    return pdf_name
+
+
+def convert_docx_batch(files, output, num_workers: int = None, on_file=None) -> dict:
+    """
+    convert_docx_batch - convert Word documents to PDF and write the PDFs into a zip archive as they are done
+    Args:
+        files (iterable): the documents, see iter_docx_to_pdf
+        output (str, Path or file-like): the zip file, or a binary stream to write it to
+        num_workers (int, optional): worker processes, see iter_docx_to_pdf. Defaults to None.
+        on_file (callable, optional): called with the result of each document once it is in the archive. Defaults to None.
+    Returns:
+        dict: number of files converted and failed, runtime, documents per second, and the result of
+            every document with the name of its PDF in the archive
+    """
+    st = time.perf_counter()
+    results, used = [], set()
+    with zipfile.ZipFile(output, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for result, pdf_data in iter_docx_to_pdf(files, num_workers=num_workers):
+            if pdf_data is None:
+                result["pdf"] = None
+                logging.error(f"failed to convert {result['file']}: {result['error']}")
+            else:
+                result["pdf"] = _pdf_name(result["file"], used)
+                archive.writestr(result["pdf"], pdf_data)
+                logging.info(f"converted {result['file']} in {result['seconds']:.2f}s")
+            results.append(result)
+            if on_file is not None:
+                on_file(result)
+    runtime = time.perf_counter() - st
+    converted = sum(r["pdf"] is not None for r in results)
+    return {
+        "files": converted,
+        "failed": len(results) - converted,
+        "runtime": round(runtime, 2),
+        "docs_per_sec": round(len(results) / runtime, 2) if runtime > 0 else None,
+        "results": results,
+    }
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="convert Word documents to PDF, all the PDFs in one zip archive"
+    )
+    parser.add_argument("inputs", nargs="+", help=".docx files, or folders of .docx files")
+    parser.add_argument("-o", "--output", default="converted_pdfs.zip", help="zip archive (default: converted_pdfs.zip)")
+    parser.add_argument(
+        "-w", "--workers", type=int, default=None, help="worker processes (default: CPUs, at most 4)"
+    )
+    parser.add_argument("--report", default=None, help="JSON file for the per-file timings")
+    return parser
+
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(message)s",
+        datefmt="%m/%d/%Y %I:%M:%S",
+    )
+    args = get_parser().parse_args()
+    files = []
+    for path in map(Path, args.inputs):
+        files.extend(find_docx(path) if path.is_dir() else [path])
+    logging.info(f"converting {len(files)} documents to {args.output}")
+    try:
+        summary = convert_docx_batch(files, args.output, num_workers=args.workers)
+    except KeyboardInterrupt:
+        logging.info("interrupted")
+        return
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    logging.info(
+        f"batch complete: {summary['files']} converted, {summary['failed']} failed, "
+        f"{summary['docs_per_sec']} docs/s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -18,17 +18,29 @@ import pprint as pp
 import re
 import shutil
 import time
+from collections import deque
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import date, datetime
 from os.path import basename, dirname, join
 from pathlib import Path
 
+import numpy as np
+import pypdfium2 as pdfium
 from cleantext import clean
-from doctr.io import DocumentFile
-from doctr.models import ocr_predictor
-from libretranslatepy import LibreTranslateAPI
+from cleantext.constants import EMAIL_REGEX, URL_REGEX
+from dehyphenator import dehyphenate
+from lexicon import get_lexicon
 from natsort import natsorted
-from spellchecker import SpellChecker
+from ocr_cache import get_ocr_cache
+from ocr_metrics import OCRRunMetrics, peak_rss_mb, take_model_stats
+from ocr_models import DEFAULT_OCR_PROFILE, get_ocr_model_pool, get_ocr_profile, ocr_config_id
+from ocr_words import OCRWords
+from process_pools import discard_process_pool, get_process_pool, shutdown_process_pools
+from pypdf import PdfReader
 from tqdm.auto import tqdm
+from translation import LibreTranslateClient
 
 
 def simple_rename(filepath, target_ext=".txt"):
@@ -37,15 +49,17 @@ def simple_rename(filepath, target_ext=".txt"):
     return f"OCR_{basename}_{target_ext}"
 
 
-def rm_local_text_files(name_contains="RESULT_"):
+def rm_local_text_files(name_contains="RESULT_", directory=None):
     """
     rm_local_text_files - remove local text files
     Args:
-        name_contains (str, optional): [description]. Defaults to "OCR_".
+        name_contains (str, optional): only remove files with this in their name. Defaults to "RESULT_".
+        directory (str or Path, optional): the folder to clean, e.g. a request's workspace, other
+            folders are never touched. Defaults to the working directory.
     """
     files = [
         f
-        for f in Path.cwd().iterdir()
+        for f in Path(directory or Path.cwd()).iterdir()
         if f.is_file() and f.suffix == ".txt" and name_contains in f.name
     ]
     logging.info(f"removing {len(files)} text files")
@@ -54,6 +68,24 @@ def rm_local_text_files(name_contains="RESULT_"):
     logging.info("done")
 
 
+# spacing corrections, compiled once at import
+_numeric_period_re = re.compile(r"(\d)\.(\d)")
+_space_before_punct_re = re.compile(r'\s([?.!"](?:\s|$))')
+_fix_spaces_re = re.compile(r"\s*([?!.,]+(?:\s+[?!.,]+)*)\s*")
+
+
+def collapse_whitespace(s: str) -> str:
+    """replace every run of whitespace with a single space, same as re.sub(r"\s+", " ", s) but faster"""
+    out = " ".join(s.split())
+    if not out:
+        return " " if s else s
+    if s[0].isspace():
+        out = " " + out
+    if s[-1].isspace():
+        out += " "
+    return out
+
+
 def corr(
     s: str,
     add_space_when_numerics=False,
@@ -68,21 +100,24 @@ def corr(
         str: the corrected string
     """
     if add_space_when_numerics:
-        s = re.sub(r"(\d)\.(\d)", r"\1. \2", s)
+        s = _numeric_period_re.sub(r"\1. \2", s)
 
-    s = re.sub(r"\s+", " ", s)
-    s = re.sub(r'\s([?.!"](?:\s|$))', r"\1", s)
+    s = collapse_whitespace(s)
+    s = _space_before_punct_re.sub(r"\1", s)
 
+    # only single spaces are left, so the remaining fixes are plain substring replacements
     # fix space before apostrophe
-    s = re.sub(r"\s\'", r"'", s)
+    s = s.replace(" '", "'")
     # fix space after apostrophe
-    s = re.sub(r"'\s", r"'", s)
+    s = s.replace("' ", "'")
     # fix space before comma
-    s = re.sub(r"\s,", r",", s)
+    s = s.replace(" ,", ",")
 
     for e in exceptions:
-        expected_sub = re.sub(r"\s", "", e)
-        s = s.replace(expected_sub, e)
+        expected_sub = "".join(e.split())
+        # exceptions without whitespace would be replaced by themselves
+        if expected_sub != e:
+            s = s.replace(expected_sub, e)
 
     return s
 
@@ -98,8 +133,9 @@ def fix_punct_spaces(string):
     str, corrected string
     """
 
-    fix_spaces = re.compile(r"\s*([?!.,]+(?:\s+[?!.,]+)*)\s*")
-    string = fix_spaces.sub(lambda x: "{} ".format(x.group(1).replace(" ", "")), string)
+    string = _fix_spaces_re.sub(
+        lambda x: "{} ".format(x.group(1).replace(" ", "")), string
+    )
     string = string.replace(" ' ", "'")
     string = string.replace(' " ', '"')
     return string.strip()
@@ -157,6 +193,11 @@ def move2completed(from_dir, filename, new_folder="completed", verbose=False):
 """
 
 
+# bump when the cleaning below changes, so cached pages get postprocessed again
+POSTPROCESS_VERSION = 1
+# bump when the confidence-gated cleaning (gated_postprocess) changes
+GATED_POSTPROCESS_VERSION = 2
+
 custom_replace_list = {
     "t0": "to",
     "'$": "'s",
@@ -173,7 +214,7 @@ replace_corr_exceptions = {
 }
 
 
-spell = SpellChecker()
+lexicon = get_lexicon()
 
 
 def check_word_spelling(word: str) -> bool:
@@ -185,9 +226,34 @@ def check_word_spelling(word: str) -> bool:
         bool: True if word is spelled correctly, False if not
     """
 
-    misspelled = spell.unknown([word])
+    return lexicon.is_known(word)
 
-    return len(misspelled) == 0
+
+def is_usable_text_layer(
+    text: str, min_chars: int = 20, min_known_ratio: float = 0.5
+) -> bool:
+    """
+    is_usable_text_layer - decide whether text extracted from a PDF page can be used instead of OCR
+    Args:
+        text (str): text from the page's text layer
+        min_chars (int, optional): pages with fewer non-space characters are treated as scans. Defaults to 20.
+        min_known_ratio (float, optional): minimum share of dictionary words, below that the text is
+            considered garbage (e.g. a broken font encoding). Defaults to 0.5.
+    Returns:
+        bool: True if the text is usable
+    """
+    chars = "".join(text.split())
+    if len(chars) < min_chars:
+        return False
+    # unmapped glyphs and replacement characters mean the font encoding is broken
+    if "(cid:" in text or chars.count("\ufffd") / len(chars) > 0.01:
+        return False
+    if sum(c.isalnum() for c in chars) / len(chars) < 0.6:
+        return False
+    words = [w.lower() for w in re.findall(r"[^\W\d_]{2,}", text)]
+    if not words:
+        return False
+    return sum(lexicon.known_mask(words)) >= min_known_ratio * len(words)
 
 
 def eval_and_replace(text: str, match_token: str = "- ") -> str:
@@ -200,26 +266,7 @@ def eval_and_replace(text: str, match_token: str = "- ") -> str:
         str:  text with replaced tokens
     """
 
-    if match_token not in text:
-        return text
-    else:
-        while True:
-            full_before_text = text.split(match_token, maxsplit=1)[0]
-            before_text = [
-                char for char in full_before_text.split()[-1] if char.isalpha()
-            ]
-            before_text = "".join(before_text)
-            full_after_text = text.split(match_token, maxsplit=1)[-1]
-            after_text = [char for char in full_after_text.split()[0] if char.isalpha()]
-            after_text = "".join(after_text)
-            full_text = before_text + after_text
-            if check_word_spelling(full_text):
-                text = full_before_text + full_after_text
-            else:
-                text = full_before_text + " " + full_after_text
-            if match_token not in text:
-                break
-        return text
+    return dehyphenate(text, check_word_spelling, match_token=match_token)
 
 
 def cleantxt_ocr(ugly_text, lower=False, lang: str = "en") -> str:
@@ -274,7 +321,11 @@ def format_ocr_out(OCR_data):
 def postprocess(text: str) -> str:
     """to be used after recombining the lines"""
 
-    proc = corr(cleantxt_ocr(text))
+    return _postprocess_cleaned(corr(cleantxt_ocr(text)))
+
+
+def _postprocess_cleaned(proc: str) -> str:
+    """the steps of postprocess after the text cleanup: replacements, spacing and dehyphenation"""
 
     for k, v in custom_replace_list.items():
         proc = proc.replace(str(k), str(v))
@@ -287,48 +338,780 @@ def postprocess(text: str) -> str:
     return eval_and_replace(proc)
 
 
+# text already through clean-text and corr only changes in a second clean-text pass if it has one
+# of these: an HTML entity, an email, a URL, an emoji alias or a backtick. Non-ASCII text always may.
+_recleanable_re = re.compile(
+    r"&#?[0-9A-Za-z]{1,24};|[@`]|://|www\d{0,3}\.|:[^\s:]+:|[(<{\[]at[)>}\]]", re.IGNORECASE
+)
+# corr only changes its own output if it has one of these
+_corr_patterns = (" ?", " .", " !", ' "', " '", "' ", " ,")
+
+
+def _normalize_cleaned(text: str) -> str:
+    """
+    _normalize_cleaned - the rest of normalize_ocr_text after its first clean-text and corr pass.
+    postprocess cleans the text again and runs corr again, each pass is skipped when it cannot change the text.
+    """
+    if not text.isascii() or _recleanable_re.search(text):
+        text = corr(cleantxt_ocr(text))
+    elif any(pattern in text for pattern in _corr_patterns):
+        text = corr(text)
+    return _postprocess_cleaned(text)
+
+
+def normalize_ocr_text(OCR_data) -> str:
+    """
+    normalize_ocr_text - the full cleaning of a page of OCR output, same as postprocess(format_ocr_out(OCR_data))
+    but the second clean-text and corr passes only run on text they can still change
+    Args:
+        OCR_data (str or list): raw OCR text of a page, or a list of its lines
+    Returns:
+        str: the cleaned text
+    """
+    return _normalize_cleaned(format_ocr_out(OCR_data))
+
+
+# words made of these characters come out of the text cleanup unchanged, unless they are masked
+_passthrough_word_re = re.compile(r"[A-Za-z0-9.,;:!?'\"()\[\]%&$#*+=/<>_-]*")
+
+
+def _is_passthrough_word(value: str) -> bool:
+    """
+    whether the text cleanup leaves a word as it is: plain ASCII, not a URL or email it would mask,
+    without two colons, which its emoji handling can read as an alias like :v:, and without &, which
+    its unicode fixes can read as the start of an HTML entity like &amp;
+    """
+    if not _passthrough_word_re.fullmatch(value) or value.count(":") > 1 or "&" in value:
+        return False
+    # URLs and emails all contain a dot or a colon, most words have neither
+    if "." in value or ":" in value:
+        return not (URL_REGEX.search(value) or EMAIL_REGEX.search(value))
+    return True
+
+
+@lru_cache(maxsize=None)
+def _normalize_cost_per_char() -> float:
+    """seconds normalize_ocr_text takes per character, measured once on a sample text"""
+    sample = "The quick brown fox jumps over the lazy dog, then it sleeps. " * 64
+    normalize_ocr_text(sample)
+    st = time.perf_counter()
+    normalize_ocr_text(sample)
+    return (time.perf_counter() - st) / len(sample)
+
+
+def gated_postprocess(words: OCRWords, min_confidence: float = 0.9) -> tuple:
+    """
+    gated_postprocess - confidence-gated version of normalize_ocr_text for OCR'd pages
+    Plain ASCII words recognized with at least `min_confidence` pass straight through, only the other
+    words go through the text cleanup. Hyphen joins are still checked against the dictionary.
+    Args:
+        words (OCRWords): the OCR words of one or more pages
+        min_confidence (float, optional): recognition confidence from which words are trusted. Defaults to 0.9.
+    Returns:
+        tuple: the cleaned text of each page, and a dict with the number of words passed through and
+            cleaned, the postprocessing time and the estimated time saved over normalize_ocr_text
+    """
+    st = time.perf_counter()
+    trusted = (words.confidence >= min_confidence).tolist()
+    # page -> runs of consecutive words that are all trusted or all not
+    spans = {}
+    for value, ok, page_num in zip(words.values, trusted, words.page.tolist()):
+        ok = ok and _is_passthrough_word(value)
+        page_spans = spans.setdefault(page_num, [])
+        if page_spans and page_spans[-1][0] == ok:
+            page_spans[-1][1].append(value)
+        else:
+            page_spans.append((ok, [value]))
+
+    texts = []
+    num_passed = 0
+    for page_num in words.page_numbers.tolist():
+        page_spans = spans.get(page_num, [])
+        page_text = " ".join(value for _, span in page_spans for value in span)
+        if "&" in page_text and "<" in page_text:
+            # HTML entities are only decoded in text without a <, so a span can only be cleaned
+            # the way the whole page would be when the page has no <
+            texts.append(normalize_ocr_text(page_text))
+            continue
+        # the pieces are the page after the first clean-text pass, then the rest is normalize_ocr_text
+        pieces = [
+            " ".join(span) if ok else cleantxt_ocr(" ".join(span))
+            for ok, span in page_spans
+        ]
+        num_passed += sum(len(span) for ok, span in page_spans if ok)
+        texts.append(_normalize_cleaned(corr(" ".join(piece for piece in pieces if piece))))
+
+    runtime = time.perf_counter() - st
+    full_estimate = _normalize_cost_per_char() * (len(words.chars) + len(words))
+    stats = {
+        "passed_words": num_passed,
+        "cleaned_words": len(words) - num_passed,
+        "postprocess_time": runtime,
+        "time_saved": max(0.0, full_estimate - runtime),
+    }
+    return texts, stats
+
+
 def result2text(result, as_text=False) -> str or list:
     """Convert OCR result to text"""
 
-    full_doc = []
-    for i, page in enumerate(result.pages, start=1):
-        text = ""
-        for block in page.blocks:
-            text += "\n\t"
-            for line in block.lines:
-                for word in line.words:
-                    # print(dir(word))
-                    text += word.value + " "
-        full_doc.append(text)
+    full_doc = [
+        "".join(
+            "\n\t" + "".join(word.value + " " for line in block.lines for word in line.words)
+            for block in page.blocks
+        )
+        for page in result.pages
+    ]
 
     return "\n".join(full_doc) if as_text else full_doc
 
 
+def result2words(result, page_numbers=None) -> OCRWords:
+    """
+    result2words - convert an OCR result to structured words with geometry and confidence
+    Args:
+        result (Document): output of a doctr OCR predictor
+        page_numbers (list, optional): 1-based page number of each result page. Defaults to 1, 2, ...
+    Returns:
+        OCRWords: the words, `.page_texts()` gives the same text as result2text
+    """
+    return OCRWords.from_result(result, page_numbers=page_numbers)
+
+
+"""## parallel OCR
+"""
+
+# the OCR predictors of a pool worker, loaded once by _init_ocr_worker
+_worker_ocr_pool = None
+
+
+def _init_ocr_worker(num_threads: int = 1, backend: str = "torch", profile: str = None):
+    """
+    _init_ocr_worker - process pool initializer, loads the OCR predictor once per worker
+    Args:
+        num_threads (int, optional): torch intra-op threads for this worker. Defaults to 1.
+        backend (str, optional): inference backend, see ocr_models.build_ocr_predictor. Defaults to "torch".
+        profile (str, optional): speed/accuracy profile, see ocr_models.OCR_PROFILES. Defaults to None.
+    """
+    global _worker_ocr_pool
+    import torch
+
+    torch.set_num_threads(num_threads)
+    torch.set_num_interop_threads(1)
+    _worker_ocr_pool = get_ocr_model_pool(
+        size=1, backend=backend, **get_ocr_profile(profile)["predictor"]
+    )
+    _worker_ocr_pool.warmup()
+
+
+def _run_ocr(ocr_model, pages: list, page_numbers: list = None) -> tuple:
+    """
+    _run_ocr - run a predictor on pages and convert the result to words, with the stats of the call
+    Returns:
+        tuple: the OCRWords, and a dict with the seconds spent by stage (ocr, of which detection and
+            recognition, then words) and the calls to the detection and recognition networks
+    """
+    take_model_stats(ocr_model)  # drop what ran outside this call, e.g. the warmup
+    st = time.perf_counter()
+    result = ocr_model(pages)
+    ocr_time = time.perf_counter() - st
+    st = time.perf_counter()
+    words = result2words(result, page_numbers=page_numbers)
+    timings, calls = take_model_stats(ocr_model)
+    timings.update(ocr=ocr_time, words=time.perf_counter() - st)
+    return words, {"timings": timings, "model_calls": calls}
+
+
+def _ocr_pages_worker(pages: list, page_numbers: list = None) -> tuple:
+    """run the worker's OCR predictor on a chunk of pages, return their structured words and the OCR stats"""
+    with _worker_ocr_pool.acquire() as ocr_model:
+        words, stats = _run_ocr(ocr_model, pages, page_numbers=page_numbers)
+    stats["worker_peak_rss_mb"] = peak_rss_mb()
+    return words, stats
+
+
+def _ocr_pool_key(num_workers: int, backend: str, profile: str) -> tuple:
+    return ("ocr", num_workers, backend, profile or DEFAULT_OCR_PROFILE)
+
+
+def get_ocr_pool(num_workers: int, backend: str = "torch", profile: str = None) -> ProcessPoolExecutor:
+    """
+    get_ocr_pool - get a process pool of OCR workers, created on first use and kept warm
+    Args:
+        num_workers (int): number of worker processes
+        backend (str, optional): inference backend of the workers' predictors. Defaults to "torch".
+        profile (str, optional): speed/accuracy profile of the workers' predictors. Defaults to None.
+    Returns:
+        ProcessPoolExecutor: the pool, the CPU thread budget is split evenly across workers
+    """
+    profile = profile or DEFAULT_OCR_PROFILE
+    num_threads = max(1, (os.cpu_count() or 1) // num_workers)
+    return get_process_pool(
+        _ocr_pool_key(num_workers, backend, profile),
+        num_workers,
+        initializer=_init_ocr_worker,
+        initargs=(num_threads, backend, profile),
+    )
+
+
+def shutdown_ocr_pools():
+    """shut down all OCR process pools"""
+    shutdown_process_pools("ocr")
+
+
+# times iter_ocr_parallel replaces a broken pool during a document before it gives up on it
+MAX_OCR_POOL_RESTARTS = 2
+
+
+def iter_ocr_parallel(records, num_workers: int = 2, backend: str = "torch", profile: str = None):
+    """
+    iter_ocr_parallel - run OCR on page records across a process pool, one page per task
+    If a worker dies, e.g. out of memory, the pool is replaced and the pages in flight are sent again,
+    up to MAX_OCR_POOL_RESTARTS times per call.
+    Args:
+        records (iterable): page records (see iter_page_records), consumed lazily.
+            Records that already have their raw_text are passed through without OCR.
+        num_workers (int, optional): number of worker processes. Defaults to 2.
+        backend (str, optional): inference backend, see ocr_models.build_ocr_predictor. Defaults to "torch".
+        profile (str, optional): speed/accuracy profile, see ocr_models.OCR_PROFILES. Defaults to None.
+    Yields:
+        dict: the records with raw_text filled in, in the original page order
+    """
+    pages = _OCRPagesInFlight(num_workers, backend, profile)
+    # at most two pages per worker are in flight, so memory stays bounded
+    for record in records:
+        pages.submit(record)
+        if len(pages.pending) >= 2 * num_workers:
+            yield pages.resolve()
+    while pages.pending:
+        yield pages.resolve()
+
+
+class _OCRPagesInFlight:
+    """the pages of iter_ocr_parallel sent to the OCR pool, with their images until they are done, so
+    they can be sent again to a new pool if a worker dies and breaks the current one"""
+
+    def __init__(self, num_workers: int, backend: str, profile: str):
+        self.pool_args = (num_workers, backend, profile)
+        self.pool = get_ocr_pool(num_workers, backend=backend, profile=profile)
+        self.restarts = 0
+        # [record, image, future] of each page, in page order
+        self.pending = deque()
+
+    def submit(self, record):
+        entry = [record, record["image"], None]
+        record["image"] = None
+        self.pending.append(entry)
+        if record["raw_text"] is None:
+            entry[2] = self._submit(entry)
+
+    def _submit(self, entry):
+        while True:
+            try:
+                return self.pool.submit(_ocr_pages_worker, [entry[1]], [entry[0]["page"]])
+            except BrokenProcessPool as e:
+                self._restart(e)
+
+    def _restart(self, error: BrokenProcessPool):
+        """replace the broken pool and send the pages it lost to the new one"""
+        self.restarts += 1
+        if self.restarts > MAX_OCR_POOL_RESTARTS:
+            raise error
+        num_workers, backend, profile = self.pool_args
+        logging.warning(f"OCR pool broke ({error!r}), sending the pages in flight to a new pool")
+        discard_process_pool(_ocr_pool_key(num_workers, backend, profile), self.pool)
+        self.pool = get_ocr_pool(num_workers, backend=backend, profile=profile)
+        for entry in self.pending:
+            future = entry[2]
+            if future is not None and future.done() and isinstance(future.exception(), BrokenProcessPool):
+                entry[2] = None  # not sent twice if the new pool breaks as well
+                entry[2] = self._submit(entry)
+
+    def resolve(self) -> dict:
+        """wait for the first page in flight, return its record with the OCR results"""
+        entry = self.pending[0]
+        record = entry[0]
+        while entry[2] is not None:
+            try:
+                record["words"], stats = entry[2].result()
+            except BrokenProcessPool as e:
+                self._restart(e)
+                continue
+            _add_ocr_stats(record, stats)
+            break
+        self.pending.popleft()
+        return record
+
+
+def _add_ocr_stats(record, stats: dict):
+    """fill in the raw text of an OCR'd page record and merge the stats of its OCR call"""
+    record["raw_text"] = record["words"].page_texts()[0]
+    record["timings"].update(stats["timings"])
+    record["model_calls"] = stats["model_calls"]
+    record["worker_peak_rss_mb"] = stats.get("worker_peak_rss_mb")
+
+
+"""## streaming OCR
+"""
+
+
+def get_pdf_page_count(PDF_file) -> int:
+    """get the number of pages in a PDF file from its page tree, without rendering anything"""
+    pdf = pdfium.PdfDocument(str(PDF_file))
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def parse_page_range(max_pages, total_pages: int) -> list:
+    """
+    parse_page_range - resolve a page selection to the 0-based indices of the pages to render
+    Args:
+        max_pages (int, str or iterable): the first n pages if an int, otherwise 1-based page
+            numbers and ranges, e.g. "1-5,8,12-" or [1, 2, 7]
+        total_pages (int): number of pages in the PDF
+    Returns:
+        list: sorted 0-based page indices, pages past the end of the PDF are dropped
+    """
+    if isinstance(max_pages, int):
+        return list(range(min(max_pages, total_pages)))
+
+    if isinstance(max_pages, str):
+        page_nums = set()
+        for part in max_pages.replace(" ", "").split(","):
+            if not part:
+                continue
+            start, sep, end = part.partition("-")
+            if not start.isdigit() or (end and not end.isdigit()):
+                raise ValueError(f"invalid page range: {part}")
+            start = int(start)
+            end = (int(end) if end else total_pages) if sep else start
+            page_nums.update(range(start, end + 1))
+    else:
+        page_nums = {int(p) for p in max_pages}
+
+    if any(p < 1 for p in page_nums):
+        raise ValueError("page numbers start at 1")
+    dropped = [p for p in page_nums if p > total_pages]
+    if dropped:
+        logging.warning(
+            f"ignoring pages {sorted(dropped)}, the PDF only has {total_pages} pages"
+        )
+    return sorted(p - 1 for p in page_nums if p <= total_pages)
+
+
+def _render_page(pdf, index: int, dpi: int = 144):
+    """render one page of an open pypdfium2 document as a H x W x 3 RGB array"""
+    page = pdf[index]
+    try:
+        return page.render(scale=dpi / 72, rev_byteorder=True).to_numpy()
+    finally:
+        page.close()
+
+
+# pages with a smaller share of inked pixels are skipped as blank
+BLANK_INK_RATIO = 0.0005
+
+
+def is_blank_page(
+    image,
+    min_ink_ratio: float = BLANK_INK_RATIO,
+    ink_contrast: int = 32,
+    mark_contrast: int = 10,
+    max_mark_ratio: float = 0.005,
+    block: int = 4,
+) -> bool:
+    """
+    is_blank_page - check whether a rasterized page has no content worth running OCR on
+    The page is averaged over block x block pixel tiles and each tile is compared with the paper,
+    the most common tile brightness, in either direction, so light text on a dark page counts as
+    well as dark text on a light one. A page is blank only if almost no tile is ink (`ink_contrast`
+    levels off the paper) and almost no tile is even faintly marked (`mark_contrast` levels off,
+    e.g. pencil or a light scan). Marked tiles without a marked neighbour are scanner specks and are
+    not counted.
+    Args:
+        image (np.ndarray): the page, H x W x 3 RGB or H x W grayscale
+        min_ink_ratio (float, optional): share of ink tiles under which the page can be blank. Defaults to
+            0.0005, which keeps a page with a single short heading and drops a lone page number.
+        ink_contrast (int, optional): difference from the paper, out of 255, that counts as ink. Defaults to 32.
+        mark_contrast (int, optional): difference from the paper that counts as a faint mark. Defaults to 10.
+        max_mark_ratio (float, optional): share of faintly marked tiles under which the page can be blank. Defaults to 0.005.
+        block (int, optional): tile size in pixels. Defaults to 4.
+    Returns:
+        bool: True if the page can be skipped
+    """
+    if image.ndim == 2:
+        image = image[..., None]
+    h, w = image.shape[0] // block * block, image.shape[1] // block * block
+    if h == 0 or w == 0:
+        return True
+    # one integer sum over each tile and its channels, the brightness of the tile
+    tiles = image[:h, :w].reshape(h // block, block, w // block, block, -1).sum(
+        axis=(1, 3, 4), dtype=np.uint32
+    ) / (block * block * image.shape[2])
+    paper = np.bincount(tiles.astype(np.uint8).ravel(), minlength=256).argmax()
+    deviation = np.abs(tiles - paper)
+    if np.count_nonzero(deviation > ink_contrast) >= min_ink_ratio * tiles.size:
+        return False
+    marked = deviation > mark_contrast
+    neighbour = np.zeros_like(marked)
+    neighbour[:, 1:] |= marked[:, :-1]
+    neighbour[:, :-1] |= marked[:, 1:]
+    neighbour[1:] |= marked[:-1]
+    neighbour[:-1] |= marked[1:]
+    return np.count_nonzero(marked & neighbour) < max_mark_ratio * tiles.size
+
+
+def iter_pdf_pages(PDF_file, max_pages=20, dpi: int = 144):
+    """
+    iter_pdf_pages - rasterize the selected pages of a PDF file one at a time, other pages are never rendered
+    Args:
+        PDF_file (str or Path): the PDF file to rasterize
+        max_pages (int, str or iterable, optional): page selection, see parse_page_range. Defaults to 20.
+        dpi (int, optional): rendering resolution. Defaults to 144.
+    Yields:
+        tuple: the 1-based page number and the page as a H x W x 3 RGB array
+    """
+    pdf = pdfium.PdfDocument(str(PDF_file))
+    try:
+        for i in parse_page_range(max_pages, len(pdf)):
+            yield i + 1, _render_page(pdf, i, dpi=dpi)
+    finally:
+        pdf.close()
+
+
+def iter_page_records(
+    PDF_file,
+    max_pages=20,
+    dpi: int = 144,
+    cache=None,
+    config_id=None,
+    text_layer: bool = False,
+    postprocess_version=POSTPROCESS_VERSION,
+    blank_threshold: float = BLANK_INK_RATIO,
+):
+    """
+    iter_page_records - prepare the selected pages for OCR, one record per page
+    A page is taken from the PDF text layer if `text_layer` is set and that text is usable, otherwise
+    it is rasterized, skipped with an empty text if it is blank, or looked up in the OCR cache.
+    Args:
+        PDF_file (str or Path): the PDF file
+        max_pages (int, str or iterable, optional): page selection, see parse_page_range. Defaults to 20.
+        dpi (int, optional): rendering resolution. Defaults to 144.
+        cache (OCRPageCache, optional): the page cache, None to skip the lookup. Defaults to None.
+        config_id (str, optional): the OCR model config the cache entries must match. Defaults to None.
+        text_layer (bool, optional): use the text layer of born-digital pages instead of OCR. Defaults to False.
+        postprocess_version (optional): cached clean text is only reused if it was made by this
+            postprocessing. Defaults to POSTPROCESS_VERSION.
+        blank_threshold (float, optional): ink ratio under which a rendered page is blank, see
+            is_blank_page, 0 or None to run OCR on every page. Defaults to BLANK_INK_RATIO.
+    Yields:
+        dict: a page record - page number, rasterized image, cache key, raw/clean text and OCR words
+            if already known, the source of the text ("text", "blank", "cache" or "ocr"), and the
+            seconds spent on the page by each stage so far
+    """
+    reader = None
+    if text_layer:
+        try:
+            reader = PdfReader(str(PDF_file))
+        except Exception as e:  # a text layer pypdf cannot read is as good as none
+            logging.warning(f"cannot read the text layer of {PDF_file}, running OCR on every page: {e!r}")
+    pdf = pdfium.PdfDocument(str(PDF_file))
+    try:
+        for i in parse_page_range(max_pages, len(pdf)):
+            record = {
+                "page": i + 1,
+                "image": None,
+                "key": None,
+                "raw_text": None,
+                "words": None,
+                "text": None,
+                "source": "ocr",
+                "timings": {},
+                "model_calls": {},
+                "worker_peak_rss_mb": None,
+            }
+            timings = record["timings"]
+            if reader is not None:
+                st = time.perf_counter()
+                try:
+                    layer_text = reader.pages[i].extract_text() or ""
+                except Exception as e:  # e.g. a malformed content stream or a font pypdf cannot decode
+                    logging.warning(f"cannot extract the text layer of page {i + 1}, running OCR on it: {e!r}")
+                    layer_text = ""
+                usable = is_usable_text_layer(layer_text)
+                timings["text_layer"] = time.perf_counter() - st
+                if usable:
+                    record["raw_text"] = layer_text
+                    record["source"] = "text"
+                    yield record
+                    continue
+
+            st = time.perf_counter()
+            record["image"] = _render_page(pdf, i, dpi=dpi)
+            timings["render"] = time.perf_counter() - st
+            if blank_threshold:
+                st = time.perf_counter()
+                blank = is_blank_page(record["image"], min_ink_ratio=blank_threshold)
+                timings["blank_check"] = time.perf_counter() - st
+                if blank:
+                    record.update(image=None, raw_text="", text="", source="blank")
+                    yield record
+                    continue
+            if cache is not None:
+                st = time.perf_counter()
+                record["key"] = cache.page_key(record["image"], config_id)
+                entry = cache.get(record["key"])
+                if entry is not None:
+                    record["raw_text"] = entry["raw_text"]
+                    if entry["words"] is not None:
+                        record["words"] = OCRWords.from_bytes(entry["words"])
+                    record["source"] = "cache"
+                    if entry["postprocess_version"] == str(postprocess_version):
+                        record["text"] = entry["clean_text"]
+                timings["cache"] = time.perf_counter() - st
+            yield record
+    finally:
+        pdf.close()
+
+
+def iter_PDF_to_Text(
+    PDF_file,
+    ocr_model=None,
+    max_pages=20,
+    num_workers: int = 1,
+    dpi: int = None,
+    cache=True,
+    text_layer: bool = False,
+    min_confidence: float = None,
+    backend: str = "torch",
+    profile: str = None,
+    blank_threshold: float = BLANK_INK_RATIO,
+    metrics: OCRRunMetrics = None,
+):
+    """
+    iter_PDF_to_Text - run OCR on a PDF file, yielding each page as soon as it is done
+    Only one rasterized page (or two per worker if num_workers > 1) is held in memory at a time.
+    Args:
+        PDF_file (str or Path): the PDF file to convert
+        ocr_model (optional): a doctr OCR predictor, only used when num_workers is 1. Defaults to None,
+            which borrows one from the process-wide pool in ocr_models.
+        max_pages (int, str or iterable, optional): number of pages to convert, or the 1-based
+            pages and ranges to convert, e.g. "1-5,8". Defaults to 20.
+        num_workers (int, optional): if > 1, run the pages on that many worker processes. Defaults to 1.
+        dpi (int, optional): rendering resolution of the pages. Defaults to the profile's, 144 for "balanced".
+        cache (bool or OCRPageCache, optional): reuse and store per-page results in the process-wide
+            page cache if True, in the given cache, or not at all if False. Defaults to True.
+        text_layer (bool, optional): hybrid mode, take the text of born-digital pages from the PDF
+            text layer and only run OCR on pages without usable text. Defaults to False.
+        min_confidence (float, optional): if set, clean OCR'd pages with gated_postprocess, so only
+            words below this confidence go through the full text cleanup. Defaults to None.
+        backend (str, optional): CPU inference backend of the OCR models: "torch", "int8" (dynamic
+            int8 quantization of the recognition model only) or "onnx" (onnxruntime, needs onnxtr),
+            see ocr_models.build_ocr_predictor.
+            Ignored if an ocr_model is given. Defaults to "torch".
+        profile (str, optional): speed/accuracy profile, "fast", "balanced" or "accurate": the detection
+            and recognition architectures, their batch sizes and the default dpi, see
+            ocr_models.OCR_PROFILES. The architectures are ignored if an ocr_model is given.
+            Defaults to None, the balanced profile.
+        blank_threshold (float, optional): skip rendered pages with a smaller share of ink, they get an
+            empty text, see is_blank_page. 0 or None runs OCR on every page. Defaults to BLANK_INK_RATIO.
+        metrics (OCRRunMetrics, optional): collects the page metrics and passes them on to the OCR
+            hooks, see ocr_metrics. Defaults to None, a new one with the registered hooks.
+    Yields:
+        dict: the page number, its cleaned text and stats, its OCR words with geometry and
+            confidence (None for pages taken from the text layer), the seconds spent on it by
+            each stage (text_layer, render, cache, ocr - of which detection and recognition -,
+            words, format and postprocess) and the calls to the detection and recognition networks
+    """
+    PDF_file = Path(PDF_file)
+    if cache is True:
+        cache = get_ocr_cache()
+    cache = cache or None
+    settings = get_ocr_profile(profile)
+    dpi = dpi or settings["dpi"]
+    config_id = ocr_config_id(
+        ocr_model if num_workers == 1 else None, backend=backend, **settings["predictor"]
+    )
+    postprocess_version = POSTPROCESS_VERSION
+    if min_confidence is not None:
+        postprocess_version = (
+            f"{POSTPROCESS_VERSION}|gated={GATED_POSTPROCESS_VERSION}|min_confidence={min_confidence}"
+        )
+    records = iter_page_records(
+        PDF_file,
+        max_pages=max_pages,
+        dpi=dpi,
+        cache=cache,
+        config_id=config_id,
+        text_layer=text_layer,
+        postprocess_version=postprocess_version,
+        blank_threshold=blank_threshold,
+    )
+    if num_workers > 1:
+        records = iter_ocr_parallel(
+            records, num_workers=num_workers, backend=backend, profile=profile
+        )
+    else:
+        records = _iter_ocr(records, ocr_model, backend=backend, profile=profile)
+
+    metrics = metrics or OCRRunMetrics(PDF_file.name)
+    metrics.start(
+        num_workers=num_workers,
+        dpi=dpi,
+        max_pages=max_pages,
+        text_layer=text_layer,
+        backend=getattr(ocr_model, "_ocr_backend", "torch") if ocr_model is not None else backend,
+        profile=profile or DEFAULT_OCR_PROFILE,
+    )
+    completed = False
+    try:
+        st = time.perf_counter()
+        for record in records:
+            timings = record["timings"]
+            time_saved = 0.0
+            if record["text"] is None:
+                post_st = time.perf_counter()
+                if min_confidence is not None and record["words"] is not None:
+                    texts, gate_stats = gated_postprocess(record["words"], min_confidence)
+                    record["text"] = texts[0]
+                    time_saved = gate_stats["time_saved"]
+                else:
+                    # same as normalize_ocr_text, timed by step
+                    formatted = format_ocr_out(record["raw_text"])
+                    timings["format"] = time.perf_counter() - post_st
+                    post_st = time.perf_counter()
+                    record["text"] = _normalize_cleaned(formatted)
+                timings["postprocess"] = time.perf_counter() - post_st
+                if cache is not None and record["key"] is not None:
+                    cache_st = time.perf_counter()
+                    cache.put(
+                        record["key"],
+                        record["raw_text"],
+                        record["text"],
+                        postprocess_version=postprocess_version,
+                        words=record["words"].to_bytes() if record["words"] else None,
+                    )
+                    timings["cache"] = timings.get("cache", 0.0) + time.perf_counter() - cache_st
+            page_rt = time.perf_counter() - st
+            page = {
+                "page": record["page"],
+                "text": record["text"],
+                "raw_length": len(record["raw_text"]),
+                "length": len(record["text"]),
+                "source": record["source"],
+                "words": record["words"],
+                "postprocess_time": round(timings.get("postprocess", 0.0), 4),
+                "postprocess_time_saved": round(time_saved, 4),
+                "timings": {k: round(v, 4) for k, v in timings.items()},
+                "model_calls": record["model_calls"],
+                "worker_peak_rss_mb": record["worker_peak_rss_mb"],
+                "runtime": round(page_rt, 2),
+            }
+            metrics.add_page(page)
+            yield page
+            st = time.perf_counter()
+        completed = True
+    finally:
+        metrics.finish(completed=completed)
+
+
+def _iter_ocr(records, ocr_model=None, backend: str = "torch", profile: str = None):
+    """
+    _iter_ocr - run OCR on page records one at a time, filling in their raw_text
+    If no ocr_model is given, a predictor of the backend and profile is borrowed from the process-wide
+    pool for each page, so documents converted concurrently take turns instead of one holding it.
+    """
+    pool = None
+    for record in records:
+        if record["raw_text"] is None:
+            if ocr_model is not None:
+                record["words"], stats = _run_ocr(
+                    ocr_model, [record["image"]], page_numbers=[record["page"]]
+                )
+            else:
+                if pool is None:
+                    pool = get_ocr_model_pool(backend=backend, **get_ocr_profile(profile)["predictor"])
+                with pool.acquire() as model:
+                    record["words"], stats = _run_ocr(
+                        model, [record["image"]], page_numbers=[record["page"]]
+                    )
+            _add_ocr_stats(record, stats)
+        record["image"] = None
+        yield record
+
+
 def convert_PDF_to_Text(
     PDF_file,
     ocr_model=None,
-    max_pages: int = 20,
+    max_pages=20,
+    num_workers: int = 1,
+    dpi: int = None,
+    cache=True,
+    text_layer: bool = False,
+    min_confidence: float = None,
+    backend: str = "torch",
+    profile: str = None,
+    blank_threshold: float = BLANK_INK_RATIO,
+    hooks: list = None,
 ):
+    """
+    convert_PDF_to_Text - run OCR on a PDF file and clean the resulting text
+    Args:
+        PDF_file (str or Path): the PDF file to convert
+        ocr_model (optional): a doctr OCR predictor, only used when num_workers is 1. Defaults to None,
+            which borrows one from the process-wide pool in ocr_models.
+        max_pages (int, str or iterable, optional): number of pages to convert, or the 1-based
+            pages and ranges to convert, e.g. "1-5,8". Defaults to 20.
+        num_workers (int, optional): if > 1, split the pages across that many worker processes. Defaults to 1.
+        dpi (int, optional): rendering resolution of the pages. Defaults to the profile's, 144 for "balanced".
+        cache (bool or OCRPageCache, optional): per-page result cache, see iter_PDF_to_Text. Defaults to True.
+        text_layer (bool, optional): hybrid mode, see iter_PDF_to_Text. Defaults to False.
+        min_confidence (float, optional): confidence-gated postprocessing, see iter_PDF_to_Text. Defaults to None.
+        backend (str, optional): "torch", "int8" or "onnx" inference, see iter_PDF_to_Text. Defaults to "torch".
+        profile (str, optional): "fast", "balanced" or "accurate", see iter_PDF_to_Text. Defaults to None (balanced).
+        blank_threshold (float, optional): blank page pre-filter, see iter_PDF_to_Text. Defaults to BLANK_INK_RATIO.
+        hooks (list, optional): OCRHook objects notified of this run, on top of the ones registered
+            with ocr_metrics.add_ocr_hook. Defaults to None.
+    Returns:
+        dict: the converted text and conversion stats, including the seconds spent by each stage,
+            the model calls and peak memory, and the metrics of each page
+    """
 
     st = time.perf_counter()
     PDF_file = Path(PDF_file)
-    ocr_model = ocr_predictor(pretrained=True) if ocr_model is None else ocr_model
     logging.info(f"starting OCR on {PDF_file.name}")
-    doc = DocumentFile.from_pdf(PDF_file)
+    total_pages = get_pdf_page_count(PDF_file)
     truncated = False
-    if len(doc) > max_pages:
+    if isinstance(max_pages, int) and total_pages > max_pages:
         logging.warning(
-            f"PDF has {len(doc)} pages, which is more than {max_pages}.. truncating"
+            f"PDF has {total_pages} pages, which is more than {max_pages}.. truncating"
         )
-        doc = doc[:max_pages]
         truncated = True
+    num_pages = len(parse_page_range(max_pages, total_pages))
 
     # Analyze
-    logging.info(f"running OCR on {len(doc)} pages")
-    result = ocr_model(doc)
-    raw_text = result2text(result)
-    proc_text = [format_ocr_out(r) for r in raw_text]
-    fin_text = [postprocess(t) for t in proc_text]
+    num_workers = max(1, min(num_workers, num_pages))
+    logging.info(f"running OCR on {num_pages} pages with {num_workers} workers")
+    metrics = OCRRunMetrics(PDF_file.name, hooks=hooks)
+    pages = list(
+        iter_PDF_to_Text(
+            PDF_file,
+            ocr_model=ocr_model,
+            max_pages=max_pages,
+            num_workers=num_workers,
+            dpi=dpi,
+            cache=cache,
+            text_layer=text_layer,
+            min_confidence=min_confidence,
+            backend=backend,
+            profile=profile,
+            blank_threshold=blank_threshold,
+            metrics=metrics,
+        )
+    )
+    fin_text = [page["text"] for page in pages]
 
     ocr_results = "\n\n".join(fin_text)
 
@@ -337,10 +1120,29 @@ def convert_PDF_to_Text(
     logging.info("OCR complete")
 
     results_dict = {
-        "num_pages": len(doc),
+        "num_pages": num_pages,
+        "total_pages": total_pages,
         "runtime": round(fn_rt, 2),
+        "pages_per_sec": round(num_pages / fn_rt, 2) if fn_rt > 0 else None,
+        "num_workers": num_workers,
+        "profile": profile or DEFAULT_OCR_PROFILE,
+        "cached_pages": sum(page["source"] == "cache" for page in pages),
+        "text_layer_pages": sum(page["source"] == "text" for page in pages),
+        "blank_pages": sum(page["source"] == "blank" for page in pages),
+        "blank_time_saved": _blank_time_saved(pages),
+        "page_sources": {page["page"]: page["source"] for page in pages},
+        "postprocess_time": round(sum(page["postprocess_time"] for page in pages), 3),
+        "stage_times": metrics.summary["stage_times"],
+        "model_calls": metrics.summary["model_calls"],
+        "peak_rss_mb": metrics.summary["peak_rss_mb"],
+        "worker_peak_rss_mb": metrics.summary["worker_peak_rss_mb"],
+        "page_metrics": metrics.pages,
+        "postprocess_time_saved": round(
+            sum(page["postprocess_time_saved"] for page in pages), 3
+        ),
         "date": str(date.today()),
         "converted_text": ocr_results,
+        "words": OCRWords.concat([page["words"] for page in pages]),
         "truncated": truncated,
         "length": len(ocr_results),
     }
@@ -348,40 +1150,145 @@ def convert_PDF_to_Text(
     return results_dict
 
 
+def convert_PDF(
+    pdf_path,
+    language: str = "en",
+    max_pages=20,
+    num_workers: int = 1,
+    text_layer: bool = False,
+    min_confidence: float = None,
+    profile: str = None,
+    on_page=None,
+    output_dir=None,
+):
+    """
+    convert_PDF - convert a PDF file to a text file, writing each page as soon as it is converted
+    Nothing outside `output_dir` is written or removed, so requests working in their own workspace
+    (see workspaces.Workspace) can run at the same time.
+    Args:
+        pdf_path (str or Path): the PDF file
+        language (str, optional): language of the document. Defaults to "en".
+        max_pages (int, str or iterable, optional): page selection, see parse_page_range. Defaults to 20.
+        num_workers (int, optional): OCR worker processes. Defaults to 1.
+        text_layer (bool, optional): hybrid mode, see iter_PDF_to_Text. Defaults to False.
+        min_confidence (float, optional): confidence-gated postprocessing, see iter_PDF_to_Text. Defaults to None.
+        profile (str, optional): speed/accuracy profile, see iter_PDF_to_Text. Defaults to None.
+        on_page (callable, optional): called with each page dict as soon as it is converted. Defaults to None.
+        output_dir (str or Path, optional): folder of the text file. Defaults to the folder of the PDF.
+    Returns:
+        tuple: the converted text and the path of the text file, or an error message and None
+    """
+    st = time.perf_counter()
+
+    pdf_path = Path(pdf_path)
+    if pdf_path.suffix.lower() != ".pdf":
+        logging.error(f"File {pdf_path} is not a PDF file")
+        return "File is not a PDF file", None
+
+    # write each page to the output file as soon as it is converted
+    output_path = Path(output_dir or pdf_path.parent) / f"{pdf_path.stem}_OCR.txt"
+    pages_text = []
+    time_saved = 0.0
+    blank_pages = 0
+    with open(output_path, "w", encoding="utf-8", errors="ignore") as f:
+        for page in iter_PDF_to_Text(
+            pdf_path,
+            max_pages=max_pages,
+            num_workers=num_workers,
+            text_layer=text_layer,
+            min_confidence=min_confidence,
+            profile=profile,
+        ):
+            if pages_text:
+                f.write("\n\n")
+            f.write(page["text"])
+            f.flush()
+            pages_text.append(page["text"])
+            time_saved += page["postprocess_time_saved"]
+            blank_pages += page["source"] == "blank"
+            if on_page is not None:
+                on_page(page)
+    converted_txt = "\n\n".join(pages_text)
+
+    rt = round((time.perf_counter() - st) / 60, 2)
+    logging.info(f"converted {pdf_path.name} in {rt} minutes")
+    if min_confidence is not None:
+        logging.info(f"confidence-gated cleanup saved {time_saved:.2f}s of postprocessing")
+    if blank_pages:
+        logging.info(f"skipped {blank_pages} blank pages")
+
+    return converted_txt, str(output_path)
+
+
+def _blank_time_saved(pages: list) -> float or None:
+    """
+    _blank_time_saved - estimate the seconds the blank page filter saved: the mean OCR time of the
+    OCR'd pages for each skipped page, minus the time spent checking pages
+    Returns:
+        float: the estimate, 0 if no page was skipped, None if no page was OCR'd to estimate from
+    """
+    num_blank = sum(page["source"] == "blank" for page in pages)
+    if not num_blank:
+        # the checks still cost their time, it is reported in the blank_check stage
+        return 0.0
+    ocr_times = [
+        page["timings"].get("ocr", 0.0) + page["timings"].get("words", 0.0)
+        for page in pages
+        if page["source"] == "ocr"
+    ]
+    if not ocr_times:
+        return None
+    check_time = sum(page["timings"].get("blank_check", 0.0) for page in pages)
+    return round(num_blank * sum(ocr_times) / len(ocr_times) - check_time, 3)
+
+
 # @title translation functions
 
-lt = LibreTranslateAPI("https://translate.astian.org/")
+lt = LibreTranslateClient("https://translate.astian.org/", memory=True)
 
 
 def translate_text(text, source_l, target_l="en"):
 
-    return str(lt.translate(text, source_l, target_l))
+    return str(lt.translate_lines([text], source_l, target_l)[0])
 
 
-def translate_doc(filepath, lang_start, lang_end="en", verbose=False):
+def translate_doc(filepath, lang_start, lang_end="en", verbose=False, max_workers=4):
     """translate a document from lang_start to lang_end
         {'code': 'en', 'name': 'English'},
     {'code': 'fr', 'name': 'French'},
     {'code': 'de', 'name': 'German'},
-    {'code': 'it', 'name': 'Italian'},"""
+    {'code': 'it', 'name': 'Italian'}
+
+    Lines are sent in batches, max_workers requests at a time. Blank lines, repeated lines and lines
+    already in the translation memory are not sent. Each line keeps its line ending, trailing newline included."""
 
     src_folder = dirname(filepath)
     src_folder = Path(src_folder)
     trgt_folder = src_folder / f"translated_{lang_end}"
     trgt_folder.mkdir(exist_ok=True)
-    with open(filepath, "r", encoding="utf-8", errors="ignore") as f:
-        foreign_t = f.readlines()
+    # newline="" reads and writes \r\n as it is, and translate_lines keeps the whitespace around a line
+    with open(filepath, "r", encoding="utf-8", errors="ignore", newline="") as f:
+        foreign_t = f.read().splitlines(keepends=True)
     in_name = basename(filepath)
-    translated_doc = []
-    for line in tqdm(
-        foreign_t, total=len(foreign_t), desc="translating {}...".format(in_name[:10])
-    ):
-        translated_line = translate_text(line, lang_start, lang_end)
-        translated_doc.append(translated_line)
+    before = lt.stats()
+    with tqdm(
+        total=len(foreign_t), desc="translating {}...".format(in_name[:10])
+    ) as pbar:
+        translated_doc = lt.translate_lines(
+            foreign_t, lang_start, lang_end, max_workers=max_workers, on_batch=pbar.update
+        )
+    after = lt.stats()
+    segments = after["segments"] - before["segments"]
+    memory_hits = after["memory_hits"] - before["memory_hits"]
+    logging.info(
+        f"translated {in_name}: {segments} segments, "
+        f"{after['unique_segments'] - before['unique_segments']} unique, "
+        f"{memory_hits} from the translation memory, {after['requests'] - before['requests']} requests"
+    )
     t_out_name = "[To {}]".format(lang_end) + simple_rename(in_name) + ".txt"
     out_path = join(trgt_folder, t_out_name)
-    with open(out_path, "w", encoding="utf-8", errors="ignore") as f_o:
-        f_o.writelines(translated_doc)
+    with open(out_path, "w", encoding="utf-8", errors="ignore", newline="") as f_o:
+        f_o.write("".join(translated_doc))
     if verbose:
         print("finished translating the document! - ", datetime.now())
-    return out_path
\ No newline at end of file
+    return out_path
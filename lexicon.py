@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+lexicon.py - a process-wide word list for spelling checks, loaded once and shared by the OCR and docx tools
+"""
+
+import string
+import threading
+from functools import lru_cache
+
+from spellchecker import SpellChecker
+
+
+class Lexicon:
+    """
+    Lexicon - the dictionary of a pyspellchecker language as a frozen set, with memoized corrections
+    Membership follows SpellChecker.unknown: case-insensitive, and numbers, single punctuation marks
+    and very long tokens are never reported as unknown.
+    Args:
+        language (str, optional): pyspellchecker dictionary language. Defaults to "en".
+        cache_size (int, optional): number of corrections kept in the LRU cache. Defaults to 65536.
+    """
+
+    def __init__(self, language: str = "en", cache_size: int = 2**16):
+        self.language = language
+        self.spell = SpellChecker(language=language)
+        self.words = frozenset(self.spell.word_frequency.dictionary)
+        self._max_checked_length = self.spell.word_frequency.longest_word_length + 3
+        self._correction = lru_cache(maxsize=cache_size)(self.spell.correction)
+
+    def _should_check(self, word: str) -> bool:
+        """same rules as SpellChecker._check_if_should_check"""
+        if len(word) == 1 and word in string.punctuation:
+            return False
+        if len(word) > self._max_checked_length:
+            return False
+        if word.lower() in ("nan", "inf", "infinity"):
+            return True
+        try:
+            float(word)
+            return False
+        except ValueError:
+            return True
+
+    def is_known(self, word: str) -> bool:
+        """True if the word is spelled correctly, same as not SpellChecker.unknown([word])"""
+        return word.lower() in self.words or not self._should_check(word)
+
+    __contains__ = is_known
+
+    def known_mask(self, words) -> list:
+        """
+        known_mask - check many words at once
+        Args:
+            words (iterable): the words to check
+        Returns:
+            list: is_known of each word, in order
+        """
+        vocab = self.words
+        return [w.lower() in vocab or not self._should_check(w) for w in words]
+
+    def unknown(self, words) -> set:
+        """the lowercased words that are not in the dictionary, same as SpellChecker.unknown"""
+        return {w.lower() for w, ok in zip(words, self.known_mask(words)) if not ok}
+
+    def correction(self, word: str) -> str or None:
+        """the most likely spelling of a word, memoized, None if there is no candidate"""
+        return self._correction(word)
+
+    def corrections(self, words) -> dict:
+        """
+        corrections - correct many words at once, computing each distinct unknown word only once
+        Args:
+            words (iterable): the words to correct
+        Returns:
+            dict: unknown word -> its correction (None if there is no candidate)
+        """
+        return {
+            w: self.correction(w)
+            for w in dict.fromkeys(words)
+            if not self.is_known(w)
+        }
+
+    def cache_info(self):
+        """hit and miss counts of the correction cache"""
+        return self._correction.cache_info()
+
+
+_lexicons = {}
+_lexicons_lock = threading.Lock()
+
+
+def get_lexicon(language: str = "en") -> Lexicon:
+    """
+    get_lexicon - get the process-wide lexicon of a language, loading it on first use
+    Args:
+        language (str, optional): pyspellchecker dictionary language. Defaults to "en".
+    Returns:
+        Lexicon: the shared lexicon
+    """
+    with _lexicons_lock:
+        if language not in _lexicons:
+            _lexicons[language] = Lexicon(language)
+        return _lexicons[language]
@@ -0,0 +1,338 @@
+# -*- coding: utf-8 -*-
+"""
+ocr_batch.py - headless batch OCR of a folder of PDFs, resumable after a crash
+
+    python ocr_batch.py path/to/pdfs --workers 4 --jobs 2
+    python ocr_batch.py path/to/pdfs --watch
+
+Each PDF is converted page by page to a text file in the output folder, then moved to `completed/`.
+The progress of every file is saved to a JSON state file in the input folder, so a run that stops
+part way through a PDF picks up at the next unconverted page.
+"""
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+
+from natsort import natsorted
+
+from easyocr_functions import (
+    BLANK_INK_RATIO,
+    get_pdf_page_count,
+    iter_PDF_to_Text,
+    move2completed,
+    parse_page_range,
+    simple_rename,
+)
+from ocr_models import DEFAULT_OCR_PROFILE, OCR_BACKENDS, OCR_PROFILES, get_ocr_model_pool, get_ocr_profile
+
+STATE_FILENAME = ".ocr_batch_state.json"
+
+
+class JobState:
+    """
+    JobState - the status of every file of a batch, written to a JSON file after each change
+    Args:
+        path (str or Path): the state file, loaded if it already exists
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.jobs = {}
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.jobs = json.load(f).get("jobs", {})
+
+    def get(self, name: str) -> dict:
+        """get a copy of the state of a file, empty if it was never seen"""
+        with self._lock:
+            return dict(self.jobs.get(name, {}))
+
+    def update(self, name: str, **fields):
+        """update the state of a file and save the state file"""
+        with self._lock:
+            job = self.jobs.setdefault(name, {})
+            job.update(fields)
+            job["updated"] = datetime.now().isoformat(timespec="seconds")
+            # write a temporary file and swap it in, so a crash never leaves a truncated state file
+            tmp_path = self.path.with_name(self.path.name + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"jobs": self.jobs}, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+
+def find_pdfs(input_dir, settle_time: float = 2.0) -> list:
+    """
+    find_pdfs - the PDF files directly in a folder, skipping files modified in the last `settle_time`
+    seconds since they may still be being copied
+    """
+    now = time.time()
+    return natsorted(
+        [
+            f
+            for f in Path(input_dir).iterdir()
+            if f.is_file()
+            and f.suffix.lower() == ".pdf"
+            and now - f.stat().st_mtime >= settle_time
+        ],
+        key=lambda f: f.name,
+    )
+
+
+def ocr_file(
+    pdf_path,
+    state: JobState,
+    output_dir,
+    num_workers: int = 1,
+    max_pages=None,
+    **ocr_kwargs,
+) -> dict:
+    """
+    ocr_file - convert one PDF to a text file, resuming from its saved state, then move it to completed/
+    Args:
+        pdf_path (str or Path): the PDF file
+        state (JobState): the batch state, updated after every page
+        output_dir (str or Path): folder of the text files
+        num_workers (int, optional): OCR worker processes. Defaults to 1.
+        max_pages (int, str or iterable, optional): page selection, see parse_page_range. Defaults to all pages.
+        **ocr_kwargs: dpi, cache, text_layer, min_confidence, backend, profile and blank_threshold, see iter_PDF_to_Text
+    Returns:
+        dict: the final state of the file
+    """
+    pdf_path = Path(pdf_path)
+    name = pdf_path.name
+    output_path = Path(output_dir) / simple_rename(name)
+    total_pages = get_pdf_page_count(pdf_path)
+    pages = [i + 1 for i in parse_page_range(max_pages or total_pages, total_pages)]
+    stat = pdf_path.stat()
+
+    job = state.get(name)
+    resume = (
+        job.get("status") == "running"
+        and job.get("size") == stat.st_size
+        and job.get("mtime") == stat.st_mtime
+        and output_path.exists()
+    )
+    pages_done = set(job["pages_done"]) if resume else set()
+    offset = job["output_bytes"] if resume else 0
+    todo = [p for p in pages if p not in pages_done]
+    if resume:
+        logging.info(f"resuming {name} after {len(pages_done)} of {len(pages)} pages")
+    state.update(
+        name,
+        status="running",
+        size=stat.st_size,
+        mtime=stat.st_mtime,
+        num_pages=len(pages),
+        pages_done=sorted(pages_done),
+        output=str(output_path),
+        output_bytes=offset,
+        error=None,
+    )
+
+    st = time.perf_counter()
+    with open(output_path, "r+b" if offset else "wb") as f:
+        # drop anything written after the last saved page
+        f.truncate(offset)
+        f.seek(offset)
+        if todo:
+            for page in iter_PDF_to_Text(
+                pdf_path, max_pages=todo, num_workers=num_workers, **ocr_kwargs
+            ):
+                text = page["text"].encode("utf-8", errors="ignore")
+                f.write(b"\n\n" + text if pages_done else text)
+                f.flush()
+                pages_done.add(page["page"])
+                state.update(name, pages_done=sorted(pages_done), output_bytes=f.tell())
+    runtime = time.perf_counter() - st
+
+    move2completed(str(pdf_path.parent), name)
+    state.update(
+        name,
+        status="done",
+        runtime=round(runtime, 2),
+        pages_converted=len(todo),
+        pages_per_min=round(len(todo) / runtime * 60, 2) if runtime > 0 else None,
+    )
+    return state.get(name)
+
+
+def run_batch(
+    input_dir,
+    output_dir=None,
+    num_workers: int = 1,
+    jobs: int = 1,
+    watch: bool = False,
+    poll_interval: float = 10.0,
+    **ocr_kwargs,
+) -> dict:
+    """
+    run_batch - OCR every PDF in a folder, or keep watching the folder for new PDFs
+    Args:
+        input_dir (str or Path): folder with the PDF files, finished files are moved to its completed/ subfolder
+        output_dir (str or Path, optional): folder of the text files. Defaults to input_dir/ocr_output.
+        num_workers (int, optional): OCR worker processes, shared by all files. Defaults to 1.
+        jobs (int, optional): number of files converted at the same time. With num_workers=1 each
+            file runs OCR in this process, and the process-wide predictor pool (OCR_MODEL_POOL_SIZE)
+            is grown to `jobs` predictors so the files do not wait for each other. Defaults to 1.
+        watch (bool, optional): keep polling the folder for new files until interrupted. Defaults to False.
+        poll_interval (float, optional): seconds between scans of the folder in watch mode. Defaults to 10.0.
+        **ocr_kwargs: max_pages, dpi, cache, text_layer, min_confidence, backend, profile and blank_threshold, see ocr_file
+    Returns:
+        dict: number of files converted and failed, pages converted, busy time and pages per minute
+    """
+    input_dir = Path(input_dir)
+    output_dir = Path(output_dir or input_dir / "ocr_output")
+    output_dir.mkdir(parents=True, exist_ok=True)
+    state = JobState(input_dir / STATE_FILENAME)
+    totals = {"files": 0, "failed": 0, "pages": 0, "busy_time": 0.0}
+    failed = set()  # not retried until the next run
+    if jobs > 1 and num_workers <= 1:
+        # one predictor per concurrent file, they are built when the files first need them
+        get_ocr_model_pool(
+            size=jobs,
+            backend=ocr_kwargs.get("backend", "torch"),
+            **get_ocr_profile(ocr_kwargs.get("profile"))["predictor"],
+        )
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        while True:
+            pdfs = [f for f in find_pdfs(input_dir) if f.name not in failed]
+            if pdfs:
+                logging.info(f"found {len(pdfs)} PDF files in {input_dir}")
+                st = time.perf_counter()
+                futures = {
+                    executor.submit(
+                        ocr_file, f, state, output_dir, num_workers=num_workers, **ocr_kwargs
+                    ): f
+                    for f in pdfs
+                }
+                for future in as_completed(futures):
+                    name = futures[future].name
+                    try:
+                        job = future.result()
+                    except Exception as e:
+                        logging.exception(f"failed to convert {name}")
+                        state.update(name, status="failed", error=repr(e))
+                        failed.add(name)
+                        totals["failed"] += 1
+                        continue
+                    totals["files"] += 1
+                    totals["pages"] += job["pages_converted"]
+                    logging.info(
+                        f"converted {name}: {job['pages_converted']} pages, {job['pages_per_min']} pages/min"
+                    )
+                totals["busy_time"] += time.perf_counter() - st
+                logging.info(_format_totals(totals))
+            if not watch:
+                break
+            time.sleep(poll_interval)
+
+    totals["busy_time"] = round(totals["busy_time"], 2)
+    totals["pages_per_min"] = (
+        round(totals["pages"] / totals["busy_time"] * 60, 2) if totals["busy_time"] else None
+    )
+    return totals
+
+
+def _format_totals(totals: dict) -> str:
+    busy_time = totals["busy_time"]
+    ppm = totals["pages"] / busy_time * 60 if busy_time else 0
+    return (
+        f"{totals['files']} files ({totals['pages']} pages) converted, {totals['failed']} failed, "
+        f"{ppm:.1f} pages/min"
+    )
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="OCR every PDF in a folder, moving finished files to completed/"
+    )
+    parser.add_argument("input_dir", help="folder with the PDF files")
+    parser.add_argument(
+        "-o", "--output-dir", default=None, help="folder of the text files (default: INPUT_DIR/ocr_output)"
+    )
+    parser.add_argument(
+        "-w", "--workers", type=int, default=1, help="OCR worker processes (default: 1)"
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="files converted at the same time, with --workers 1 each one gets its own OCR predictor (default: 1)",
+    )
+    parser.add_argument(
+        "--watch", action="store_true", help="keep watching the folder for new PDF files"
+    )
+    parser.add_argument(
+        "--poll-interval", type=float, default=10.0, help="seconds between folder scans with --watch"
+    )
+    parser.add_argument(
+        "--pages", default=None, help='pages to convert in each file, e.g. "1-5,8" (default: all)'
+    )
+    parser.add_argument(
+        "--profile",
+        choices=tuple(OCR_PROFILES),
+        default=DEFAULT_OCR_PROFILE,
+        help=f"speed/accuracy profile (default: {DEFAULT_OCR_PROFILE})",
+    )
+    parser.add_argument(
+        "--dpi", type=int, default=None, help="rendering resolution (default: the profile's)"
+    )
+    parser.add_argument(
+        "--text-layer", action="store_true", help="use the text layer of born-digital pages instead of OCR"
+    )
+    parser.add_argument(
+        "--min-confidence", type=float, default=None, help="confidence-gated postprocessing threshold"
+    )
+    parser.add_argument(
+        "--backend",
+        choices=OCR_BACKENDS,
+        default="torch",
+        help="OCR inference backend, int8 only quantizes recognition, not detection (default: torch)",
+    )
+    parser.add_argument(
+        "--blank-threshold",
+        type=float,
+        default=BLANK_INK_RATIO,
+        help=f"ink ratio under which pages are skipped as blank, 0 to OCR every page (default: {BLANK_INK_RATIO})",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="do not use the OCR page cache")
+    return parser
+
+
+def main():
+    args = get_parser().parse_args()
+    try:
+        totals = run_batch(
+            args.input_dir,
+            output_dir=args.output_dir,
+            num_workers=args.workers,
+            jobs=args.jobs,
+            watch=args.watch,
+            poll_interval=args.poll_interval,
+            max_pages=args.pages,
+            dpi=args.dpi,
+            cache=not args.no_cache,
+            text_layer=args.text_layer,
+            min_confidence=args.min_confidence,
+            backend=args.backend,
+            profile=args.profile,
+            blank_threshold=args.blank_threshold,
+        )
+    except KeyboardInterrupt:
+        logging.info("interrupted, run again to resume")
+        return
+    logging.info(f"batch complete: {totals}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""
+ocr_cache.py - a persistent, content-addressed cache of per-page OCR results
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+_default_cache_path = Path.home() / ".cache" / "multiapp" / "ocr_cache.sqlite3"
+
+
+class OCRPageCache:
+    """
+    OCRPageCache - an SQLite store of the raw and cleaned text, and the structured words, of OCR'd pages
+    Entries are keyed by a hash of the rasterized page plus the OCR model config, so a page that shows up
+    again (in the same or another PDF) skips inference. The cleaned text is only reused if it was made
+    with the same postprocessing version. Least recently used entries are evicted past `max_bytes`.
+    Args:
+        path (str or Path, optional): the SQLite file. Defaults to ~/.cache/multiapp/ocr_cache.sqlite3.
+        max_bytes (int, optional): size bound for the stored text. Defaults to 256 MB.
+    """
+
+    def __init__(self, path=None, max_bytes: int = 256 * 2**20):
+        self.path = Path(path or _default_cache_path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS pages (
+                key TEXT PRIMARY KEY,
+                raw_text TEXT NOT NULL,
+                clean_text TEXT,
+                postprocess_version TEXT,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                words BLOB
+            )"""
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(pages)")]
+        if "words" not in columns:
+            # caches created before the structured words were stored
+            self._conn.execute("ALTER TABLE pages ADD COLUMN words BLOB")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS pages_last_access ON pages (last_access)"
+        )
+        # the total size of the pages, kept in the file and updated in the transaction that changes
+        # them, so processes sharing the cache agree on it
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "INSERT OR IGNORE INTO meta VALUES ('size', (SELECT COALESCE(SUM(size), 0) FROM pages))"
+        )
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def page_key(page: np.ndarray, config_id: str) -> str:
+        """
+        page_key - the content address of a rasterized page for a given OCR model config
+        Args:
+            page (np.ndarray): the rasterized page
+            config_id (str): identifies the OCR model and its settings
+        Returns:
+            str: hex digest of the page pixels, shape and config
+        """
+        h = hashlib.sha256()
+        h.update(f"{config_id}|{page.shape}|{page.dtype}|".encode())
+        h.update(np.ascontiguousarray(page).data)
+        return h.hexdigest()
+
+    def get(self, key: str) -> dict or None:
+        """
+        get - look up a page, counting a hit or a miss
+        Args:
+            key (str): the page key
+        Returns:
+            dict or None: raw_text, clean_text, postprocess_version and words if the page is cached
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT raw_text, clean_text, postprocess_version, words FROM pages WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute(
+                "UPDATE pages SET last_access = ? WHERE key = ?", (time.time(), key)
+            )
+            self._conn.commit()
+        return {
+            "raw_text": row[0],
+            "clean_text": row[1],
+            "postprocess_version": row[2],
+            "words": row[3],
+        }
+
+    def put(
+        self,
+        key: str,
+        raw_text: str,
+        clean_text: str = None,
+        postprocess_version=None,
+        words: bytes = None,
+    ):
+        """
+        put - store the text of a page, evicting least recently used pages if the cache is over its size bound
+        Args:
+            key (str): the page key
+            raw_text (str): the OCR output of the page
+            clean_text (str, optional): the postprocessed text of the page. Defaults to None.
+            postprocess_version (optional): version of the postprocessing that made clean_text. Defaults to None.
+            words (bytes, optional): the serialized OCRWords of the page. Defaults to None.
+        """
+        size = (
+            len(raw_text.encode("utf-8"))
+            + len((clean_text or "").encode("utf-8"))
+            + len(words or b"")
+        )
+        with self._lock:
+            # a write transaction from the start, so no other process changes the size in between
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                old = self._conn.execute(
+                    "SELECT size FROM pages WHERE key = ?", (key,)
+                ).fetchone()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO pages "
+                    "(key, raw_text, clean_text, postprocess_version, size, last_access, words) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        key,
+                        raw_text,
+                        clean_text,
+                        None if postprocess_version is None else str(postprocess_version),
+                        size,
+                        time.time(),
+                        words,
+                    ),
+                )
+                total = self._add_size(size - (old[0] if old else 0))
+                if total > self.max_bytes:
+                    self._evict(total)
+            except BaseException:
+                self._conn.rollback()
+                raise
+            self._conn.commit()
+
+    def _add_size(self, delta: int) -> int:
+        """change the total size of the pages, lock and write transaction must be held, return the new total"""
+        self._conn.execute("UPDATE meta SET value = value + ? WHERE name = 'size'", (delta,))
+        return self._total_size()
+
+    def _total_size(self) -> int:
+        """the total size of the pages, as stored in the cache file"""
+        return self._conn.execute("SELECT value FROM meta WHERE name = 'size'").fetchone()[0]
+
+    def _evict(self, total: int):
+        """delete least recently used pages until the cache is within its size bound, lock and transaction must be held"""
+        evicted, freed = 0, 0
+        rows = self._conn.execute(
+            "SELECT key, size FROM pages ORDER BY last_access"
+        ).fetchall()
+        for key, size in rows:
+            if total - freed <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM pages WHERE key = ?", (key,))
+            freed += size
+            evicted += 1
+        self._add_size(-freed)
+        logging.info(f"evicted {evicted} pages from the OCR cache")
+
+    def stats(self) -> dict:
+        """get the hit/miss counters of this process and the size of the cache"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "entries": entries,
+                "size_bytes": self._total_size(),
+                "max_bytes": self.max_bytes,
+            }
+
+    def clear(self):
+        """remove every page from the cache"""
+        with self._lock:
+            self._conn.execute("DELETE FROM pages")
+            self._conn.execute("UPDATE meta SET value = 0 WHERE name = 'size'")
+            self._conn.commit()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_ocr_cache() -> OCRPageCache:
+    """
+    get_ocr_cache - get the process-wide page cache
+    Its location and size bound come from the OCR_CACHE_PATH and OCR_CACHE_MAX_MB environment variables.
+    Returns:
+        OCRPageCache: the shared cache
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = OCRPageCache(
+                path=os.environ.get("OCR_CACHE_PATH"),
+                max_bytes=int(float(os.environ.get("OCR_CACHE_MAX_MB", 256)) * 2**20),
+            )
+        return _default_cache
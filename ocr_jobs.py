@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+ocr_jobs.py - background PDF conversion jobs with per-page progress, kept for a while after they finish so users can reconnect
+"""
+
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from easyocr_functions import convert_PDF, get_pdf_page_count, parse_page_range
+from ocr_models import get_ocr_model_pool, get_ocr_profile
+from workspaces import Workspace
+
+# statuses after which a job no longer changes
+FINISHED_STATUSES = ("done", "failed", "cancelled")
+
+
+class JobCancelled(Exception):
+    """raised from the page callback to stop a cancelled job"""
+
+
+class _Job:
+    """a job's public state, and the workspace holding its files and its cancel flag"""
+
+    def __init__(self, state: dict, workspace: Workspace):
+        self.state = state
+        self.workspace = workspace
+        self.cancelled = threading.Event()
+
+
+class OCRJobManager:
+    """
+    OCRJobManager - runs PDF conversions on background threads, independent of the session that
+    submitted them. Each job gets an unguessable id, its progress can be polled page by page, and a
+    finished job and its files are kept for `ttl` seconds.
+    Args:
+        max_workers (int, optional): jobs converted at the same time, the others wait in a queue. Jobs
+            that run OCR in this process (num_workers=1) grow the process-wide predictor pool
+            (OCR_MODEL_POOL_SIZE) to this many predictors, so they do not wait for each other. Defaults to 1.
+        ttl (float, optional): seconds a finished job is kept. Defaults to 3600.
+    """
+
+    def __init__(self, max_workers: int = 1, ttl: float = 3600.0):
+        self.ttl = ttl
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ocr-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, pdf_data, filename: str = "upload.pdf", max_pages=20, **convert_kwargs) -> str:
+        """
+        submit - queue the conversion of a PDF file
+        Args:
+            pdf_data (bytes or memoryview): the PDF file
+            filename (str, optional): its name, the text file is named after it. Defaults to "upload.pdf".
+            max_pages (int, str or iterable, optional): page selection, see parse_page_range. Defaults to 20.
+            **convert_kwargs: num_workers, text_layer, min_confidence and profile, see convert_PDF
+        Raises:
+            ValueError: if the file is not a PDF or the page selection is invalid, nothing is queued
+        Returns:
+            str: the job id
+        """
+        self.expire()
+        workspace = Workspace(prefix="job_")
+        try:
+            pdf_path = workspace.write_bytes(filename, pdf_data)
+            if pdf_path.suffix.lower() != ".pdf":
+                raise ValueError(f"{pdf_path.name} is not a PDF file")
+            num_pages = len(parse_page_range(max_pages, get_pdf_page_count(pdf_path)))
+        except Exception:
+            workspace.cleanup()
+            raise
+
+        job_id = uuid.uuid4().hex
+        state = {
+            "id": job_id,
+            "filename": pdf_path.name,
+            "status": "queued",
+            "num_pages": num_pages,
+            "pages_done": 0,
+            "page_sources": {},
+            "preview": "",
+            "text": None,
+            "output_file": None,
+            "error": None,
+            "created": time.time(),
+            "started": None,
+            "finished": None,
+        }
+        with self._lock:
+            self._jobs[job_id] = _Job(state, workspace)
+        self._executor.submit(self._run, job_id, pdf_path, max_pages, convert_kwargs)
+        logging.info(f"queued OCR job {job_id} for {pdf_path.name} ({num_pages} pages)")
+        return job_id
+
+    def _update(self, job: _Job, **changes):
+        with self._lock:
+            job.state.update(changes)
+
+    def _run(self, job_id: str, pdf_path, max_pages, convert_kwargs: dict):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return
+        if job.cancelled.is_set():
+            self._update(job, status="cancelled", finished=time.time())
+            return
+        self._update(job, status="running", started=time.time())
+        if convert_kwargs.get("num_workers", 1) <= 1:
+            # one predictor per concurrent job, built when the job first needs it
+            get_ocr_model_pool(
+                size=self.max_workers, **get_ocr_profile(convert_kwargs.get("profile"))["predictor"]
+            )
+
+        def on_page(page):
+            with self._lock:
+                job.state["pages_done"] += 1
+                job.state["page_sources"][page["page"]] = page["source"]
+                job.state["preview"] = page["text"][:500]
+            if job.cancelled.is_set():
+                raise JobCancelled()
+
+        try:
+            text, output_file = convert_PDF(
+                pdf_path, max_pages=max_pages, on_page=on_page, **convert_kwargs
+            )
+            self._update(job, status="done", text=text, output_file=output_file)
+        except JobCancelled:
+            self._update(job, status="cancelled")
+        except Exception as e:
+            logging.exception(f"OCR job {job_id} failed")
+            self._update(job, status="failed", error=str(e))
+        finally:
+            self._update(job, finished=time.time())
+            logging.info(f"OCR job {job_id} {job.state['status']}")
+
+    def get(self, job_id: str) -> dict or None:
+        """
+        get - the current state of a job
+        Args:
+            job_id (str): the id returned by submit
+        Returns:
+            dict: a copy of the job state - status (queued, running, done, failed or cancelled),
+                num_pages, pages_done, page_sources, a preview of the last page, and once done the
+                text and the path of the text file. None if the job is unknown or expired.
+        """
+        self.expire()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            state = dict(job.state)
+            state["page_sources"] = dict(state["page_sources"])
+        return state
+
+    def cancel(self, job_id: str) -> bool:
+        """ask a queued or running job to stop after its current page, True if the job exists"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return False
+        job.cancelled.set()
+        return True
+
+    def expire(self) -> int:
+        """remove the jobs that finished more than ttl seconds ago, with their files, return how many"""
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            expired = [
+                job_id
+                for job_id, job in self._jobs.items()
+                if job.state["status"] in FINISHED_STATUSES
+                and job.state["finished"] is not None
+                and job.state["finished"] < cutoff
+            ]
+            jobs = [self._jobs.pop(job_id) for job_id in expired]
+        for job in jobs:
+            job.workspace.cleanup()
+        return len(jobs)
+
+    def stats(self) -> dict:
+        """the number of jobs by status"""
+        with self._lock:
+            statuses = [job.state["status"] for job in self._jobs.values()]
+        return {status: statuses.count(status) for status in set(statuses)}
+
+    def shutdown(self, wait: bool = True):
+        """cancel every job, stop the threads and remove all job files"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+            self._jobs.clear()
+        for job in jobs:
+            job.cancelled.set()
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+        for job in jobs:
+            job.workspace.cleanup()
+
+
+_job_manager = None
+_job_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> OCRJobManager:
+    """
+    get_job_manager - get the process-wide job manager, shared by every session of the server
+    The number of concurrent jobs and the time finished jobs are kept come from the OCR_JOB_WORKERS
+    (default 1) and OCR_JOB_TTL (seconds, default 3600) environment variables.
+    Returns:
+        OCRJobManager: the shared manager
+    """
+    global _job_manager
+    with _job_manager_lock:
+        if _job_manager is None:
+            _job_manager = OCRJobManager(
+                max_workers=int(os.environ.get("OCR_JOB_WORKERS", 1)),
+                ttl=float(os.environ.get("OCR_JOB_TTL", 3600)),
+            )
+        return _job_manager
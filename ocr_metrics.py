@@ -0,0 +1,330 @@
+# -*- coding: utf-8 -*-
+"""
+ocr_metrics.py - per-stage timing, memory and model-call instrumentation of the OCR pipeline, with pluggable hooks
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+def peak_rss_mb() -> float or None:
+    """the peak resident memory of this process so far in MB, None where it cannot be measured"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, KiB elsewhere
+    return round(peak / 2**20 if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def current_rss_mb() -> float or None:
+    """the current resident memory of this process in MB, None where it cannot be measured"""
+    try:
+        with open("/proc/self/statm") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def reset_peak_rss() -> bool:
+    """reset the peak resident memory of this process to its current size, False where the kernel does not allow it"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def hwm_rss_mb() -> float or None:
+    """the peak resident memory of this process since the last reset_peak_rss in MB, None where it cannot be read"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+class RSSSampler:
+    """
+    RSSSampler - sample the resident memory of this process on a background thread and keep the highest,
+    for a peak where the kernel's high-water mark cannot be reset
+    Args:
+        interval (float, optional): seconds between samples. Defaults to 0.05.
+    """
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak_mb = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def _sample(self):
+        rss = current_rss_mb()
+        if rss is not None and (self.peak_mb is None or rss > self.peak_mb):
+            self.peak_mb = rss
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        """take a first sample, and keep sampling if the memory can be measured at all"""
+        self._sample()
+        if self.peak_mb is not None:
+            self._thread.start()
+        return self
+
+    def stop(self) -> float or None:
+        """stop sampling, return the highest sample in MB"""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self._sample()
+        return self.peak_mb
+
+
+"""## model instrumentation
+"""
+
+
+def _add_timer(module, counters: dict, name: str):
+    """time each call of a torch module into counters[name]"""
+    starts = []
+
+    def before(module, args):
+        starts.append(time.perf_counter())
+
+    def after(module, args, output):
+        counters[name] += time.perf_counter() - starts.pop()
+
+    module.register_forward_pre_hook(before)
+    module.register_forward_hook(after)
+
+
+def _add_counter(module, counters: dict, name: str):
+    """count the calls of a torch module into counters[name]"""
+
+    def count(module, args):
+        counters[name] += 1
+
+    module.register_forward_pre_hook(count)
+
+
+def instrument_ocr_model(ocr_model) -> dict:
+    """
+    instrument_ocr_model - time the detection and recognition stages of a doctr OCR predictor and count
+    the calls to their networks, with torch forward hooks. Instrumenting a predictor twice does nothing,
+    and stages that are not torch modules (e.g. the onnx backend) are not instrumented.
+    Args:
+        ocr_model (OCRPredictor): the predictor
+    Returns:
+        dict: the running counters of the predictor, see take_model_stats
+    """
+    counters = getattr(ocr_model, "_ocr_metrics", None)
+    if counters is not None:
+        return counters
+    counters = {}
+    for name, predictor in (
+        ("detection", ocr_model.det_predictor),
+        ("recognition", ocr_model.reco_predictor),
+    ):
+        if not hasattr(predictor, "register_forward_pre_hook"):
+            continue
+        counters.update({name: 0.0, f"{name}_calls": 0})
+        _add_timer(predictor, counters, name)
+        _add_counter(predictor.model, counters, f"{name}_calls")
+    ocr_model._ocr_metrics = counters
+    return counters
+
+
+def take_model_stats(ocr_model) -> tuple:
+    """
+    take_model_stats - the detection and recognition time and network calls of a predictor since the last call
+    Args:
+        ocr_model (OCRPredictor): the predictor, instrumented on first use
+    Returns:
+        tuple: a dict of seconds by stage and a dict of network calls by stage
+    """
+    counters = instrument_ocr_model(ocr_model)
+    timings = {k: v for k, v in counters.items() if not k.endswith("_calls")}
+    calls = {k[: -len("_calls")]: v for k, v in counters.items() if k.endswith("_calls")}
+    for key in counters:
+        counters[key] = type(counters[key])()
+    return timings, calls
+
+
+"""## hooks
+"""
+
+
+class OCRHook:
+    """
+    OCRHook - receives the metrics of OCR runs, subclass it and override the events you need
+    A hook that raises is logged and skipped, monitoring never fails a conversion.
+    """
+
+    def on_start(self, run: dict):
+        """a conversion started: file, num_workers, dpi, max_pages, text_layer and backend"""
+
+    def on_page(self, page: dict):
+        """a page is done: page number, source, timings by stage, model calls, rss_mb and worker_peak_rss_mb"""
+
+    def on_end(self, summary: dict):
+        """the conversion ended, see OCRRunMetrics.finish for the summary"""
+
+
+class LoggingHook(OCRHook):
+    """log each page at debug level and the summary of each run at info level"""
+
+    def on_page(self, page: dict):
+        timings = ", ".join(f"{k} {v:.3f}s" for k, v in page["timings"].items())
+        logging.debug(f"OCR page {page['page']} ({page['source']}): {timings}")
+
+    def on_end(self, summary: dict):
+        stages = ", ".join(f"{k} {v:.2f}s" for k, v in summary["stage_times"].items())
+        calls = ", ".join(f"{k} {v}" for k, v in summary["model_calls"].items())
+        logging.info(
+            f"OCR of {summary['file']}: {summary['pages']} pages in {summary['runtime']:.2f}s "
+            f"({summary['pages_per_sec']} pages/s) - {stages or 'no stages'} - "
+            f"model calls: {calls or 'none'} - peak RSS {summary['peak_rss_mb']} MB"
+            + ("" if summary["completed"] else " - INCOMPLETE")
+        )
+
+
+_hooks = [LoggingHook()]
+_hooks_lock = threading.Lock()
+
+
+def add_ocr_hook(hook: OCRHook):
+    """register a hook called for every OCR run in this process"""
+    with _hooks_lock:
+        _hooks.append(hook)
+
+
+def remove_ocr_hook(hook: OCRHook):
+    """unregister a hook added with add_ocr_hook, e.g. the default LoggingHook"""
+    with _hooks_lock:
+        _hooks.remove(hook)
+
+
+def get_ocr_hooks() -> list:
+    """the hooks registered for every OCR run"""
+    with _hooks_lock:
+        return list(_hooks)
+
+
+# OCR runs in progress in this process. The high-water mark is only reset when no other run is in
+# progress, so a run never erases the peak of another, it can only see theirs as well.
+_active_runs = 0
+_peak_from_hwm = False
+_runs_lock = threading.Lock()
+
+
+class OCRRunMetrics:
+    """
+    OCRRunMetrics - collects the per-page metrics of one OCR run and passes them on to the hooks
+    Args:
+        file (str, optional): the file being converted, for the hooks. Defaults to None.
+        hooks (list, optional): hooks for this run only, called after the registered ones. Defaults to None.
+    """
+
+    def __init__(self, file=None, hooks=None):
+        self.file = str(file) if file is not None else None
+        self.hooks = get_ocr_hooks() + list(hooks or [])
+        self.pages = {}
+        self.summary = None
+        self._start = None
+        # how the peak memory of the run is measured, see start and finish
+        self._peak_from_hwm = False
+        self._sampler = None
+
+    def _notify(self, event: str, data: dict):
+        for hook in self.hooks:
+            try:
+                getattr(hook, event)(data)
+            except Exception:
+                logging.warning(f"OCR hook {hook!r} failed on {event}", exc_info=True)
+
+    def start(self, **info):
+        """start the run clock and tell the hooks, `info` is passed on with the file name"""
+        global _active_runs, _peak_from_hwm
+        with _runs_lock:
+            if _active_runs == 0:
+                _peak_from_hwm = reset_peak_rss() and hwm_rss_mb() is not None
+            _active_runs += 1
+            self._peak_from_hwm = _peak_from_hwm
+        if not self._peak_from_hwm:
+            self._sampler = RSSSampler().start()
+        self._start = time.perf_counter()
+        self._notify("on_start", {"file": self.file, **info})
+
+    def add_page(self, page: dict):
+        """record the metrics of a finished page: page, source, timings, model_calls and worker_peak_rss_mb"""
+        metrics = {
+            "page": page["page"],
+            "source": page["source"],
+            "timings": page["timings"],
+            "model_calls": page.get("model_calls", {}),
+            "rss_mb": current_rss_mb(),
+            "worker_peak_rss_mb": page.get("worker_peak_rss_mb"),
+        }
+        self.pages[page["page"]] = metrics
+        self._notify("on_page", metrics)
+        return metrics
+
+    def finish(self, completed: bool = True) -> dict:
+        """
+        finish - end the run and tell the hooks, only the first call counts
+        Args:
+            completed (bool, optional): False if the run stopped early or failed. Defaults to True.
+        Returns:
+            dict: the summary - file, pages, runtime, pages_per_sec, summed stage_times and model_calls,
+                peak_rss_mb, worker_peak_rss_mb of the OCR workers and completed. peak_rss_mb is the
+                peak resident memory of this process during the run: the kernel's high-water mark, reset
+                when the run starts, or where that is not available the highest of samples taken every
+                50 ms and after each page. Runs in progress together in one process share their peak.
+        """
+        global _active_runs
+        if self.summary is not None:
+            return self.summary
+        runtime = time.perf_counter() - self._start if self._start is not None else 0.0
+        stage_times, model_calls = {}, {}
+        for page in self.pages.values():
+            for stage, seconds in page["timings"].items():
+                stage_times[stage] = stage_times.get(stage, 0.0) + seconds
+            for stage, calls in page["model_calls"].items():
+                model_calls[stage] = model_calls.get(stage, 0) + calls
+        rss_samples = [p["rss_mb"] for p in self.pages.values()]
+        if self._start is not None:
+            # read before this run stops counting as in progress, when another one may reset the mark
+            rss_samples.append(hwm_rss_mb() if self._peak_from_hwm else self._sampler.stop())
+            with _runs_lock:
+                _active_runs -= 1
+        rss_samples = [rss for rss in rss_samples if rss is not None]
+        worker_peaks = [
+            p["worker_peak_rss_mb"] for p in self.pages.values() if p["worker_peak_rss_mb"]
+        ]
+        self.summary = {
+            "file": self.file,
+            "pages": len(self.pages),
+            "runtime": round(runtime, 3),
+            "pages_per_sec": round(len(self.pages) / runtime, 2) if runtime > 0 else None,
+            "stage_times": {k: round(v, 3) for k, v in stage_times.items()},
+            "model_calls": model_calls,
+            "peak_rss_mb": max(rss_samples) if rss_samples else None,
+            "worker_peak_rss_mb": max(worker_peaks) if worker_peaks else None,
+            "completed": completed,
+        }
+        self._notify("on_end", self.summary)
+        return self.summary
@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""
+ocr_models.py - a process-wide registry of warm doctr OCR predictors, shared by concurrent sessions
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import doctr
+import numpy as np
+from doctr.models import ocr_predictor
+
+OCR_BACKENDS = ("torch", "int8", "onnx")
+
+# speed/accuracy trade-offs: ocr_predictor arguments and the page rendering resolution.
+# "balanced" is doctr's default predictor (fast_base + crnn_vgg16_bn, det_bs=2, reco_bs=128), so it
+# shares the default pool and cached pages of calls without a profile.
+OCR_PROFILES = {
+    "fast": {
+        "predictor": {
+            "pretrained": True,
+            "det_arch": "fast_tiny",
+            "reco_arch": "crnn_mobilenet_v3_small",
+            "det_bs": 4,
+            "reco_bs": 256,
+        },
+        "dpi": 120,
+    },
+    "balanced": {
+        "predictor": {"pretrained": True},
+        "dpi": 144,
+    },
+    "accurate": {
+        "predictor": {
+            "pretrained": True,
+            "det_arch": "db_resnet50",
+            "reco_arch": "parseq",
+            "det_bs": 2,
+            "reco_bs": 64,
+        },
+        "dpi": 200,
+    },
+}
+DEFAULT_OCR_PROFILE = "balanced"
+
+
+def get_ocr_profile(profile: str = None) -> dict:
+    """
+    get_ocr_profile - the settings of a named speed/accuracy profile
+    Args:
+        profile (str, optional): "fast", "balanced" or "accurate". Defaults to None, the balanced profile.
+    Returns:
+        dict: "predictor", the ocr_predictor keyword arguments, and "dpi", the rendering resolution
+    """
+    profile = profile or DEFAULT_OCR_PROFILE
+    if profile not in OCR_PROFILES:
+        raise ValueError(f"unknown OCR profile {profile!r}, expected one of {tuple(OCR_PROFILES)}")
+    settings = OCR_PROFILES[profile]
+    return {"predictor": dict(settings["predictor"]), "dpi": settings["dpi"]}
+
+
+def build_ocr_predictor(backend: str = "torch", **predictor_kwargs):
+    """
+    build_ocr_predictor - build an OCR predictor running on one of the CPU inference backends
+    "torch" is doctr's full-precision predictor, "int8" the same predictor with the linear and LSTM
+    layers of its recognition model dynamically quantized to int8, and "onnx" the exported models run by
+    onnxruntime through the optional onnxtr package. int8 only speeds up recognition: the detection
+    model is convolutions, which dynamic quantization leaves in float, and detection takes most of the
+    time of a page, so expect a small speedup of whole pages.
+    Args:
+        backend (str, optional): "torch", "int8" or "onnx". Defaults to "torch".
+        **predictor_kwargs: keyword arguments for doctr's ocr_predictor. The onnx backend ignores the
+            pretrained flags, it always loads its exported pretrained models.
+    Returns:
+        OCRPredictor: the predictor, called like doctr's on a list of pages
+    """
+    if backend not in OCR_BACKENDS:
+        raise ValueError(f"unknown OCR backend {backend!r}, expected one of {OCR_BACKENDS}")
+    if backend == "onnx":
+        try:
+            from onnxtr.models import ocr_predictor as onnx_ocr_predictor
+        except ImportError as e:
+            raise ImportError(
+                "the onnx OCR backend needs the onnxtr package: pip install 'onnxtr[cpu]'"
+            ) from e
+        kwargs = {
+            k: v for k, v in predictor_kwargs.items() if k not in ("pretrained", "pretrained_backbone")
+        }
+        model = onnx_ocr_predictor(**kwargs)
+    else:
+        model = ocr_predictor(**predictor_kwargs)
+    if backend == "int8":
+        import torch
+        from torch.ao.quantization import quantize_dynamic
+
+        # the detection model has no linear or LSTM layers to quantize
+        model.reco_predictor.model = quantize_dynamic(
+            model.reco_predictor.model, {torch.nn.Linear, torch.nn.LSTM}, dtype=torch.qint8
+        )
+    model._ocr_backend = backend
+    return model
+
+
+class OCRModelPool:
+    """
+    OCRModelPool - a bounded pool of OCR predictors built with the same settings
+    Predictors are built lazily, up to `size` of them, and each one is only used by one caller at a time.
+    Args:
+        size (int, optional): maximum number of predictors in the pool. Defaults to 1.
+        backend (str, optional): inference backend, see build_ocr_predictor. Defaults to "torch".
+        **predictor_kwargs: keyword arguments for doctr's ocr_predictor
+    """
+
+    def __init__(self, size: int = 1, backend: str = "torch", **predictor_kwargs):
+        self.size = max(1, size)
+        self.backend = backend
+        self.predictor_kwargs = predictor_kwargs or {"pretrained": True}
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._num_built = 0
+        self._stats = {
+            "load_time": 0.0,
+            "warmup_time": 0.0,
+            "wait_time": 0.0,
+            "acquisitions": 0,
+            "reuse_count": 0,
+        }
+
+    def _build(self):
+        st = time.perf_counter()
+        model = build_ocr_predictor(self.backend, **self.predictor_kwargs)
+        load_time = time.perf_counter() - st
+        logging.info(f"built {self.backend} OCR predictor in {load_time:.2f}s")
+        with self._lock:
+            self._stats["load_time"] += load_time
+        return model
+
+    def _get(self):
+        """take an idle predictor, build a new one if the pool is not full, otherwise wait"""
+        try:
+            return self._idle.get_nowait(), True
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_build = self._num_built < self.size
+            if can_build:
+                self._num_built += 1
+        if can_build:
+            try:
+                return self._build(), False
+            except Exception:
+                with self._lock:
+                    self._num_built -= 1
+                raise
+        return self._idle.get(), True
+
+    @contextmanager
+    def acquire(self):
+        """
+        acquire - borrow a predictor for the duration of a with block
+        Yields:
+            OCRPredictor: a predictor no other caller is using
+        """
+        st = time.perf_counter()
+        model, reused = self._get()
+        with self._lock:
+            self._stats["wait_time"] += time.perf_counter() - st
+            self._stats["acquisitions"] += 1
+            self._stats["reuse_count"] += int(reused)
+        try:
+            yield model
+        finally:
+            self._idle.put(model)
+
+    def warmup(self, num_models: int = None):
+        """
+        warmup - build predictors and run a dummy page through each of them
+        Args:
+            num_models (int, optional): number of predictors to warm up. Defaults to the pool size.
+        """
+        num_models = self.size if num_models is None else min(num_models, self.size)
+        page = _dummy_page()
+        models = [self._get()[0] for _ in range(num_models)]
+        st = time.perf_counter()
+        try:
+            for model in models:
+                model([page])
+        finally:
+            for model in models:
+                self._idle.put(model)
+        warmup_time = time.perf_counter() - st
+        logging.info(f"warmed up {num_models} OCR predictors in {warmup_time:.2f}s")
+        with self._lock:
+            self._stats["warmup_time"] += warmup_time
+
+    def grow(self, size: int):
+        """allow up to `size` predictors, they are built when callers need them; a pool never shrinks"""
+        with self._lock:
+            self.size = max(self.size, size)
+
+    def stats(self) -> dict:
+        """get the pool metrics: load and warmup time, waiting time, acquisitions and reuse count"""
+        with self._lock:
+            stats = {k: round(v, 3) for k, v in self._stats.items()}
+            stats["num_models"] = self._num_built
+            stats["size"] = self.size
+        return stats
+
+
+def _dummy_page(height: int = 1024, width: int = 768) -> np.ndarray:
+    """a white page with a few dark bars, so both detection and recognition run during warmup"""
+    page = np.full((height, width, 3), 255, dtype=np.uint8)
+    for top in range(100, 400, 60):
+        page[top : top + 20, 80 : width - 80] = 0
+    return page
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_ocr_model_pool(size: int = None, backend: str = "torch", **predictor_kwargs) -> OCRModelPool:
+    """
+    get_ocr_model_pool - get the process-wide pool of predictors for the given settings
+    Args:
+        size (int, optional): pool size when it is first created, an existing smaller pool is grown to it.
+            Defaults to the OCR_MODEL_POOL_SIZE environment variable, or 1. Each predictor serves one
+            page at a time, so documents converted concurrently in this process need one each.
+        backend (str, optional): inference backend, see build_ocr_predictor. Defaults to "torch".
+        **predictor_kwargs: keyword arguments for doctr's ocr_predictor. Defaults to pretrained=True.
+    Returns:
+        OCRModelPool: the shared pool
+    """
+    predictor_kwargs = predictor_kwargs or {"pretrained": True}
+    key = tuple(sorted({**predictor_kwargs, "backend": backend}.items()))
+    with _pools_lock:
+        if key not in _pools:
+            if size is None:
+                size = int(os.environ.get("OCR_MODEL_POOL_SIZE", 1))
+            _pools[key] = OCRModelPool(size=size, backend=backend, **predictor_kwargs)
+        elif size is not None:
+            _pools[key].grow(size)
+        return _pools[key]
+
+
+def warmup_ocr_models(**predictor_kwargs) -> OCRModelPool:
+    """build and warm up the default pool, meant to be called once at server start"""
+    pool = get_ocr_model_pool(**predictor_kwargs)
+    pool.warmup()
+    return pool
+
+
+def ocr_model_stats() -> dict:
+    """get the metrics of every pool in this process, keyed by predictor settings"""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {str(dict(key)): pool.stats() for key, pool in pools.items()}
+
+
+def ocr_config_id(ocr_model=None, backend: str = "torch", **predictor_kwargs) -> str:
+    """
+    ocr_config_id - a string identifying an OCR model and its settings, e.g. to key cached results
+    Args:
+        ocr_model (optional): a doctr OCR predictor, if None the settings of a pool are described. Defaults to None.
+        backend (str, optional): inference backend of the pool, the backend of `ocr_model` is used
+            if it is given. Defaults to "torch".
+        **predictor_kwargs: keyword arguments for doctr's ocr_predictor. Defaults to pretrained=True.
+    Returns:
+        str: the config id
+    """
+    if ocr_model is not None:
+        backend = getattr(ocr_model, "_ocr_backend", "torch")
+        det = ocr_model.det_predictor.model
+        reco = ocr_model.reco_predictor.model
+        desc = ",".join(
+            f"{type(m).__name__}:{getattr(m, 'cfg', {}).get('url')}" for m in (det, reco)
+        )
+    else:
+        desc = str(sorted((predictor_kwargs or {"pretrained": True}).items()))
+    # torch ids are unchanged from before there were backends, so their cached pages stay valid
+    if backend != "torch":
+        desc = f"{backend}|{desc}"
+    return f"doctr-{doctr.__version__}|{desc}"
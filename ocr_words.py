@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""
+ocr_words.py - compact, array-backed structured OCR output: per-word text, box, confidence and block/line ids
+"""
+
+import io
+import json
+
+import numpy as np
+
+
+class OCRWords:
+    """
+    OCRWords - the words of one or more OCR'd pages, stored as flat arrays in reading order of the OCR model
+    Word texts are kept as one string plus offsets, boxes are (xmin, ymin, xmax, ymax) relative to the page size.
+    Args:
+        chars (str): all word texts joined together
+        offsets (np.ndarray): int64 (N + 1,) start of each word in `chars`, then the end of the last word
+        boxes (np.ndarray): float32 (N, 4) word boxes
+        confidence (np.ndarray): float32 (N,) recognition confidence of each word
+        page (np.ndarray): int32 (N,) 1-based page number of each word
+        block (np.ndarray): int32 (N,) block index of each word within its page
+        line (np.ndarray): int32 (N,) line index of each word within its block
+        page_numbers (np.ndarray): int32 (P,) the pages covered, including pages without words
+        blocks_per_page (np.ndarray): int32 (P,) number of blocks on each page, including empty blocks
+    """
+
+    _array_fields = (
+        "offsets",
+        "boxes",
+        "confidence",
+        "page",
+        "block",
+        "line",
+        "page_numbers",
+        "blocks_per_page",
+    )
+
+    def __init__(
+        self,
+        chars,
+        offsets,
+        boxes,
+        confidence,
+        page,
+        block,
+        line,
+        page_numbers,
+        blocks_per_page,
+    ):
+        self.chars = chars
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        self.confidence = np.asarray(confidence, dtype=np.float32)
+        self.page = np.asarray(page, dtype=np.int32)
+        self.block = np.asarray(block, dtype=np.int32)
+        self.line = np.asarray(line, dtype=np.int32)
+        self.page_numbers = np.asarray(page_numbers, dtype=np.int32)
+        self.blocks_per_page = np.asarray(blocks_per_page, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.confidence)
+
+    @classmethod
+    def from_result(cls, result, page_numbers=None):
+        """
+        from_result - build the arrays from a doctr OCR result
+        Args:
+            result (Document): output of a doctr OCR predictor
+            page_numbers (list, optional): 1-based page number of each result page. Defaults to 1, 2, ...
+        Returns:
+            OCRWords: the words of all pages
+        """
+        values, boxes, confidence, page_ids, block_ids, line_ids = [], [], [], [], [], []
+        page_numbers = list(page_numbers or range(1, len(result.pages) + 1))
+        blocks_per_page = []
+        for page_num, page in zip(page_numbers, result.pages):
+            blocks_per_page.append(len(page.blocks))
+            for block_idx, block in enumerate(page.blocks):
+                for line_idx, line in enumerate(block.lines):
+                    for word in line.words:
+                        values.append(word.value)
+                        confidence.append(word.confidence)
+                        boxes.append(_box(word.geometry))
+                        page_ids.append(page_num)
+                        block_ids.append(block_idx)
+                        line_ids.append(line_idx)
+        offsets = np.zeros(len(values) + 1, dtype=np.int64)
+        np.cumsum([len(v) for v in values], out=offsets[1:])
+        return cls(
+            "".join(values),
+            offsets,
+            boxes,
+            confidence,
+            page_ids,
+            block_ids,
+            line_ids,
+            page_numbers,
+            blocks_per_page,
+        )
+
+    @classmethod
+    def concat(cls, parts: list):
+        """join the words of several OCRWords, e.g. one per page, into one"""
+        parts = [p for p in parts if p is not None]
+        if not parts:
+            return cls("", [0], [], [], [], [], [], [], [])
+        offsets = [parts[0].offsets]
+        start = parts[0].offsets[-1]
+        for p in parts[1:]:
+            offsets.append(p.offsets[1:] + start)
+            start += p.offsets[-1]
+        return cls(
+            "".join(p.chars for p in parts),
+            np.concatenate(offsets),
+            np.concatenate([p.boxes for p in parts]),
+            *(
+                np.concatenate([getattr(p, f) for p in parts])
+                for f in ("confidence", "page", "block", "line")
+            ),
+            np.concatenate([p.page_numbers for p in parts]),
+            np.concatenate([p.blocks_per_page for p in parts]),
+        )
+
+    @property
+    def values(self) -> list:
+        """the text of each word"""
+        o = self.offsets.tolist()
+        return [self.chars[o[i] : o[i + 1]] for i in range(len(o) - 1)]
+
+    def page_texts(self, column_aware: bool = False) -> list:
+        """
+        page_texts - the flat text of each page, built with joins
+        Args:
+            column_aware (bool, optional): order blocks column by column (see reading_order) instead of
+                the order of the OCR model. Defaults to False.
+        Returns:
+            list: one string per page, identical to result2text(result) when column_aware is False
+        """
+        values = self.values
+        order = self.reading_order().tolist() if column_aware else range(len(values))
+        page_ids, block_ids = self.page.tolist(), self.block.tolist()
+        # page -> block -> words, blocks in the order they are first seen
+        pages = {}
+        for i in order:
+            pages.setdefault(page_ids[i], {}).setdefault(block_ids[i], []).append(values[i])
+
+        texts = []
+        for page_num, n_blocks in zip(self.page_numbers.tolist(), self.blocks_per_page.tolist()):
+            blocks = pages.get(page_num, {})
+            block_order = range(n_blocks)
+            if column_aware:
+                block_order = list(blocks) + [b for b in range(n_blocks) if b not in blocks]
+            # blocks without words still start a new paragraph, like in result2text
+            texts.append(
+                "".join("\n\t" + "".join(v + " " for v in blocks.get(b, [])) for b in block_order)
+            )
+        return texts
+
+    def reading_order(self) -> np.ndarray:
+        """
+        reading_order - word indices in column-aware reading order
+        On each page, blocks that overlap horizontally form a column, columns are read left to right,
+        blocks within a column top to bottom, and words keep their line order within a block.
+        Returns:
+            np.ndarray: permutation of the word indices
+        """
+        if not len(self):
+            return np.zeros(0, dtype=np.int64)
+        keys = np.stack([self.page, self.block]).T
+        uniq, inverse = np.unique(keys, axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        # union box of each block
+        xmin = np.full(len(uniq), np.inf)
+        ymin = np.full(len(uniq), np.inf)
+        xmax = np.full(len(uniq), -np.inf)
+        np.minimum.at(xmin, inverse, self.boxes[:, 0])
+        np.minimum.at(ymin, inverse, self.boxes[:, 1])
+        np.maximum.at(xmax, inverse, self.boxes[:, 2])
+
+        column = np.zeros(len(uniq), dtype=np.int64)
+        for page_num in np.unique(uniq[:, 0]):
+            idx = np.flatnonzero(uniq[:, 0] == page_num)
+            idx = idx[np.argsort(xmin[idx], kind="stable")]
+            # blocks sorted by left edge, a block starting right of everything so far opens a new column
+            col, col_right = -1, -np.inf
+            for i in idx:
+                if xmin[i] >= col_right:
+                    col += 1
+                col_right = max(col_right, xmax[i])
+                column[i] = col
+
+        # sort by page, column, block top, then the original order within a block
+        return np.lexsort(
+            (
+                np.arange(len(self)),
+                ymin[inverse],
+                column[inverse],
+                self.page,
+            )
+        )
+
+    def to_arrays(self) -> dict:
+        """the numpy arrays of the words, with the texts as a utf-8 byte array"""
+        arrays = {f: getattr(self, f) for f in self._array_fields}
+        arrays["chars"] = np.frombuffer(self.chars.encode("utf-8"), dtype=np.uint8)
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        arrays = dict(arrays)
+        chars = arrays.pop("chars").tobytes().decode("utf-8")
+        return cls(chars, **{f: arrays[f] for f in cls._array_fields})
+
+    def to_bytes(self) -> bytes:
+        """serialize to compressed NumPy .npz bytes"""
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, **self.to_arrays())
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes):
+        with np.load(io.BytesIO(data)) as arrays:
+            return cls.from_arrays(arrays)
+
+    def save_npz(self, path):
+        """write the arrays to a .npz file"""
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load_npz(cls, path):
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+    def iter_records(self):
+        """yield one dict per word: page, block, line, text, box and confidence"""
+        columns = zip(
+            self.page.tolist(),
+            self.block.tolist(),
+            self.line.tolist(),
+            self.values,
+            self.boxes.round(5).tolist(),
+            self.confidence.round(4).tolist(),
+        )
+        for page, block, line, text, box, confidence in columns:
+            yield {
+                "page": page,
+                "block": block,
+                "line": line,
+                "text": text,
+                "box": box,
+                "confidence": confidence,
+            }
+
+    def save_jsonl(self, path):
+        """write one JSON object per word to a JSON Lines file"""
+        with open(path, "w", encoding="utf-8") as f:
+            for record in self.iter_records():
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def _box(geometry) -> tuple:
+    """(xmin, ymin, xmax, ymax) of a straight box ((x0, y0), (x1, y1)) or of a polygon"""
+    if len(geometry) == 2:
+        (x0, y0), (x1, y1) = geometry
+        return x0, y0, x1, y1
+    pts = np.asarray(geometry)
+    (x0, y0), (x1, y1) = pts.min(axis=0), pts.max(axis=0)
+    return x0, y0, x1, y1
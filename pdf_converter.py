@@ -1,31 +1,18 @@
 from streamlit_ace import st_ace
 import streamlit as st
-from base64 import b64encode
 from easyocr_functions import *
+from ocr_models import warmup_ocr_models
+from ocr_jobs import get_job_manager
+from text_pages import PAGE_CHARS, format_text_width, paginate_text
+from workspaces import cleanup_stale_workspaces
 
-_here = Path(__file__).parent
 
-def convert_PDF(pdf_path, language: str = "en", max_pages=20):
-    # clear local text cache
-    rm_local_text_files()
+@st.cache_resource(show_spinner="Loading the OCR model...")
+def load_ocr_models():
+    """build and warm up the shared OCR predictors once per server process"""
+    cleanup_stale_workspaces()
+    return warmup_ocr_models()
 
-    st = time.perf_counter()
-
-    if not pdf_path.endswith(".pdf"):
-        logging.error(f"File {pdf_path} is not a PDF file")
-        return "File is not a PDF file", None
-
-    conversion_stats = convert_PDF_to_Text(pdf_path, max_pages=max_pages)
-    converted_txt = conversion_stats["converted_text"]
-
-    rt = round((time.perf_counter() - st) / 60, 2)
-    print(f"Runtime: {rt} minutes")
-
-    output_name = f"{Path(pdf_path).stem}_OCR.txt"
-    with open(output_name, "w", encoding="utf-8", errors="ignore") as f:
-        f.write(converted_txt)
-
-    return converted_txt, output_name
 
 st.set_page_config(page_title="AI writer assistant", page_icon="img/Oxta_MLOpsFactor_logo.png", layout="wide")
 hide_decoration_bar_style = '''<style>header {visibility: hidden;}</style>'''
@@ -42,38 +29,73 @@ st.write("""
 This app converts PDF files into text, cleans the resulting text, and optionally translates the text to a specified language.
 """)
 
-def get_text_download_link(file_path, file_name):
-    with open(file_path, "r", encoding="utf-8") as f:
-        text = f.read()
-        b64 = b64encode(text.encode()).decode()
-        href = f'<a href="data:text/plain;base64,{b64}" download="{file_name}">Click here to Download your Text File</a>'
-        return href
+def show_text_pages(text, key, page_chars=PAGE_CHARS):
+    """show a long text one page at a time, only the selected page is sent to the browser"""
+    pages = paginate_text(text, page_chars)
+    page = 1
+    if len(pages) > 1:
+        page = st.number_input(f"Page (of {len(pages)})", min_value=1, max_value=len(pages), value=1,
+                               step=1, key=f"{key}_page")
+    start, end = pages[page - 1]
+    formatted_text = format_text_width(text[start:end].replace('\n', '\n\n'))
+    st_ace(formatted_text, language="python", theme="textmate", height=300, key=f"{key}_{page}")
 
-def format_text_width(text, max_line_length=120):
-    """Inserts a newline character every nth character in a string"""
-    lines = text.split('\n')
-    formatted_lines = []
-    for line in lines:
-        while len(line) > max_line_length:
-            split_index = line[:max_line_length].rfind(' ')
-            if split_index == -1: # no spaces found, we must split on max_line_length
-                split_index = max_line_length
-            formatted_lines.append(line[:split_index])
-            line = line[split_index:].strip()
-        formatted_lines.append(line)
-    return '\n'.join(formatted_lines)
+load_ocr_models()
+job_manager = get_job_manager()
 
 uploaded_file = st.file_uploader("Upload a PDF file", type="pdf")
-if uploaded_file is not None:
-    with st.spinner('Converting PDF to text...'):
-        with open(_here / "temp.pdf", 'wb') as f:
-            f.write(uploaded_file.getbuffer())
-        pdf_path = str(_here / "temp.pdf")
-        converted_txt, output_file = convert_PDF(pdf_path)
-        if converted_txt:
-            formatted_text = format_text_width(converted_txt.replace('\n', '\n\n'))
-            st_ace(formatted_text, language="python", theme="textmate", height=300, key="converted_pdf")
-            st.markdown(get_text_download_link(output_file, output_file), unsafe_allow_html=True)
-        os.remove(pdf_path)
-else:
+page_selection = st.text_input("Pages to convert", placeholder="e.g. 1-5,8 (default: the first 20 pages)")
+use_text_layer = st.checkbox("Use the PDF text layer when available", value=True,
+                             help="Pages that already contain text are extracted directly, only scanned pages go through OCR.")
+fast_cleanup = st.checkbox("Fast cleanup", value=False,
+                           help="Only clean up words the OCR model is unsure about, words recognized with high confidence are kept as they are.")
+ocr_profile = st.selectbox("OCR profile", ["fast", "balanced", "accurate"], index=1,
+                           help="fast: lighter models for clean scans, accurate: larger models and higher resolution for difficult documents.")
+# the job of this session, its id is also kept in the URL so a reloaded or reopened page gets the result back
+job_id = st.session_state.get("ocr_job_id") or st.query_params.get("job")
+
+if uploaded_file is not None and st.button("Convert", type="primary"):
+    try:
+        job_id = job_manager.submit(uploaded_file.getbuffer(), uploaded_file.name or "upload.pdf",
+                                    max_pages=page_selection or 20, text_layer=use_text_layer,
+                                    min_confidence=0.9 if fast_cleanup else None, profile=ocr_profile)
+    except ValueError as e:
+        st.error(f"Cannot convert this file: {e}")
+        st.stop()
+    st.session_state["ocr_job_id"] = job_id
+    st.query_params["job"] = job_id
+
+job = job_manager.get(job_id) if job_id else None
+if job_id and job is None:
+    st.warning("This conversion has expired, please convert the file again.")
+    st.session_state.pop("ocr_job_id", None)
+    if "job" in st.query_params:
+        del st.query_params["job"]
+elif job is not None and job["status"] in ("queued", "running"):
+    if job["status"] == "queued":
+        st.progress(0.0, text=f"{job['filename']} is waiting for other conversions to finish...")
+    else:
+        st.progress(job["pages_done"] / max(1, job["num_pages"]),
+                    text=f"Converting {job['filename']}: {job['pages_done']} of {job['num_pages']} pages")
+    st.text(job["preview"])
+    if st.button("Cancel"):
+        job_manager.cancel(job_id)
+    # poll the job, the conversion itself keeps running if the page is closed
+    time.sleep(1)
+    st.rerun()
+elif job is not None and job["status"] == "done":
+    blank_pages = sum(source == "blank" for source in job["page_sources"].values())
+    st.success(f"Converted {job['filename']}: {job['num_pages']} pages"
+               + (f", {blank_pages} blank" if blank_pages else ""))
+    if job["text"]:
+        show_text_pages(job["text"], key=f"converted_pdf_{job['id']}")
+        # served as a file by the Streamlit server, not embedded in the page
+        with open(job["output_file"], "rb") as f:
+            st.download_button("Download the text file", f, file_name=Path(job["output_file"]).name,
+                               mime="text/plain")
+elif job is not None and job["status"] == "failed":
+    st.error(f"The conversion of {job['filename']} failed: {job['error']}")
+elif job is not None:
+    st.info(f"The conversion of {job['filename']} was cancelled.")
+elif uploaded_file is None:
     st.info('Please upload a PDF file.')
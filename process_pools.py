@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+process_pools.py - spawn process pools created on first use and kept warm, shared by key, and replaced once broken
+
+A worker that dies, e.g. killed for running out of memory, breaks its whole pool: every pending and
+later task fails with BrokenProcessPool. get_process_pool never hands out a broken pool, and callers
+that catch BrokenProcessPool can discard_process_pool and submit again to a new one.
+"""
+
+import atexit
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# pools kept warm between calls, keyed by (kind, number of workers, ...)
+_pools = {}
+_lock = threading.Lock()
+
+
+def _is_broken(pool: ProcessPoolExecutor) -> bool:
+    # set by the executor when a worker dies, it is what makes submit raise BrokenProcessPool
+    return bool(getattr(pool, "_broken", False))
+
+
+def get_process_pool(key: tuple, num_workers: int, initializer=None, initargs: tuple = ()) -> ProcessPoolExecutor:
+    """
+    get_process_pool - get the spawn process pool of a key, created on first use or when the last one broke
+    Args:
+        key (tuple): what the pool is for, its kind first, e.g. ("clean", 4)
+        num_workers (int): number of worker processes
+        initializer (callable, optional): run once in each worker when it starts. Defaults to None.
+        initargs (tuple, optional): arguments of the initializer. Defaults to ().
+    Returns:
+        ProcessPoolExecutor: the pool
+    """
+    with _lock:
+        pool = _pools.get(key)
+        if pool is not None and _is_broken(pool):
+            logging.warning(f"process pool {key} is broken, starting a new one")
+            pool.shutdown(wait=False, cancel_futures=True)
+            pool = None
+        if pool is None:
+            logging.info(f"starting process pool {key} with {num_workers} workers")
+            pool = _pools[key] = ProcessPoolExecutor(
+                max_workers=num_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=initializer,
+                initargs=initargs,
+            )
+        return pool
+
+
+def discard_process_pool(key: tuple, pool: ProcessPoolExecutor = None):
+    """
+    discard_process_pool - shut down the pool of a key, so that the next get_process_pool starts a new one
+    Args:
+        key (tuple): the key of the pool
+        pool (ProcessPoolExecutor, optional): only discard the pool if it is still this one, not one
+            another caller already started in its place. Defaults to None.
+    """
+    with _lock:
+        current = _pools.get(key)
+        if current is None or (pool is not None and current is not pool):
+            return
+        del _pools[key]
+    current.shutdown(wait=False, cancel_futures=True)
+
+
+@atexit.register
+def shutdown_process_pools(kind: str = None):
+    """
+    shutdown_process_pools - shut down the process pools of a kind, or all of them
+    Args:
+        kind (str, optional): the first item of the keys of the pools to shut down. Defaults to None, all pools.
+    """
+    with _lock:
+        keys = [key for key in _pools if kind is None or key[0] == kind]
+        pools = [_pools.pop(key) for key in keys]
+    for pool in pools:
+        pool.shutdown(wait=False, cancel_futures=True)
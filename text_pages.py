@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+text_pages.py - split long texts into pages for display, so the browser only receives the slice being read
+"""
+
+# characters shown per viewer page, a few screens of text
+PAGE_CHARS = 20000
+
+
+def paginate_text(text: str, page_chars: int = PAGE_CHARS) -> list:
+    """
+    paginate_text - cut a text into pages of about page_chars characters, at line ends when possible
+    Args:
+        text (str): the text
+        page_chars (int, optional): the maximum number of characters of a page. Defaults to PAGE_CHARS.
+    Returns:
+        list: (start, end) offsets of each page in the text, at least one page
+    """
+    if page_chars < 1:
+        raise ValueError(f"page_chars must be positive, got {page_chars}")
+    pages = []
+    start = 0
+    while len(text) - start > page_chars:
+        end = text.rfind("\n", start, start + page_chars)
+        # a line longer than a page is cut where the page is full
+        end = start + page_chars if end <= start else end + 1
+        pages.append((start, end))
+        start = end
+    pages.append((start, len(text)))
+    return pages
+
+
+def format_text_width(text, max_line_length=120):
+    """Inserts a newline character every nth character in a string"""
+    lines = text.split('\n')
+    formatted_lines = []
+    for line in lines:
+        while len(line) > max_line_length:
+            split_index = line[:max_line_length].rfind(' ')
+            if split_index == -1: # no spaces found, we must split on max_line_length
+                split_index = max_line_length
+            formatted_lines.append(line[:split_index])
+            line = line[split_index:].strip()
+        formatted_lines.append(line)
+    return '\n'.join(formatted_lines)
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+translation.py - batched, concurrent LibreTranslate requests over pooled HTTP connections
+"""
+
+import logging
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from translation_memory import get_translation_memory, normalize_segment
+
+DEFAULT_URL = "https://translate.astian.org/"
+# after a server is found not to take lists, lists are tried again this many seconds later
+LIST_REPROBE_SECONDS = 600
+
+
+def make_batches(texts: list, max_chars: int = 2000, max_lines: int = 64) -> list:
+    """
+    make_batches - pack texts, in order, into batches of at most `max_lines` texts and about `max_chars` characters
+    A text longer than max_chars gets a batch of its own.
+    Args:
+        texts (list): the texts to pack
+        max_chars (int, optional): size bound of a batch. Defaults to 2000.
+        max_lines (int, optional): maximum number of texts in a batch. Defaults to 64.
+    Returns:
+        list: lists of indices into texts
+    """
+    batches, batch, size = [], [], 0
+    for i, text in enumerate(texts):
+        if batch and (size + len(text) > max_chars or len(batch) >= max_lines):
+            batches.append(batch)
+            batch, size = [], 0
+        batch.append(i)
+        size += len(text)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class LibreTranslateClient:
+    """
+    LibreTranslateClient - a LibreTranslate client that keeps its HTTP connections open, retries
+    transient failures and translates many lines in a few concurrent batched requests
+    Args:
+        url (str, optional): the LibreTranslate server. Defaults to DEFAULT_URL.
+        api_key (str, optional): API key of the server. Defaults to None.
+        max_connections (int, optional): size of the connection pool, and the default number of
+            concurrent requests. Defaults to 4.
+        retries (int, optional): retries on connection errors, timeouts and 429/5xx responses. Defaults to 3.
+        backoff_factor (float, optional): exponential backoff between retries, in seconds. Defaults to 0.5.
+        timeout (float, optional): timeout of a request in seconds. Defaults to 60.
+        memory (bool or TranslationMemory, optional): reuse and store translated segments in the
+            process-wide translation memory if True, in the given memory, or not at all. Defaults to None.
+    """
+
+    def __init__(
+        self,
+        url: str = DEFAULT_URL,
+        api_key: str = None,
+        max_connections: int = 4,
+        retries: int = 3,
+        backoff_factor: float = 0.5,
+        timeout: float = 60,
+        memory=None,
+    ):
+        self.url = url.rstrip("/") + "/"
+        self.api_key = api_key
+        self.max_connections = max(1, max_connections)
+        self.timeout = timeout
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=None,  # translating is idempotent, so POST is retried too
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=self.max_connections, max_retries=retry
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "lines": 0,
+            "chars": 0,
+            "segments": 0,
+            "unique_segments": 0,
+            "memory_hits": 0,
+        }
+        # time.monotonic() before which batches are sent line by line, see _translate_batch
+        self._lists_retry_at = 0.0
+        self._memory = memory
+
+    @property
+    def memory(self):
+        """the translation memory, None if not used"""
+        if self._memory is True:
+            self._memory = get_translation_memory()
+        return self._memory or None
+
+    def translate(self, q, source: str = "en", target: str = "es"):
+        """
+        translate - translate a text, or a list of texts in one request
+        Args:
+            q (str or list): the text(s) to translate
+            source (str, optional): source language code (ISO 639). Defaults to "en".
+            target (str, optional): target language code (ISO 639). Defaults to "es".
+        Returns:
+            str or list: the translated text(s)
+        """
+        payload = {"q": q, "source": source, "target": target, "format": "text"}
+        if self.api_key is not None:
+            payload["api_key"] = self.api_key
+        response = self.session.post(
+            self.url + "translate", json=payload, timeout=self.timeout
+        )
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["lines"] += len(q) if isinstance(q, list) else 1
+            self._stats["chars"] += sum(map(len, q)) if isinstance(q, list) else len(q)
+        response.raise_for_status()
+        return response.json()["translatedText"]
+
+    def _translate_batch(self, texts: list, source: str, target: str) -> list:
+        """translate a batch in one request, or line by line if the server does not take lists"""
+        if len(texts) > 1 and time.monotonic() >= self._lists_retry_at:
+            translated = None
+            try:
+                translated = self.translate(texts, source, target)
+            except requests.HTTPError as e:
+                if e.response is None or e.response.status_code != 400:
+                    raise
+            if isinstance(translated, list) and len(translated) == len(texts):
+                return translated
+            # a 400 may as well be a bad language code or text: only when a single line goes
+            # through is it the list the server refused, otherwise its error is raised as is
+            first = self.translate(texts[0], source, target)
+            if time.monotonic() >= self._lists_retry_at:
+                logging.warning(
+                    f"server does not translate lists, sending lines one by one for {LIST_REPROBE_SECONDS}s"
+                )
+            self._lists_retry_at = time.monotonic() + LIST_REPROBE_SECONDS
+            return [first] + [self.translate(text, source, target) for text in texts[1:]]
+        return [self.translate(text, source, target) for text in texts]
+
+    def translate_lines(
+        self,
+        lines: list,
+        source: str = "en",
+        target: str = "es",
+        max_chars: int = 2000,
+        max_lines: int = 64,
+        max_workers: int = None,
+        on_batch=None,
+    ) -> list:
+        """
+        translate_lines - translate lines in size-bounded batches sent concurrently, keeping their order
+        Blank lines are kept as they are, and each line keeps its leading and trailing whitespace.
+        Segments are deduplicated and stored in the translation memory by their normalize_segment
+        form: repeated segments are only sent once, as they first appear, and segments found in the
+        memory are not sent at all.
+        Args:
+            lines (list): the lines, or other segments, to translate
+            source (str, optional): source language code. Defaults to "en".
+            target (str, optional): target language code. Defaults to "es".
+            max_chars (int, optional): size bound of a batch, see make_batches. Defaults to 2000.
+            max_lines (int, optional): maximum number of segments in a batch. Defaults to 64.
+            max_workers (int, optional): concurrent requests. Defaults to the connection pool size.
+            on_batch (callable, optional): called with the number of lines done by each step,
+                e.g. a progress bar's update. Defaults to None.
+        Returns:
+            list: the translated lines, in the same order
+        """
+        translated = list(lines)
+        todo = [i for i, line in enumerate(lines) if line.strip()]
+        segments = [normalize_segment(lines[i]) for i in todo]
+        counts = Counter(segments)
+        # the text sent for a segment: its first line without the surrounding whitespace, inner
+        # runs of spaces kept, e.g. in aligned columns
+        texts = {}
+        for i, segment in zip(todo, segments):
+            texts.setdefault(segment, lines[i].strip())
+        memory = self.memory
+        known = memory.get_many(source, target, list(counts)) if memory else {}
+        missing = [segment for segment in counts if segment not in known]
+        with self._lock:
+            self._stats["segments"] += len(segments)
+            self._stats["unique_segments"] += len(counts)
+            self._stats["memory_hits"] += len(known)
+        if on_batch is not None:
+            # blank lines and lines found in the memory are done already
+            on_batch(len(lines) - sum(counts[segment] for segment in missing))
+
+        def run(batch):
+            keys = [missing[i] for i in batch]
+            batch_texts = [texts[key] for key in keys]
+            result = dict(zip(keys, self._translate_batch(batch_texts, source, target)))
+            if memory is not None:
+                memory.put_many(source, target, result)
+            known.update(result)
+            if on_batch is not None:
+                on_batch(sum(counts[key] for key in keys))
+
+        batches = make_batches([texts[key] for key in missing], max_chars=max_chars, max_lines=max_lines)
+        workers = min(max_workers or self.max_connections, len(batches))
+        if workers <= 1:
+            for batch in batches:
+                run(batch)
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                # list() re-raises the first failed batch
+                list(executor.map(run, batches))
+
+        for i, segment in zip(todo, segments):
+            line = lines[i]
+            leading = line[: len(line) - len(line.lstrip())]
+            trailing = line[len(line.rstrip()) :]
+            translated[i] = leading + known[segment].strip() + trailing
+        return translated
+
+    def stats(self) -> dict:
+        """get the number of requests sent, the lines and characters they carried, and the number of
+        segments translated, unique within their call, and found in the translation memory"""
+        with self._lock:
+            return dict(self._stats)
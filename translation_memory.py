@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+translation_memory.py - a persistent translation memory, so repeated segments are only translated once
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+_default_memory_path = (
+    Path.home() / ".cache" / "multiapp" / "translation_memory.sqlite3"
+)
+
+_horizontal_space_re = re.compile(r"[^\S\n]+")
+
+# SQLite limits the number of parameters of a query
+_max_params = 500
+
+
+def normalize_segment(text: str) -> str:
+    """the key form of a segment: runs of spaces and tabs collapsed, line breaks kept, ends stripped"""
+    return _horizontal_space_re.sub(" ", text).strip()
+
+
+class TranslationMemory:
+    """
+    TranslationMemory - an SQLite store of translated segments, keyed by source language, target language
+    and normalized segment. Least recently used segments are evicted past `max_bytes`.
+    Args:
+        path (str or Path, optional): the SQLite file. Defaults to ~/.cache/multiapp/translation_memory.sqlite3.
+        max_bytes (int, optional): size bound for the stored text. Defaults to 64 MB.
+    """
+
+    def __init__(self, path=None, max_bytes: int = 64 * 2**20):
+        self.path = Path(path or _default_memory_path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS segments (
+                source TEXT NOT NULL,
+                target TEXT NOT NULL,
+                segment TEXT NOT NULL,
+                translation TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (source, target, segment)
+            )"""
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS segments_last_access ON segments (last_access)"
+        )
+        # the total size of the segments, kept in the file and updated in the transaction that changes
+        # them, so processes sharing the memory agree on it
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "INSERT OR IGNORE INTO meta VALUES ('size', (SELECT COALESCE(SUM(size), 0) FROM segments))"
+        )
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, source: str, target: str, segments: list) -> dict:
+        """
+        get_many - look up normalized segments, counting hits and misses
+        Args:
+            source (str): source language code
+            target (str): target language code
+            segments (list): normalized segments, see normalize_segment
+        Returns:
+            dict: segment -> translation, for the segments in the memory
+        """
+        segments = list(dict.fromkeys(segments))
+        found = {}
+        with self._lock:
+            for start in range(0, len(segments), _max_params):
+                chunk = segments[start : start + _max_params]
+                rows = self._conn.execute(
+                    "SELECT segment, translation FROM segments WHERE source = ? AND target = ? "
+                    f"AND segment IN ({','.join('?' * len(chunk))})",
+                    (source, target, *chunk),
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE segments SET last_access = ? WHERE source = ? AND target = ? AND segment = ?",
+                    [(now, source, target, segment) for segment in found],
+                )
+                self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(segments) - len(found)
+        return found
+
+    def put_many(self, source: str, target: str, translations: dict):
+        """
+        put_many - store translated segments, evicting least recently used segments if the memory is over its size bound
+        Args:
+            source (str): source language code
+            target (str): target language code
+            translations (dict): normalized segment -> translation
+        """
+        if not translations:
+            return
+        now = time.time()
+        rows = [
+            (
+                source,
+                target,
+                segment,
+                translation,
+                len(segment.encode("utf-8")) + len(translation.encode("utf-8")),
+                now,
+            )
+            for segment, translation in translations.items()
+        ]
+        with self._lock:
+            # a write transaction from the start, so no other process changes the size in between
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                old_size = 0
+                segments = list(translations)
+                for start in range(0, len(segments), _max_params):
+                    chunk = segments[start : start + _max_params]
+                    old_size += self._conn.execute(
+                        "SELECT COALESCE(SUM(size), 0) FROM segments WHERE source = ? AND target = ? "
+                        f"AND segment IN ({','.join('?' * len(chunk))})",
+                        (source, target, *chunk),
+                    ).fetchone()[0]
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO segments VALUES (?, ?, ?, ?, ?, ?)", rows
+                )
+                total = self._add_size(sum(row[4] for row in rows) - old_size)
+                if total > self.max_bytes:
+                    self._evict(total)
+            except BaseException:
+                self._conn.rollback()
+                raise
+            self._conn.commit()
+
+    def _add_size(self, delta: int) -> int:
+        """change the total size of the segments, lock and write transaction must be held, return the new total"""
+        self._conn.execute("UPDATE meta SET value = value + ? WHERE name = 'size'", (delta,))
+        return self._total_size()
+
+    def _total_size(self) -> int:
+        """the total size of the segments, as stored in the memory file"""
+        return self._conn.execute("SELECT value FROM meta WHERE name = 'size'").fetchone()[0]
+
+    def _evict(self, total: int):
+        """delete least recently used segments until the memory is within its size bound, lock and transaction must be held"""
+        evicted, freed = 0, 0
+        rows = self._conn.execute(
+            "SELECT rowid, size FROM segments ORDER BY last_access"
+        ).fetchall()
+        for rowid, size in rows:
+            if total - freed <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM segments WHERE rowid = ?", (rowid,))
+            freed += size
+            evicted += 1
+        self._add_size(-freed)
+        logging.info(f"evicted {evicted} segments from the translation memory")
+
+    def stats(self) -> dict:
+        """get the hit/miss counters of this process and the size of the memory"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "entries": entries,
+                "size_bytes": self._total_size(),
+                "max_bytes": self.max_bytes,
+            }
+
+    def clear(self):
+        """remove every segment from the memory"""
+        with self._lock:
+            self._conn.execute("DELETE FROM segments")
+            self._conn.execute("UPDATE meta SET value = 0 WHERE name = 'size'")
+            self._conn.commit()
+
+
+_default_memory = None
+_default_memory_lock = threading.Lock()
+
+
+def get_translation_memory() -> TranslationMemory:
+    """
+    get_translation_memory - get the process-wide translation memory
+    Its location and size bound come from the TRANSLATION_MEMORY_PATH and TRANSLATION_MEMORY_MAX_MB
+    environment variables.
+    Returns:
+        TranslationMemory: the shared memory
+    """
+    global _default_memory
+    with _default_memory_lock:
+        if _default_memory is None:
+            _default_memory = TranslationMemory(
+                path=os.environ.get("TRANSLATION_MEMORY_PATH"),
+                max_bytes=int(
+                    float(os.environ.get("TRANSLATION_MEMORY_MAX_MB", 64)) * 2**20
+                ),
+            )
+        return _default_memory
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+utils_doc2pdf.py - the docx to PDF converter: paragraph cleaning, serial or on a process pool, and PDF rendering in memory
+"""
+
+import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from cleantext import clean
+from docx import Document
+from fpdf import FPDF
+
+from dehyphenator import dehyphenate
+from lexicon import get_lexicon
+from process_pools import discard_process_pool, get_process_pool, shutdown_process_pools
+
+
+class TextProcessor:
+    def __init__(self):
+        pass
+
+    def corr(self, s: str, add_space_when_numerics=False, exceptions=["e.g.", "i.e.", "etc.", "cf.", "vs.", "p."]) -> str:
+        if add_space_when_numerics:
+            s = re.sub(r"(\d)\.(\d)", r"\1. \2", s)
+        s = re.sub(r"\s+", " ", s)
+        s = re.sub(r'\s([?.!"](?:\s|$))', r"\1", s)
+        s = re.sub(r"\s\'", r"'", s)
+        s = re.sub(r"'\s", r"'", s)
+        s = re.sub(r"\s,", r",", s)
+        for e in exceptions:
+            expected_sub = re.sub(r"\s", "", e)
+            s = s.replace(expected_sub, e)
+        return s
+
+    def fix_punct_spaces(self, string):
+        fix_spaces = re.compile(r"\s*([?!.,]+(?:\s+[?!.,]+)*)\s*")
+        string = fix_spaces.sub(lambda x: "{} ".format(x.group(1).replace(" ", "")), string)
+        string = string.replace(" ' ", "'")
+        string = string.replace(' " ', '"')
+        return string.strip()
+
+    def cleantxt_ocr(self, ugly_text, lower=False, lang: str = "en") -> str:
+        cleaned_text = clean(
+            ugly_text,
+            fix_unicode=True,
+            to_ascii=True,
+            lower=lower,
+            no_urls=True,
+            no_emails=True,
+            no_phone_numbers=False,
+            no_numbers=False,
+            no_digits=False,
+            no_currency_symbols=False,
+            replace_with_punct="",
+            replace_with_url="<URL>",
+            replace_with_email="<EMAIL>",
+            replace_with_phone_number="<PHONE>",
+            replace_with_number="<NUM>",
+            replace_with_digit="0",
+            replace_with_currency_symbol="<CUR>",
+            lang=lang,
+        )
+        return cleaned_text
+
+    def check_word_spelling(self, word) -> bool:
+        return get_lexicon().is_known(word)
+
+    def eval_and_replace(self, text: str, match_token: str = "- ") -> str:
+        return dehyphenate(text, self.check_word_spelling, match_token=match_token, alpha_only=False)
+
+    def clean_paragraph(self, text: str) -> str:
+        """the full cleaning of one paragraph: spacing, clean-text, punctuation spacing and dehyphenation"""
+        text = self.corr(text)
+        text = self.cleantxt_ocr(text)
+        text = self.fix_punct_spaces(text)
+        return self.eval_and_replace(text)
+
+
+_text_processor = TextProcessor()
+
+
+def _clean_chunk(paragraphs: list) -> list:
+    """clean a chunk of paragraphs, run on the worker processes"""
+    return [_text_processor.clean_paragraph(p) for p in paragraphs]
+
+
+def get_clean_pool(num_workers: int) -> ProcessPoolExecutor:
+    """
+    get_clean_pool - a process pool for paragraph cleaning, created once and reused across documents
+    Args:
+        num_workers (int): number of worker processes
+    Returns:
+        ProcessPoolExecutor: the pool, a new one if the last one broke
+    """
+    return get_process_pool(("clean", num_workers), num_workers)
+
+
+def shutdown_clean_pools():
+    """shut down all cleaning process pools"""
+    shutdown_process_pools("clean")
+
+
+def clean_paragraphs(
+    paragraphs: list,
+    skip: list = None,
+    num_workers: int = None,
+    chunk_size: int = 200,
+) -> list:
+    """
+    clean_paragraphs - clean many paragraphs, split into chunks across a process pool, keeping their order
+    Documents with fewer than two chunks of paragraphs to clean are cleaned in this process, where
+    starting the pool would cost more than it saves.
+    Args:
+        paragraphs (list): the paragraph texts
+        skip (list, optional): one flag per paragraph, True to return it unchanged (e.g. headings). Defaults to None.
+        num_workers (int, optional): worker processes. Defaults to the number of CPUs, at most 4.
+        chunk_size (int, optional): paragraphs per task sent to a worker. Defaults to 200.
+    Returns:
+        list: the cleaned paragraphs, in order
+    """
+    skip = skip or [False] * len(paragraphs)
+    todo = [i for i, s in enumerate(skip) if not s]
+    texts = [paragraphs[i] for i in todo]
+    if num_workers is None:
+        num_workers = min(4, os.cpu_count() or 1)
+
+    if num_workers <= 1 or len(texts) < 2 * chunk_size:
+        cleaned = _clean_chunk(texts)
+    else:
+        chunks = [texts[i : i + chunk_size] for i in range(0, len(texts), chunk_size)]
+        pool = get_clean_pool(num_workers)
+        try:
+            cleaned = [p for chunk in pool.map(_clean_chunk, chunks) for p in chunk]
+        except BrokenProcessPool:
+            # a worker died, e.g. out of memory: clean the document once more on a new pool
+            logging.warning("paragraph cleaning pool broke, retrying on a new pool")
+            discard_process_pool(("clean", num_workers), pool)
+            pool = get_clean_pool(num_workers)
+            cleaned = [p for chunk in pool.map(_clean_chunk, chunks) for p in chunk]
+
+    result = list(paragraphs)
+    for i, text in zip(todo, cleaned):
+        result[i] = text
+    return result
+
+
+def process_text(file, num_workers: int = None) -> str:
+    """
+    process_text - the cleaned text of a Word document, headings are kept as they are on their own lines
+    Args:
+        file (str or file-like): the .docx file
+        num_workers (int, optional): worker processes for cleaning, see clean_paragraphs. Defaults to None.
+    Returns:
+        str: the text, one paragraph per line
+    """
+    document = Document(file)
+    paragraphs, headings = [], []
+    for paragraph in document.paragraphs:
+        paragraphs.append(paragraph.text)
+        headings.append(paragraph.style.name.startswith('Heading'))
+    cleaned = clean_paragraphs(paragraphs, skip=headings, num_workers=num_workers)
+    return "\n".join(
+        '\n' + text + '\n' if heading else text for text, heading in zip(cleaned, headings)
+    )
+
+
+def create_pdf(text: str) -> bytes:
+    """
+    create_pdf - render a text as a letter-size PDF, one paragraph per line, without touching the disk
+    Args:
+        text (str): the text, e.g. from process_text
+    Returns:
+        bytes: the PDF file
+    """
+    pdf = FPDF(format='letter')
+    pdf.add_page()
+    pdf.set_font("Arial", size = 12)
+    pdf.set_auto_page_break(auto=True, margin=15)
+    lines = text.split('\n')
+    for line in lines:
+        pdf.multi_cell(0, 10, txt = line, align = 'L')
+    # fpdf returns the document as a latin-1 str, fpdf2 as a bytearray
+    data = pdf.output(dest="S")
+    return data.encode("latin-1") if isinstance(data, str) else bytes(data)
+
+
+def docx_to_pdf(file, num_workers: int = None) -> bytes:
+    """
+    docx_to_pdf - convert a Word document to a PDF of its cleaned text, in memory
+    Args:
+        file (str or file-like): the .docx file, e.g. an uploaded file or a BytesIO
+        num_workers (int, optional): worker processes for cleaning, see clean_paragraphs. Defaults to None.
+    Returns:
+        bytes: the PDF file
+    """
+    return create_pdf(process_text(file, num_workers=num_workers))
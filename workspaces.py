@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+workspaces.py - private temporary folders for the files of one request, so concurrent sessions never share a path
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+WORKSPACE_PREFIX = "multiapp_"
+
+
+def get_workspace_root() -> Path:
+    """the folder workspaces are created in: the WORKSPACE_ROOT environment variable, or the system temp folder"""
+    root = Path(os.environ.get("WORKSPACE_ROOT") or tempfile.gettempdir())
+    root.mkdir(parents=True, exist_ok=True)
+    return root
+
+
+class Workspace:
+    """
+    Workspace - a temporary folder owned by one request, removed with everything in it when the
+    request is done. Use it as a context manager; a workspace that is never closed is removed when it
+    is garbage collected or at exit.
+    Args:
+        prefix (str, optional): start of the folder name, after WORKSPACE_PREFIX. Defaults to "".
+        root (str or Path, optional): parent folder. Defaults to get_workspace_root().
+    """
+
+    def __init__(self, prefix: str = "", root=None):
+        self._tmp = tempfile.TemporaryDirectory(
+            prefix=WORKSPACE_PREFIX + prefix, dir=str(root or get_workspace_root())
+        )
+        self.path = Path(self._tmp.name)
+
+    def file(self, name: str) -> Path:
+        """the path of a file in the workspace, only the last part of `name` is kept so it cannot escape"""
+        name = Path(str(name).replace("\\", "/")).name
+        if name in ("", ".", ".."):
+            raise ValueError(f"invalid file name {name!r}")
+        return self.path / name
+
+    def write_bytes(self, name: str, data) -> Path:
+        """
+        write_bytes - save data, e.g. an uploaded file, in the workspace
+        Args:
+            name (str): the file name
+            data (bytes or memoryview): the content
+        Returns:
+            Path: the saved file
+        """
+        path = self.file(name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def cleanup(self):
+        """remove the workspace and its files, can be called more than once"""
+        self._tmp.cleanup()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cleanup()
+
+    def __repr__(self):
+        return f"Workspace({str(self.path)!r})"
+
+
+def cleanup_stale_workspaces(max_age: float = 24 * 3600, root=None) -> int:
+    """
+    cleanup_stale_workspaces - remove workspaces left behind by processes that did not exit cleanly
+    Args:
+        max_age (float, optional): seconds since the last change after which a workspace is stale. Defaults to a day.
+        root (str or Path, optional): folder holding the workspaces. Defaults to get_workspace_root().
+    Returns:
+        int: number of workspaces removed
+    """
+    cutoff = time.time() - max_age
+    removed = 0
+    for path in Path(root or get_workspace_root()).glob(WORKSPACE_PREFIX + "*"):
+        try:
+            if path.is_dir() and path.stat().st_mtime < cutoff:
+                shutil.rmtree(path)
+                removed += 1
+        except OSError as e:
+            logging.warning(f"could not remove stale workspace {path}: {e}")
+    if removed:
+        logging.info(f"removed {removed} stale workspaces")
+    return removed